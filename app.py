@@ -1,14 +1,30 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for, flash
-from flask_login import LoginManager, current_user, login_user, logout_user, login_required
-from flask_migrate import Migrate # Import Flask-Migrate
-from models import db, User # Import db and User from models.py
+# Load .env before anything reads the environment (the OAuth blueprints read it when imported)
+from dotenv import load_dotenv
+load_dotenv()
+
+import click
+from flask import Flask, Response, request, jsonify, render_template, session, redirect, url_for, flash, stream_with_context, send_file, send_from_directory
+from flask_login import LoginManager, current_user, login_user, logout_user, login_required, user_logged_in
+from models import db, User, password_hasher, save_messages # Import db and User from models.py
 from auth import all_blueprints # Import blueprints from the auth folder
+from auth.user_cache import UserCache, register_invalidation
+from chatbot import (
+    IntentIndex, SentenceBuffer, split_sentences, sse_event, create_llm_backend, CancelToken, StreamCancelled,
+    prompt_key, create_response_cache, ConversationStore, SingleFlight, MetricsRegistry, engine_options,
+    create_rate_limiter, iter_pcm_chunks, AudioTooLong, SlotStream, create_speech_recognizer,
+    AudioClipCache, SynthesisBusy, create_speech_synthesizer, VoiceSession, ResponsePrecache, WriteBehindBuffer,
+    create_session_interface, CircuitBreaker, CircuitOpen, create_resilient_backend, create_response_profiles,
+)
+from chatbot.assets import AssetManifest
+from datetime import datetime, timezone
+import mimetypes
+import threading
+import time
 import os
 import re
-import json
 import random
-from groq import Groq
-from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError, DBAPIError, OperationalError, TimeoutError as PoolTimeoutError
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 app = Flask(__name__)
@@ -16,65 +32,281 @@ app = Flask(__name__)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
 # Secret key is crucial for session security
-app.secret_key = os.getenv('SECRET_KEY', os.urandom(24))
-load_dotenv() # Loads environment variables from .env file
+app.secret_key = os.getenv('SECRET_KEY')
+if not app.secret_key:
+    # A random key is shared by preloaded gunicorn workers, but signed cookies stop working at every restart
+    print("WARNING: SECRET_KEY is not set. Using a random key; signed cookies will not survive a restart.")
+    app.secret_key = os.urandom(24)
+
+# Sessions are stored server-side (SESSION_BACKEND: sqlite by default, memory, or cookie for Flask's
+# signed cookies). The cookie carries only a random id and is not re-sent when the session is unchanged.
+session_interface = create_session_interface(app.instance_path)
+if session_interface is not None:
+    app.session_interface = session_interface
 os.environ["OAUTHLIB_RELAX_TOKEN_SCOPE"] = "1"
 
-# Groq API settings
-groq_api_key = os.getenv("GROQ_API_KEY")
-if not groq_api_key:
-    print("WARNING: GROQ_API_KEY environment variable is not set. Groq API features might be unavailable.")
-    groq_client = None # Set client to None if API key is missing
-else:
-    groq_client = Groq(api_key=groq_api_key)
+# LLM backend settings: Groq by default, or the local stub server with LLM_BACKEND=stub.
+# All calls share one event loop and one pooled httpx connection per worker process, created after fork.
+llm_backend = create_llm_backend() # None if the API key is missing
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+
+# How answers are generated, chosen per request with "mode": 'text' (default) for the screen, or
+# 'voice' for short, plain sentences read aloud (VOICE_MAX_TOKENS, VOICE_SYSTEM_PROMPT, VOICE_STOP)
+response_profiles = create_response_profiles()
+
+# Cache of Groq answers to repeated questions (memory by default, SQLite to share it between workers)
+response_cache = create_response_cache(app.instance_path)
+
+# Identical questions asked at the same time share one Groq call
+inflight_requests = SingleFlight(timeout=float(os.getenv("GROQ_TIMEOUT", "60")))
+
+# Recent turns of each chat, so follow-up questions reach Groq with context
+conversations = ConversationStore(
+    token_budget=int(os.getenv("CONVERSATION_TOKEN_BUDGET", "1500")),
+    max_conversations=int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000")),
+    idle_timeout=int(os.getenv("CONVERSATION_IDLE_TIMEOUT", "1800")),
+)
+
+# Token-bucket limits on /chat: anonymous users per session and per IP, registered users per account.
+# RATE_LIMIT_BACKEND=sqlite shares the buckets between gunicorn workers.
+rate_limiter = create_rate_limiter(app.instance_path)
+
+# Optional offline speech-to-text for browsers without SpeechRecognition (STT_BACKEND=vosk).
+# Recognition is CPU-bound, so each worker runs at most STT_MAX_STREAMS utterances at once.
+speech_recognizer = create_speech_recognizer() # None unless configured and installed
+speech_slots = threading.BoundedSemaphore(int(os.getenv("STT_MAX_STREAMS", "2")))
+STT_MAX_SECONDS = float(os.getenv("STT_MAX_SECONDS", "30"))
+
+# Optional offline text-to-speech (TTS_BACKEND=piper). Clips are cached on disk by content, so
+# repeated sentences (above all the fixed intents.json answers) are synthesized only once.
+speech_synthesizer = create_speech_synthesizer() # None unless configured and installed
+tts_cache = AudioClipCache(
+    os.getenv("TTS_CACHE_DIR", "tts_cache"),
+    speech_synthesizer,
+    max_files=int(os.getenv("TTS_CACHE_MAX_FILES", "5000")),
+    max_pending=int(os.getenv("TTS_MAX_PENDING", "4")),
+) if speech_synthesizer else None
+TTS_MAX_CHARS = 500
+
+# Metrics exposed at /metrics. Under gunicorn with several workers, set METRICS_MULTIPROC_DIR
+# (gunicorn.conf.py does) so every worker's numbers are added up.
+metrics = MetricsRegistry(multiprocess_dir=os.getenv("METRICS_MULTIPROC_DIR"))
+CHAT_STAGE_SECONDS = metrics.histogram("chat_stage_seconds", "Time spent in each stage of a chat request.", ["stage"])
+CHAT_RESPONSES_TOTAL = metrics.counter("chat_responses_total", "Chat responses by where the answer came from.", ["source"])
+LLM_REQUEST_SECONDS = metrics.histogram("llm_request_seconds", "Duration of upstream LLM calls.", ["mode", "outcome"])
+LLM_FIRST_TOKEN_SECONDS = metrics.histogram("llm_first_token_seconds", "Time until the first streamed LLM token.")
+LLM_ERRORS_TOTAL = metrics.counter("llm_errors_total", "Failed upstream LLM calls by error type.", ["error"])
+RATE_LIMIT_REJECTIONS_TOTAL = metrics.counter("rate_limit_rejections_total", "Chat requests rejected by the rate limiter.", ["tier"])
+LLM_CIRCUIT_STATE = metrics.gauge("llm_circuit_state", "Workers whose LLM circuit breaker is in each state.", ["state"])
+LLM_CIRCUIT_TRIPS_TOTAL = metrics.counter("llm_circuit_trips_total", "Times an LLM circuit breaker opened.")
+LLM_HEDGED_REQUESTS_TOTAL = metrics.counter("llm_hedged_requests_total", "Second LLM attempts fired after the hedging delay, and those that answered first.", ["outcome"])
+RESPONSE_CACHE_LOOKUPS_TOTAL = metrics.counter("response_cache_lookups_total", "Response cache lookups by result.", ["result"])
+RESPONSE_CACHE_HIT_RATE = metrics.ratio("response_cache_hit_rate", "Fraction of response cache lookups that were hits.", RESPONSE_CACHE_LOOKUPS_TOTAL, result="hit")
+TRANSCRIPT_ROWS_TOTAL = metrics.counter("transcript_rows_total", "Chat messages written to or dropped from the transcript tables.", ["outcome"])
+
+# Deadlines, a circuit breaker and optional hedging around every LLM call (LLM_DEADLINE, LLM_BREAKER_*,
+# LLM_HEDGE...). While the circuit is open, questions not answered from intents.json get DEGRADED_MESSAGE at once.
+def record_circuit_state(old_state, new_state):
+    LLM_CIRCUIT_STATE.set(0, state=old_state)
+    LLM_CIRCUIT_STATE.set(1, state=new_state)
+    if new_state == CircuitBreaker.OPEN:
+        LLM_CIRCUIT_TRIPS_TOTAL.inc()
+        print(f"WARNING: LLM circuit breaker opened ({old_state} -> {new_state}); answering from intents only.")
+
+if llm_backend is not None:
+    llm_backend = create_resilient_backend(
+        llm_backend,
+        on_state_change=record_circuit_state,
+        on_hedge=lambda outcome: LLM_HEDGED_REQUESTS_TOTAL.inc(outcome=outcome),
+    )
+    LLM_CIRCUIT_STATE.set(1, state=CircuitBreaker.CLOSED)
+DEGRADED_MESSAGE = "The AI service is having trouble right now, so I can only answer the questions I know by heart. Please try again in a minute."
 
 # Database configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///users.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False # Suppresses unnecessary warnings
+# Pool sizing and SQLite WAL / Postgres pre-ping settings (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, SQLITE_BUSY_TIMEOUT)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 db.init_app(app)
 
-# Initialize Flask-Migrate
-migrate = Migrate(app, db) # Initialize Flask-Migrate with your app and db object
+# Chat turns are stored in the Conversation/Message tables without a database write in the request:
+# they are queued in memory and inserted in batches (TRANSCRIPT_BATCH_SIZE rows, or every
+# TRANSCRIPT_FLUSH_INTERVAL seconds) by a background thread. TRANSCRIPTS=off disables storing them.
+def write_transcripts(rows):
+    with app.app_context():
+        TRANSCRIPT_ROWS_TOTAL.inc(save_messages(rows), outcome="written")
+
+def transient_database_error(error):
+    """True for failures worth retrying later (database down, locked, pool exhausted), not for rows the database rejects."""
+    return (
+        isinstance(error, (OperationalError, PoolTimeoutError))
+        or (isinstance(error, DBAPIError) and error.connection_invalidated)
+    )
+
+transcripts = WriteBehindBuffer(
+    write_transcripts,
+    max_batch=int(os.getenv("TRANSCRIPT_BATCH_SIZE", "200")),
+    interval=float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "2")),
+    max_pending=int(os.getenv("TRANSCRIPT_MAX_PENDING", "10000")),
+    on_drop=lambda count: TRANSCRIPT_ROWS_TOTAL.inc(count, outcome="dropped"),
+    is_transient=transient_database_error,
+) if os.getenv("TRANSCRIPTS", "on").lower() != "off" else None
+app.extensions['transcripts'] = transcripts # Lets the data-deletion callback drop a user's queued rows
+
+# Password hashing: pbkdf2 cost and the size/queue bound of the hashing process pool.
+# Raising the iterations rehashes each password at its owner's next login.
+app.config['PASSWORD_HASH_ITERATIONS'] = int(os.getenv('PASSWORD_HASH_ITERATIONS', '1000000'))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '32'))
+password_hasher.init_app(app)
+
+# Flask-Migrate provides the `flask db` commands. It imports Alembic, which is slow, so it is set up
+# only when one of those commands runs, not in every server process.
+class MigrateCommands(click.Group):
+    """Stands in for Flask-Migrate's `db` command group until a `flask db` command runs."""
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        from flask_migrate import Migrate
+        if 'migrate' not in app.extensions:
+            Migrate(app, db) # Replaces this group with the real one
+        return app.cli.get_command(None, 'db').make_context(info_name, args, parent=parent, **extra)
+
+app.cli.add_command(MigrateCommands('db', help='Perform database migrations.'))
 
 # Flask-Login configuration
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'email_auth.login' # Page to redirect to if user is not logged in (from email_auth blueprint)
 
+# Identities of logged-in users are cached, so their requests do not query the database.
+# Updating or deleting a User row through the ORM drops its entry.
+user_cache = UserCache(
+    max_entries=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+)
+register_invalidation(user_cache)
+
+# A new session id at every login, so an id obtained before it cannot be used to ride the login
+@user_logged_in.connect_via(app)
+def rotate_session_id(sender, user, **extra):
+    regenerate = getattr(session, 'regenerate', None) # Cookie sessions have no id to rotate
+    if regenerate is not None:
+        regenerate()
+
 # User loading function (for Flask-Login)
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.load(int(user_id))
 
 # Register all OAuth blueprints (like Facebook and Google)
 for blueprint in all_blueprints:
     app.register_blueprint(blueprint)
 
+# Duplex voice sessions over WebSocket (see voice_session). Without flask-sock, the page keeps using /chat/stream.
+try:
+    from flask_sock import Sock
+    sock = Sock(app)
+except ImportError:
+    sock = None
+    print("WARNING: flask-sock is not installed. The /voice WebSocket endpoint is disabled.")
+
+# Fingerprinted static files built by `python -m chatbot.assets`. url_for('static', ...) returns the
+# hashed copy, which never changes, so browsers and the CDN may keep it for a year.
+asset_manifest = AssetManifest(app.static_folder)
+if not asset_manifest.built:
+    print("WARNING: static/dist/manifest.json not found. Static files are served without fingerprints; run `python -m chatbot.assets`.")
+STATIC_MAX_AGE = 31536000
+
+@app.url_defaults
+def fingerprinted_static_url(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = asset_manifest.lookup(values['filename'])
+
+def static_file(filename):
+    """Serves a static file; fingerprinted ones are immutable and sent pre-compressed when the client accepts it."""
+    if not asset_manifest.is_fingerprinted(filename):
+        return app.send_static_file(filename)
+    encoding, suffix = asset_manifest.best_encoding(filename, request.accept_encodings)
+    response = send_from_directory(
+        app.static_folder, filename + suffix, mimetype=mimetypes.guess_type(filename)[0], max_age=STATIC_MAX_AGE,
+    )
+    if encoding:
+        response.content_encoding = encoding
+    if asset_manifest.encodings[filename]:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = static_file
+
+@app.context_processor
+def asset_context():
+    # Without a CSS build (e.g. a fresh checkout), pages fall back to the Tailwind CDN
+    return {"compiled_css": asset_manifest.exists('css/app.css')}
+
 # Create database tables (within application context)
 # This part creates tables only if run for the first time.
 # If you are using Flask-Migrate, you typically use migrate commands instead of db.create_all().
+# Under gunicorn's preload this runs once, in the master; its connection is closed before workers fork.
 with app.app_context():
     # You can use db.create_all() for initial setup or if you need to create tables.
     # However, once you start using migrations, it's safer to comment out this line.
     db.create_all()
-    pass
+    db.engine.dispose()
+
+
+# Load intents.json file once; it is recompiled only when the file changes on disk
+# Inputs that match no pattern are still answered from intents.json when they are close enough
+# paraphrases (cosine similarity of character n-grams); set INTENT_SIMILARITY_THRESHOLD=off to disable.
+similarity_threshold = os.getenv('INTENT_SIMILARITY_THRESHOLD', '0.63')
+intent_index = IntentIndex(
+    'data/intents.json',
+    semantic_threshold=None if similarity_threshold.lower() == 'off' else float(similarity_threshold),
+)
+intent_index.reload(force=True)
+
+WELCOME_MESSAGE = "Hello! Welcome to DevChatbot-AI. I'm here to help you with development, programming, and AI. Press the microphone button to start talking!"
 
+# The welcome turn and the fixed intent answers, serialized once with their ETags
+response_precache = ResponsePrecache(WELCOME_MESSAGE, intent_index)
+PRECACHE_MAX_AGE = int(os.getenv("PRECACHE_MAX_AGE", "3600")) # Browser cache lifetime of /start, in seconds
+
+def prewarm_speech_clips():
+    """Synthesizes the welcome message and every fixed intent response (sentence by sentence) in the background."""
+    texts = split_sentences(WELCOME_MESSAGE)
+    for intent in intent_index.intents.get('intents', []):
+        for response_text in intent.get('responses', []):
+            if '[name]' not in response_text: # Personalized answers differ per user
+                texts.extend(split_sentences(response_text))
+    return tts_cache.prewarm(texts)
+
+_worker_pid = None # Process in which init_worker last ran
+
+def init_worker():
+    """
+    Starts what must not cross a fork: background threads and the LLM client. gunicorn.conf.py runs it
+    as each worker boots; otherwise the first request of each process does.
+    """
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    _worker_pid = os.getpid()
+    metrics.start()
+    if transcripts is not None:
+        transcripts.start()
+    if llm_backend is not None:
+        llm_backend.start()
+    if tts_cache and os.getenv("TTS_PREWARM", "1") != "0":
+        prewarm_speech_clips()
+
+@app.before_request
+def ensure_worker_started():
+    init_worker()
 
-# Load intents.json file
 def load_intents():
-    """Loads the intents.json file and handles potential errors."""
-    try:
-        with open('data/intents.json', 'r', encoding='utf-8') as file:
-            data = file.read()
-            if data.strip().startswith("<!DOCTYPE html>"):
-                raise ValueError("Error: An HTML page is being loaded instead of intents.json!")
-            return json.loads(data)
-    except FileNotFoundError:
-        print("Error: intents.json file not found. Please ensure it is in the 'data' folder.")
-        return {"intents": []}
-    except json.JSONDecodeError:
-        print("Error: intents.json is not in a valid JSON format. Check its format.")
-        return {"intents": []}
+    """Returns the currently loaded intents.json data."""
+    return intent_index.intents
 
 def get_random_response(intent):
     """
@@ -93,92 +325,581 @@ def extract_name(user_input):
 
 def get_response_from_intents(user_input):
     """Attempts to find a response based on user input within intents.json."""
-    intents = load_intents()
-    if not intents["intents"]:
-        return None # Proceed to Groq if intents cannot be loaded
-
-    for intent in intents["intents"]:
-        # Check if user input matches any of the patterns
-        if any(re.search(pattern.lower(), user_input.lower()) for pattern in intent["patterns"]):
-            return get_random_response(intent) # Apply random/fixed logic with get_random_response
+    intent = intent_index.match(user_input)
+    if intent:
+        return get_random_response(intent) # Apply random/fixed logic with get_random_response
 
     return None # If not found in intents.json, proceed to Groq API
 
-# Main function to handle user input
-def handle_user_input(user_input):
-    """Handles user input, responding using intents.json or the Groq API."""
+def remember_user_name(user_input):
+    """Returns the user's name from the session, saving it first if the input introduces it."""
     user_name = session.get('user_name')
-
-    # Check and save user name
     if not user_name:
         extracted_name = extract_name(user_input)
         if extracted_name:
             session['user_name'] = extracted_name
             user_name = extracted_name
+    return user_name
+
+def personalize(response_text, user_name):
+    """Replaces the [name] placeholder with the actual user name."""
+    if user_name:
+        return response_text.replace("[name]", user_name)
+    return response_text
+
+def existing_conversation_key():
+    """Returns the key of the current user's conversation history, or None if the session has none yet."""
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    conversation_id = session.get('conversation_id')
+    return f"session:{conversation_id}" if conversation_id else None
+
+def conversation_key():
+    """Returns the key of the current user's conversation history (user id, or a random id kept in the session)."""
+    key = existing_conversation_key()
+    if key is None:
+        session['conversation_id'] = os.urandom(8).hex()
+        key = f"session:{session['conversation_id']}"
+    return key
+
+def record_turn(key, user_input, response_text, source):
+    """Adds a finished turn to the conversation history and queues it for the transcript tables."""
+    conversations.append(key, user_input, response_text)
+    if transcripts is not None:
+        created_at = datetime.now(timezone.utc)
+        user_id = int(key.split(":", 1)[1]) if key.startswith("user:") else None
+        transcripts.add(
+            {"key": key, "user_id": user_id, "role": "user", "content": user_input, "source": None, "created_at": created_at},
+            {"key": key, "user_id": user_id, "role": "assistant", "content": response_text, "source": source, "created_at": created_at},
+        )
+
+def response_profile(mode, default="text"):
+    """Returns the response profile a request asked for with its "mode" (default when missing), or None if unknown."""
+    mode = mode or default
+    return response_profiles.get(mode) if isinstance(mode, str) else None
+
+def get_cached_response(user_input, history, profile):
+    """Looks up a cached Groq answer. Only context-free questions (no earlier turns) are cached."""
+    if response_cache and not history:
+        answer = response_cache.get(user_input, profile.cache_model(GROQ_MODEL))
+        RESPONSE_CACHE_LOOKUPS_TOTAL.inc(result="miss" if answer is None else "hit")
+        return answer
+    return None
+
+def cache_response(user_input, history, profile, response_text):
+    if response_cache and not history:
+        response_cache.set(user_input, profile.cache_model(GROQ_MODEL), response_text)
+
+def complete_with_llm(user_input, history, profile):
+    """
+    Returns Groq's answer to the user input, generated and finished for the response profile.
+    Concurrent identical context-free questions are coalesced into a single upstream call
+    whose answer (or error) every caller shares.
+    """
+    def call():
+        start = time.perf_counter()
+        try:
+            response_text = profile.finish(llm_backend.complete(
+                messages=profile.messages(history, user_input),
+                model=GROQ_MODEL,
+                **profile.options(),
+            ))
+        except CircuitOpen:
+            raise # Failed fast: no upstream call was made
+        except Exception as e:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="complete", outcome="error")
+            LLM_ERRORS_TOTAL.inc(error=type(e).__name__)
+            raise
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="complete", outcome="ok")
+        # Answers are cached before personalization, so cached text stays per-user
+        cache_response(user_input, history, profile, response_text)
+        return response_text
+
+    if history:
+        return call()
+    return inflight_requests.do(prompt_key(user_input, profile.cache_model(GROQ_MODEL)), call)
+
+# Main function to handle user input
+def handle_user_input(user_input, profile=None):
+    """Handles user input, responding using intents.json or the Groq API (with the given response profile)."""
+    profile = profile or response_profile(None)
+    # Check and save user name
+    with CHAT_STAGE_SECONDS.time(stage="name_extraction"):
+        user_name = remember_user_name(user_input)
+    key = conversation_key()
+    history = conversations.messages(key)
+
+    # Try to find a response in intents.json, then in the cache of earlier Groq answers
+    with CHAT_STAGE_SECONDS.time(stage="intent_load"):
+        intent_index.reload() # At most one stat() every few seconds; re-parses only if the file changed
+    with CHAT_STAGE_SECONDS.time(stage="intent_match"):
+        response_text = get_response_from_intents(user_input)
+    source = "intent"
+    if not response_text:
+        with CHAT_STAGE_SECONDS.time(stage="cache_lookup"):
+            response_text = get_cached_response(user_input, history, profile)
+        source = "cache"
+    if not response_text: # If not found in intents or the cache, use Groq
+        if not llm_backend:
+            CHAT_RESPONSES_TOTAL.inc(source="unavailable")
+            return "Sorry, the AI service is currently unavailable. Please try again later."
+        try:
+            with CHAT_STAGE_SECONDS.time(stage="llm_call"):
+                response_text = complete_with_llm(user_input, history, profile)
+        except CircuitOpen:
+            CHAT_RESPONSES_TOTAL.inc(source="circuit_open")
+            return DEGRADED_MESSAGE
+        except Exception as e:
+            app.logger.error(f"Groq API error: {e}")
+            CHAT_RESPONSES_TOTAL.inc(source="error")
+            return "Sorry, I am unable to process your request at the moment. Please try again later."
+        source = "llm"
+
+    with CHAT_STAGE_SECONDS.time(stage="placeholder_substitution"):
+        response_text = personalize(response_text, user_name)
+    record_turn(key, user_input, response_text, source)
+    CHAT_RESPONSES_TOTAL.inc(source=source)
+    return response_text # Return only the text response
 
-    # Try to find a response in intents.json
-    response_text = get_response_from_intents(user_input)
-    if not response_text: # If not found in intents, use Groq
-        if groq_client:
+def stream_user_input(user_input, key, user_name=None, cancel=None, profile=None):
+    """
+    Same as handle_user_input, but yields the response sentence by sentence
+    while the Groq completion is still being generated. Needs no request context:
+    the caller passes the conversation key and user name. Cancelling `cancel`
+    (a CancelToken) aborts the Groq call and ends the stream.
+    """
+    profile = profile or response_profile(None)
+    history = conversations.messages(key)
+
+    with CHAT_STAGE_SECONDS.time(stage="intent_match"):
+        response_text = get_response_from_intents(user_input)
+    source = "intent"
+    if not response_text:
+        with CHAT_STAGE_SECONDS.time(stage="cache_lookup"):
+            response_text = get_cached_response(user_input, history, profile)
+        source = "cache"
+    if not response_text and not llm_backend:
+        CHAT_RESPONSES_TOTAL.inc(source="unavailable")
+        yield "Sorry, the AI service is currently unavailable. Please try again later."
+        return
+
+    # A concurrent identical question is already streaming from Groq: wait for its answer instead
+    flight_key = None
+    if not response_text and not history:
+        flight_key = prompt_key(user_input, profile.cache_model(GROQ_MODEL))
+        flight, is_leader = inflight_requests.begin(flight_key)
+        if not is_leader:
+            flight_key = None
+            source = "shared"
             try:
-                groq_response = groq_client.chat.completions.create(
-                    messages=[{"role": "user", "content": user_input}],
-                    model="llama-3.3-70b-versatile",
-                )
-                response_text = groq_response.choices[0].message.content.strip()
+                response_text = flight.wait(inflight_requests.timeout)
+            except CircuitOpen: # The leader failed fast too
+                CHAT_RESPONSES_TOTAL.inc(source="circuit_open")
+                yield DEGRADED_MESSAGE
+                return
             except Exception as e:
-                app.logger.error(f"Groq API error: {e}")
-                response_text = "Sorry, I am unable to process your request at the moment. Please try again later."
-        else:
-            response_text = "Sorry, the AI service is currently unavailable. Please try again later."
-
-    if user_name: # Replace [name] placeholder with actual user name
-        response_text = response_text.replace("[name]", user_name)
-
-    return response_text # Return only the text response
+                app.logger.error(f"Groq API streaming error (shared request): {e}")
+                CHAT_RESPONSES_TOTAL.inc(source="error")
+                yield "Sorry, I am unable to process your request at the moment. Please try again later."
+                return
+
+    if response_text:
+        response_text = personalize(response_text, user_name)
+        record_turn(key, user_input, response_text, source)
+        CHAT_RESPONSES_TOTAL.inc(source=source)
+        yield from split_sentences(response_text)
+        return
+
+    buffer = SentenceBuffer()
+    speech = profile.sentence_filter() # Strips markdown from spoken answers as they stream
+    deltas = []
+    said_something = False
+    error = None
+    start = time.perf_counter()
+    try:
+        stream = llm_backend.stream(
+            messages=profile.messages(history, user_input),
+            model=GROQ_MODEL,
+            cancel=cancel,
+            **profile.options(),
+        )
+        for delta in stream:
+            if not deltas:
+                LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start)
+            deltas.append(delta)
+            for sentence in buffer.feed(delta):
+                if speech is not None:
+                    sentence = speech.feed(sentence)
+                if sentence:
+                    said_something = True
+                    yield personalize(sentence, user_name)
+    except CircuitOpen as e:
+        error = e
+        CHAT_RESPONSES_TOTAL.inc(source="circuit_open")
+        yield DEGRADED_MESSAGE
+        return
+    except StreamCancelled as e:
+        error = e
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="stream", outcome="cancelled")
+        CHAT_RESPONSES_TOTAL.inc(source="cancelled")
+        return
+    except Exception as e:
+        error = e
+        app.logger.error(f"Groq API streaming error: {e}")
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="stream", outcome="error")
+        LLM_ERRORS_TOTAL.inc(error=type(e).__name__)
+        CHAT_RESPONSES_TOTAL.inc(source="error")
+        if not deltas:
+            yield "Sorry, I am unable to process your request at the moment. Please try again later."
+            return
+    else:
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="stream", outcome="ok")
+        response_text = profile.finish("".join(deltas).strip())
+        if response_text: # Only complete answers are cached and remembered
+            cache_response(user_input, history, profile, response_text)
+            record_turn(key, user_input, personalize(response_text, user_name), "llm")
+        CHAT_RESPONSES_TOTAL.inc(source="llm")
+    finally:
+        if flight_key:
+            if response_text:
+                inflight_requests.finish(flight_key, flight, value=response_text)
+            else:
+                inflight_requests.finish(flight_key, flight, error=error or RuntimeError("Streaming request was cancelled"))
+
+    remainder = buffer.flush()
+    if speech is not None:
+        remainder = speech.finish(remainder) # A last sentence cut off by max_tokens is not spoken
+    if remainder:
+        yield personalize(remainder, user_name)
+    elif not said_something and response_text: # Nothing was speakable: say the profile's fallback
+        yield personalize(response_text, user_name)
 
 # --- Routes ---
 
 @app.route('/')
 def home():
-    """Renders the home page and initializes/checks query count for unauthenticated users."""
-    if not current_user.is_authenticated:
-        if 'query_count' not in session:
-            session['query_count'] = 0
-        
-    return render_template('index.html')
+    """Renders the home page."""
+    return render_template(
+        'index.html',
+        server_stt_available=speech_recognizer is not None,
+        server_tts_available=tts_cache is not None,
+        voice_socket_available=sock is not None,
+        welcome_turn=response_precache.welcome.data, # Inlined, so the first bot message needs no request
+    )
+
+def precomputed_response(payload, max_age=None):
+    """
+    Serves a precomputed JSON payload with its strong ETag; a GET whose If-None-Match matches
+    gets an empty 304. Without max_age, clients must revalidate before reusing it.
+    """
+    response = Response(payload.body, mimetype='application/json')
+    response.set_etag(payload.etag)
+    if max_age is None:
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+def rate_limit_identity():
+    """Returns the rate-limit tier and bucket identities of the caller (session and IP, or account)."""
+    if current_user.is_authenticated:
+        return "registered", {"user": current_user.id}
+    return "anonymous", {"session": conversation_key(), "ip": request.remote_addr}
+
+def rate_limit_rejection(tier, identities):
+    """Counts one query; returns the rejection payload once the caller's limits are used up, else None."""
+    if rate_limiter is None:
+        return None
+    allowed, retry_after = rate_limiter.hit(tier, identities)
+    if allowed:
+        return None
+    RATE_LIMIT_REJECTIONS_TOTAL.inc(tier=tier)
+    if tier.endswith("_tts"):
+        message = f"Too many speech requests. Please try again in {retry_after} seconds."
+    elif tier == "registered":
+        message = f"You're sending messages too quickly. Please try again in {retry_after} seconds."
+    else:
+        message = "Sorry, you have reached the query limit for unauthenticated users. Please register or log in."
+    return {"response": message, "limit_reached": True, "retry_after": retry_after}
+
+def rate_limit_response(rejection):
+    """Returns a rejection as a 429 response with Retry-After, or None if there is none."""
+    if rejection is None:
+        return None
+    response = jsonify(rejection)
+    response.status_code = 429 # Too Many Requests
+    response.headers['Retry-After'] = str(rejection["retry_after"])
+    return response
+
+def check_query_limit():
+    """
+    Counts the query against the caller's rate limits (session and IP for anonymous users,
+    account for registered users) and returns a 429 response with Retry-After once they are used up.
+    """
+    return rate_limit_response(rate_limit_rejection(*rate_limit_identity()))
+
+def check_speech_limit():
+    """Like check_query_limit, for one synthesized clip: same identities, separate buckets."""
+    tier, identities = rate_limit_identity()
+    return rate_limit_response(rate_limit_rejection(f"{tier}_tts", identities))
 
 @app.route('/chat', methods=['POST'])
 def chat():
     """
     Processes the chat message from the user, returns a text response, and controls the limit for unauthenticated users.
     """
-    if not current_user.is_authenticated:
-        session['query_count'] = session.get('query_count', 0) + 1
-        if session['query_count'] > 10: # Limit 10 queries
-            return jsonify({
-                "response": "Sorry, you have exceeded the 10-query limit for unauthenticated users. Please register or log in.",
-                "limit_reached": True
-            }), 403 # Forbidden
+    limit_response = check_query_limit()
+    if limit_response:
+        return limit_response
 
     try:
         user_input = request.json['message']
     except KeyError:
         return jsonify({"response": "Please provide a valid 'message' key in your request."}), 400
+    profile = response_profile(request.json.get('mode'))
+    if profile is None:
+        return jsonify({"response": "Unknown 'mode': use 'text' or 'voice'."}), 400
+
+    text_response = handle_user_input(user_input, profile)
+    payload = response_precache.chat_payload(text_response)
+    if payload is not None: # A fixed intent answer: skip serializing it again
+        return precomputed_response(payload)
 
-    text_response = handle_user_input(user_input)
-    
     return jsonify({
         "response": text_response
     })
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streams the response as Server-Sent Events, one event per sentence, so the client
+    can start speaking before the full completion has arrived.
+    """
+    limit_response = check_query_limit()
+    if limit_response:
+        return limit_response
+
+    try:
+        user_input = request.json['message']
+    except KeyError:
+        return jsonify({"response": "Please provide a valid 'message' key in your request."}), 400
+    profile = response_profile(request.json.get('mode'))
+    if profile is None:
+        return jsonify({"response": "Unknown 'mode': use 'text' or 'voice'."}), 400
+
+    # Update the session now: the session cookie is written before the body starts streaming
+    user_name = remember_user_name(user_input)
+    key = conversation_key()
+
+    def generate():
+        sentences = []
+        for sentence in stream_user_input(user_input, key, user_name, profile=profile):
+            sentences.append(sentence)
+            yield sse_event({"type": "sentence", "text": sentence})
+        yield sse_event({"type": "done", "response": " ".join(sentences)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/stt', methods=['GET'])
+def stt_status():
+    """Tells the client whether server speech recognition is available."""
+    return jsonify({"available": speech_recognizer is not None, "sample_rate": 16000})
+
+@app.route('/stt/stream', methods=['POST'])
+def stt_stream():
+    """
+    Transcribes raw 16-bit mono PCM (Content-Type: audio/l16; rate=16000), possibly a chunked
+    upload, and answers it in the same response: the transcript, then the /chat/stream events.
+    Audio is recognized as it arrives, so the transcript is ready as soon as the upload ends.
+    """
+    if speech_recognizer is None:
+        return jsonify({"response": "Server speech recognition is not available."}), 503
+    if request.mimetype not in ('audio/l16', 'audio/pcm'):
+        return jsonify({"response": "Send 16-bit mono PCM audio as audio/l16."}), 415
+    try:
+        sample_rate = int(request.mimetype_params.get('rate', '16000'))
+    except ValueError:
+        return jsonify({"response": "Invalid sample rate."}), 400
+    profile = response_profile(request.args.get('mode'), default="voice") # The answer is spoken
+    if profile is None:
+        return jsonify({"response": "Unknown 'mode': use 'text' or 'voice'."}), 400
+
+    limit_response = check_query_limit()
+    if limit_response:
+        return limit_response
+    if not speech_slots.acquire(blocking=False):
+        response = jsonify({"response": "Speech recognition is busy. Please try again in a moment."})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+
+    # Browsers upload half-duplex: nothing could reach the client before the upload ends, so
+    # the audio is transcribed here, and a spoken name is saved with this response's session
+    try:
+        with CHAT_STAGE_SECONDS.time(stage="speech_to_text"):
+            recognition = speech_recognizer.stream(sample_rate)
+            try:
+                for chunk in iter_pcm_chunks(request.stream, max_bytes=int(STT_MAX_SECONDS * sample_rate * 2)):
+                    recognition.accept(chunk, partial=False) # Nothing reaches the client before the upload ends
+            except AudioTooLong:
+                pass # Answer what was said within the limit
+            transcript = recognition.finish()
+    finally:
+        speech_slots.release()
+
+    key = conversation_key()
+    user_name = remember_user_name(transcript) if transcript else session.get('user_name')
+
+    def generate():
+        yield sse_event({"type": "transcript", "text": transcript})
+        if not transcript:
+            yield sse_event({"type": "done", "response": ""})
+            return
+        sentences = []
+        for sentence in stream_user_input(transcript, key, user_name, profile=profile):
+            sentences.append(sentence)
+            yield sse_event({"type": "sentence", "text": sentence})
+        yield sse_event({"type": "done", "response": " ".join(sentences)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/tts', methods=['GET'])
+def tts():
+    """
+    Returns one sentence as WAV audio. Clips are content-addressed, so the response carries a
+    strong ETag and supports Range requests; the client asks for each sentence as it streams in.
+    """
+    if tts_cache is None:
+        return jsonify({"response": "Server speech synthesis is not available."}), 503
+    limit_response = check_speech_limit()
+    if limit_response:
+        return limit_response
+    text = request.args.get('text', '').strip()
+    if not text or len(text) > TTS_MAX_CHARS:
+        return jsonify({"response": f"Provide 1 to {TTS_MAX_CHARS} characters of text."}), 400
+    try:
+        with CHAT_STAGE_SECONDS.time(stage="text_to_speech"):
+            key, path = tts_cache.get(text)
+    except SynthesisBusy:
+        response = jsonify({"response": "Speech synthesis is busy. Please try again in a moment."})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    except Exception as e:
+        app.logger.error(f"Speech synthesis error: {e}", exc_info=True)
+        return jsonify({"response": "Speech synthesis failed."}), 500
+    return send_file(path, mimetype='audio/wav', conditional=True, etag=key, max_age=86400)
+
+def voice_session(ws):
+    """
+    Duplex voice session: transcripts (or, with server speech recognition, streamed audio and partial
+    transcripts) in, streamed sentences (and, with ?audio=1, their audio clips) out.
+    Answers use the voice response profile unless a message asks for another "mode". The user's name,
+    conversation and rate-limit identity are resolved once when the socket opens, from the session
+    require_voice_session() checked. Sending {"type": "cancel"}, or a new message, interrupts the
+    answer in progress and aborts its Groq call.
+    """
+    key = existing_conversation_key()
+    tier, identities = rate_limit_identity()
+    user_names = [session.get('user_name')] # Remembered for this connection
+    with_audio = request.args.get('audio') == '1' and tts_cache is not None
+
+    def admit():
+        rejection = rate_limit_rejection(tier, identities)
+        return {"type": "error", **rejection} if rejection else None
+
+    def answer(text, cancel, mode=None):
+        profile = response_profile(mode, default="voice") # VoiceSession has refused unknown modes
+        if not user_names[0]:
+            user_names[0] = extract_name(text)
+        return stream_user_input(text, key, user_names[0], cancel, profile=profile)
+
+    def clip(sentence):
+        try:
+            _, path = tts_cache.get(sentence)
+            with open(path, 'rb') as clip_file:
+                return clip_file.read()
+        except Exception as e: # The client falls back to its own voice for this sentence
+            app.logger.warning(f"No audio for voice session sentence: {e}")
+            return None
+
+    def listen(sample_rate):
+        if not speech_slots.acquire(blocking=False):
+            return None
+        try:
+            return SlotStream(speech_recognizer.stream(sample_rate), speech_slots)
+        except Exception:
+            speech_slots.release()
+            raise
+
+    voice = VoiceSession(
+        ws.send, answer, admit=admit, clip=clip if with_audio else None, modes=list(response_profiles),
+        listen=listen if speech_recognizer is not None else None, max_audio_seconds=STT_MAX_SECONDS,
+    )
+    voice.send_event({"type": "ready", "audio": with_audio, "listen": speech_recognizer is not None})
+    try:
+        while not voice.closed:
+            voice.handle(ws.receive())
+    finally:
+        voice.close()
+
+@app.before_request
+def require_voice_session():
+    """
+    Refuses the /voice handshake until the caller has a conversation. Nothing sent over the socket
+    can save the session cookie, so a conversation (and rate-limit bucket) started there would be new on every reconnect.
+    """
+    if request.endpoint == 'voice_session' and existing_conversation_key() is None:
+        return jsonify({"response": "Send a message first; voice sessions continue an existing conversation."}), 403
+
+if sock is not None:
+    sock.route('/voice')(voice_session)
+
 @app.route('/start', methods=['GET'])
 def start():
     """Returns the bot's welcome message when the application starts."""
-    welcome_message = "Hello! Welcome to DevChatbot-AI. I'm here to help you with development, programming, and AI. Press the microphone button to start talking!"
-    return jsonify({
-        "response": welcome_message
-    })
+    return precomputed_response(response_precache.welcome, max_age=PRECACHE_MAX_AGE)
+
+@app.route('/healthz')
+def healthz():
+    """Liveness probe: the process is serving requests. Checks nothing else, so it never fails on a dependency."""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe: 200 when this worker can answer chats (database reachable, intents loaded), 503 otherwise."""
+    checks = {"llm": llm_backend.name if llm_backend else "disabled"} # Informational; intents still answer without it
+    if llm_backend is not None:
+        checks["llm_circuit"] = llm_backend.breaker.state
+    try:
+        db.session.execute(text("SELECT 1"))
+        checks["database"] = "ok"
+    except SQLAlchemyError as e:
+        app.logger.error(f"Readiness check: database unavailable: {e}")
+        checks["database"] = "unavailable"
+    checks["intents"] = "ok" if intent_index.intents.get('intents') else "missing"
+    ready = checks["database"] == "ok" and checks["intents"] == "ok"
+    response = jsonify({"status": "ready" if ready else "unavailable", "checks": checks})
+    response.status_code = 200 if ready else 503
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Exposes request metrics in the Prometheus text format (protected by METRICS_TOKEN if set)."""
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return Response("Unauthorized\n", status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/profile')
 @login_required # Only authenticated users can access
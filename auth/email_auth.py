@@ -1,12 +1,19 @@
 # auth/email_auth.py
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from models import User, db
+from chatbot.passwords import HashingBusy
 
 # Create an email authentication blueprint
 email_blueprint = Blueprint('email_auth', __name__, template_folder='templates')
 
+def hashing_busy_response():
+    """503 for a login or registration whose password hash was rejected (pool full) or timed out."""
+    flash('The server is busy right now. Please try again in a moment.', 'warning')
+    response = make_response(render_template('login.html'), 503)
+    response.headers['Retry-After'] = '5'
+    return response
+
 @email_blueprint.route('/register', methods=['GET', 'POST'])
 def register():
     """Manages the user registration page and its functionality."""
@@ -18,8 +25,10 @@ def register():
         email = request.form.get('email')
         password = request.form.get('password')
 
-        user_exists_email = User.query.filter_by(email=email).first()
-        user_exists_username = User.query.filter_by(username=username).first()
+        # One query for both uniqueness checks
+        existing_users = User.query.filter((User.email == email) | (User.username == username)).limit(2).all()
+        user_exists_email = any(u.email == email for u in existing_users)
+        user_exists_username = any(u.username == username for u in existing_users)
 
         if user_exists_email:
             flash('This email address is already registered.', 'warning')
@@ -33,7 +42,10 @@ def register():
             return redirect(url_for('email_auth.register'))
 
         new_user = User(username=username, email=email)
-        new_user.set_password(password) # Hash and save the password
+        try:
+            new_user.set_password(password) # Hash and save the password (in the hashing process pool)
+        except HashingBusy: # Also raised when hashing timed out
+            return hashing_busy_response()
         db.session.add(new_user)
         db.session.commit()
 
@@ -57,7 +69,17 @@ def login():
         # Try to find user by email or username
         user = User.query.filter((User.email == email_or_username) | (User.username == email_or_username)).first()
 
-        if not user or not user.check_password(password):
+        try:
+            password_ok = user is not None and user.check_password(password)
+            if password_ok and user.password_needs_rehash():
+                # Hashing parameters changed since this password was set: upgrade it transparently
+                user.set_password(password)
+                db.session.commit()
+        except HashingBusy: # Also raised when hashing timed out
+            db.session.rollback()
+            return hashing_busy_response()
+
+        if not password_ok:
             flash('Invalid email/username or password.', 'error')
             return redirect(url_for('email_auth.login'))
 
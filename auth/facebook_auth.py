@@ -9,7 +9,8 @@ from flask_dance.contrib.facebook import make_facebook_blueprint, facebook
 from flask_login import login_user, current_user, logout_user, login_required
 
 # Importing User and db from models.py
-from models import User, db
+from models import User, db, delete_user_transcripts
+from .oauth_users import find_oauth_user, create_oauth_user, UsernameUnavailable
 
 # Create the Facebook Blueprint
 facebook_blueprint = make_facebook_blueprint(
@@ -58,33 +59,20 @@ def facebook_callback():
             current_app.logger.error(f"Incomplete Facebook user data: {user_info}")
             return redirect(url_for("email_auth.login"))
 
-        # Find or create the user in your database
-        user = User.query.filter_by(facebook_id=user_info['id']).first()
-        if not user:
-            # Check if user with this email already exists
-            user_by_email = User.query.filter_by(email=user_info['email']).first() if 'email' in user_info else None
-            if user_by_email:
-                user_by_email.facebook_id = user_info['id']
-                user_by_email.avatar = user_info.get('picture', {}).get('data', {}).get('url', user_by_email.avatar)
-                user = user_by_email
-                db.session.commit()
-            else:
-                base_username = user_info['name']
-                unique_username = base_username
-                counter = 1
-                while User.query.filter_by(username=unique_username).first():
-                    unique_username = f"{base_username}{counter}"
-                    counter += 1
-                
-                user = User(
-                    email=user_info['email'],
-                    username=unique_username,
-                    facebook_id=user_info['id'],
-                    avatar=user_info.get('picture', {}).get('data', {}).get('url')
-                )
-                user.password_hash = None # We can leave it null if nullable
-                db.session.add(user)
-                db.session.commit()
+        # Find or create the user in your database (one lookup by Facebook ID or email)
+        user, by_facebook_id = find_oauth_user(User.facebook_id, user_info['id'], user_info['email'])
+        if user and not by_facebook_id:
+            # Link the Facebook account to the existing user with this email
+            user.facebook_id = user_info['id']
+            user.avatar = user_info.get('picture', {}).get('data', {}).get('url', user.avatar)
+            db.session.commit()
+        elif not user:
+            user = create_oauth_user(
+                user_info['name'],
+                email=user_info['email'],
+                facebook_id=user_info['id'],
+                avatar=user_info.get('picture', {}).get('data', {}).get('url')
+            )
         else:
             # Update existing user details (avoid updating username to prevent IntegrityError)
             user.avatar = user_info.get('picture', {}).get('data', {}).get('url', user.avatar)
@@ -95,6 +83,10 @@ def facebook_callback():
         flash("Successfully logged in with Facebook!", "success")
         return redirect(url_for("profile")) # Redirect to a protected user profile page
 
+    except UsernameUnavailable as e:
+        current_app.logger.warning(f"Facebook sign-up failed: {e}")
+        flash("We could not create your account right now. Please try again in a moment.", "error")
+        return redirect(url_for("email_auth.login"))
     except Exception as e:
         current_app.logger.error(f"Facebook authentication callback error: {str(e)}", exc_info=True)
         flash("An error occurred during authentication. Please try again.", "error")
@@ -158,13 +150,18 @@ def facebook_data_deletion_callback():
         if user_to_delete:
             # --- IMPLEMENT YOUR DATA DELETION LOGIC HERE ---
             # This is the critical part: Delete the user and all associated data.
+            # Chat transcripts first: turns still queued in this worker, then the stored rows.
+            # Other workers skip queued turns of users that no longer exist.
+            transcripts = current_app.extensions.get('transcripts')
+            if transcripts is not None:
+                transcripts.discard(lambda row: row['user_id'] == user_to_delete.id)
+            delete_user_transcripts(user_to_delete.id)
             # Example: Delete the User object from the database
             db.session.delete(user_to_delete)
             db.session.commit()
             current_app.logger.info(f"Successfully processed data deletion for Facebook ID: {user_facebook_id}.")
 
             # For real applications, you might also need to delete:
-            # - User-generated content (e.g., chat messages, posts)
             # - User preferences, settings
             # - Any other PII (Personally Identifiable Information) linked to this user.
             # Consider if you need to perform soft deletes (marking as deleted) or full hard deletes.
@@ -6,6 +6,7 @@ from flask_login import login_user, current_user
 
 # Importing User and db from models.py
 from models import User, db
+from .oauth_users import find_oauth_user, create_oauth_user, UsernameUnavailable
 
 # Create the Google Blueprint
 # Ensure GOOGLE_OAUTH_CLIENT_ID, GOOGLE_OAUTH_CLIENT_SECRET are set in your .env
@@ -56,34 +57,20 @@ def google_callback():
             current_app.logger.error(f"Incomplete Google user data: {user_info}")
             return redirect(url_for("email_auth.login"))
 
-        # Find or create the user in your database
-        user = User.query.filter_by(google_id=user_info['id']).first()
-        if not user:
-            # Check if user with this email already exists
-            user_by_email = User.query.filter_by(email=user_info['email']).first() if 'email' in user_info else None
-            if user_by_email:
-                user_by_email.google_id = user_info['id']
-                user_by_email.avatar = user_info.get('picture', user_by_email.avatar)
-                user = user_by_email
-                db.session.commit()
-            else:
-                base_username = user_info.get('name', user_info['email'].split('@')[0])
-                unique_username = base_username
-                counter = 1
-                while User.query.filter_by(username=unique_username).first():
-                    unique_username = f"{base_username}{counter}"
-                    counter += 1
-                    
-                user = User(
-                    email=user_info['email'],
-                    username=unique_username,
-                    google_id=user_info['id'],
-                    avatar=user_info.get('picture')
-                )
-                user.password_hash = None
-                
-                db.session.add(user)
-                db.session.commit()
+        # Find or create the user in your database (one lookup by Google ID or email)
+        user, by_google_id = find_oauth_user(User.google_id, user_info['id'], user_info['email'])
+        if user and not by_google_id:
+            # Link the Google account to the existing user with this email
+            user.google_id = user_info['id']
+            user.avatar = user_info.get('picture', user.avatar)
+            db.session.commit()
+        elif not user:
+            user = create_oauth_user(
+                user_info.get('name', user_info['email'].split('@')[0]),
+                email=user_info['email'],
+                google_id=user_info['id'],
+                avatar=user_info.get('picture')
+            )
         else:
             # Update existing user details (DO NOT blindly update username if it can throw IntegrityError)
             user.avatar = user_info.get('picture', user.avatar) 
@@ -94,6 +81,10 @@ def google_callback():
         flash("Successfully logged in with Google!", "success")
         return redirect(url_for("profile")) # Redirect to a protected user profile page
 
+    except UsernameUnavailable as e:
+        current_app.logger.warning(f"Google sign-up failed: {e}")
+        flash("We could not create your account right now. Please try again in a moment.", "error")
+        return redirect(url_for("email_auth.login"))
     except Exception as e:
         current_app.logger.error(f"Google authentication callback error: {str(e)}", exc_info=True)
         flash("An error occurred during authentication. Please try again.", "error")
@@ -0,0 +1,74 @@
+# auth/oauth_users.py
+import re
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from models import User, db
+
+USERNAME_MAX_LENGTH = User.__table__.c.username.type.length
+CREATE_ATTEMPTS = 5 # Retries when a concurrent sign-up takes the same username
+
+
+class UsernameUnavailable(Exception):
+    """Raised when no free username could be claimed after CREATE_ATTEMPTS tries."""
+
+
+def find_oauth_user(provider_column, provider_id, email):
+    """
+    Looks up a user by provider id or email in one query.
+    Returns (user, matched_by_provider); a provider-id match wins over an email match.
+    """
+    candidates = User.query.filter(or_(provider_column == provider_id, User.email == email)).limit(2).all()
+    for candidate in candidates:
+        if getattr(candidate, provider_column.key) == provider_id:
+            return candidate, True
+    return (candidates[0] if candidates else None), False
+
+
+def allocate_username(base_username):
+    """
+    Returns base_username, or base_username followed by the next free numeric suffix.
+    Every taken "base" / "baseN" name is fetched in one query.
+    """
+    base_username = (base_username or '').strip()[:USERNAME_MAX_LENGTH - 6] or 'user'
+    # A range comparison (base <= username < base + U+FFFF) can use the username index, unlike LIKE with an
+    # escape clause. It may also return names of another case or, under a linguistic collation, names that
+    # merely sort between the bounds; only "base" and "baseN" are kept below.
+    taken = db.session.scalars(
+        db.select(User.username).where(User.username >= base_username, User.username < base_username + '\uffff')
+    ).all()
+    suffix = re.compile(re.escape(base_username) + r'(\d+)')
+    used = set()
+    for name in taken:
+        if name == base_username:
+            used.add(0)
+        else:
+            match = suffix.fullmatch(name)
+            if match:
+                used.add(int(match.group(1)))
+    if 0 not in used:
+        return base_username
+    return f"{base_username}{max(used) + 1}"
+
+
+def create_oauth_user(base_username, **fields):
+    """
+    Creates and commits a new user with a unique username derived from base_username.
+    A username taken between allocation and insert (unique constraint violation) is retried
+    with a freshly allocated name instead of pre-checking candidates one query at a time.
+    Raises UsernameUnavailable if every attempt collided.
+    """
+    for attempt in range(CREATE_ATTEMPTS):
+        user = User(username=allocate_username(base_username), **fields)
+        user.password_hash = None # OAuth accounts have no local password
+        db.session.add(user)
+        try:
+            db.session.commit()
+            return user
+        except IntegrityError:
+            db.session.rollback()
+            # Only a username collision is worth retrying; a duplicate email or provider id is a real conflict
+            if db.session.scalar(db.select(User.id).where(User.username == user.username)) is None:
+                raise
+            if attempt == CREATE_ATTEMPTS - 1:
+                raise UsernameUnavailable(f"No free username for {base_username!r} after {CREATE_ATTEMPTS} attempts") from None
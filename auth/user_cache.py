@@ -0,0 +1,83 @@
+# auth/user_cache.py
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from chatbot.cache import MemoryCacheBackend
+from models import User, db
+
+
+class UserIdentity(UserMixin):
+    """
+    Read-only copy of the User fields that views and templates use through current_user.
+    It is not attached to a database session, so one instance can be shared between requests.
+    """
+
+    def __init__(self, id, username, email, avatar):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.avatar = avatar
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email, user.avatar)
+
+    def __repr__(self):
+        return f'<UserIdentity {self.username}>'
+
+
+class UserCache:
+    """
+    Process-local LRU cache of user identities with a TTL, so requests from logged-in users
+    (every /chat message included) do not query the database.
+    Entries are dropped as soon as the User row is updated or deleted in this process;
+    other gunicorn workers pick up the change when their entry expires.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60):
+        self.backend = MemoryCacheBackend(max_entries=max_entries, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, user_id):
+        """Returns the identity of the user, or None if the user does not exist."""
+        identity = self.backend.get(user_id)
+        if identity is not None:
+            self.hits += 1
+            return identity
+        self.misses += 1
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None # Not cached, so a re-created id is picked up immediately
+        identity = UserIdentity.from_user(user)
+        self.backend.set(user_id, identity)
+        return identity
+
+    def invalidate(self, user_id):
+        self.backend.delete(user_id)
+
+    def clear(self):
+        self.backend.clear()
+
+
+def register_invalidation(cache):
+    """Invalidates cached identities whenever a User row is updated or deleted through the ORM."""
+
+    def on_change(mapper, connection, target):
+        cache.invalidate(target.id)
+        session = object_session(target)
+        if session is not None: # Drop it again after commit, in case it was re-read before the commit
+            session.info.setdefault('changed_user_ids', set()).add(target.id)
+
+    def after_commit(session):
+        for user_id in session.info.pop('changed_user_ids', ()):
+            cache.invalidate(user_id)
+
+    def after_rollback(session):
+        session.info.pop('changed_user_ids', None)
+
+    event.listen(User, 'after_update', on_change)
+    event.listen(User, 'after_delete', on_change)
+    event.listen(Session, 'after_commit', after_commit)
+    event.listen(Session, 'after_rollback', after_rollback)
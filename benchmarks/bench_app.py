@@ -0,0 +1,307 @@
+# benchmarks/bench_app.py
+"""
+End-to-end benchmarks for /chat, /start and the email login flow.
+
+Runs against the real app, either in-process through the Flask test client or through a
+gunicorn server started for the run. LLM fallbacks go to the local stub server, so no Groq
+quota or network access is needed. Results are written as JSON (one file per run) and can be
+compared with an earlier run:
+
+    python benchmarks/bench_app.py --mode client --requests 500
+    python benchmarks/bench_app.py --mode gunicorn --workers 2 --concurrency 16
+    python benchmarks/bench_app.py --baseline benchmarks/results/<earlier run>.json
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chatbot.stub_server import StubSettings, make_server # noqa: E402
+
+BENCH_USER = {"username": "bench_user", "email": "bench@example.com", "password": "bench-password"}
+# Answers /chat gives with HTTP 200 when the LLM call failed; they do not count as answered
+FAILURE_PREFIXES = ("Sorry, ", "The AI service is having trouble")
+
+
+def answered(status_code, payload):
+    """True if a /chat response carries a real answer, not a 200 with an apology."""
+    response_text = (payload or {}).get("response", "")
+    return status_code == 200 and bool(response_text) and not response_text.startswith(FAILURE_PREFIXES)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p95_ms": to_ms(percentile(latencies, 0.95)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+    }
+
+
+def run_scenario(request_fn, total, concurrency):
+    """Calls request_fn(i) total times from `concurrency` threads; request_fn returns True on success."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = request_fn(i)
+        except Exception:
+            ok = False
+        duration = time.perf_counter() - start
+        with lock:
+            latencies.append(duration)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def rss_mb(pid):
+    """Resident set size of a process in MB (Linux only, None elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def child_pids(parent_pid):
+    pids = []
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                if int(stat.read().rsplit(")", 1)[1].split()[1]) == parent_pid:
+                    pids.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return pids
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_environment(args, stub_url):
+    """Points the app at a throwaway database and the stub LLM server."""
+    database_path = os.path.join(tempfile.mkdtemp(prefix="chatbot-bench-"), "bench.db")
+    env = {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database_path}",
+        "LLM_BACKEND": "stub",
+        "LLM_STUB_URL": stub_url,
+        "SECRET_KEY": "benchmark-secret",
+        "RATE_LIMIT_ANONYMOUS_IP": "off", # Every benchmark request comes from 127.0.0.1
+    }
+    if not args.cache:
+        env["RESPONSE_CACHE_BACKEND"] = "none"
+    os.environ.update(env)
+    return env
+
+
+def create_bench_user():
+    from app import app
+    from models import User, db
+    with app.app_context():
+        if not User.query.filter_by(email=BENCH_USER["email"]).first():
+            user = User(username=BENCH_USER["username"], email=BENCH_USER["email"])
+            user.set_password(BENCH_USER["password"])
+            db.session.add(user)
+            db.session.commit()
+
+
+def client_scenarios(args):
+    """Scenarios driven in-process through the Flask test client."""
+    from app import app
+    counter = itertools.count()
+
+    def chat(message, client=None):
+        client = client or app.test_client() # A fresh client is a fresh anonymous session
+        return client.post("/chat", json={"message": message})
+
+    def llm_answered(response):
+        return answered(response.status_code, response.get_json(silent=True))
+
+    limited_client = app.test_client()
+    for _ in range(10):
+        chat("hello", limited_client)
+
+    scenarios = {
+        "start": lambda i: app.test_client().get("/start").status_code == 200,
+        "intent_hit": lambda i: chat("Hello, how are you?").status_code == 200,
+        "llm_fallback": lambda i: llm_answered(chat(f"Explain topic number {next(counter)}")),
+        "anonymous_limit": lambda i: chat("hello", limited_client).status_code == 429,
+        "email_login": lambda i: app.test_client().post("/login", data={
+            "email_or_username": BENCH_USER["email"], "password": BENCH_USER["password"],
+        }).headers.get("Location", "").endswith("/profile"),
+    }
+    return scenarios, (lambda: {"benchmark_process": rss_mb(os.getpid())})
+
+
+def gunicorn_scenarios(args, env):
+    """Scenarios driven over HTTP against a gunicorn server started for the run."""
+    import requests
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py",
+         "--bind", f"127.0.0.1:{args.port}", "--workers", str(args.workers), "app:app"],
+        cwd=ROOT, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while True:
+        try:
+            if requests.get(f"{base_url}/start", timeout=1).ok:
+                break
+        except requests.RequestException:
+            pass
+        if time.time() > deadline or process.poll() is not None:
+            process.terminate()
+            raise RuntimeError("gunicorn did not start")
+        time.sleep(0.2)
+
+    counter = itertools.count()
+
+    def chat(message, http=None):
+        return (http or requests).post(f"{base_url}/chat", json={"message": message}, timeout=60)
+
+    def llm_answered(response):
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        return answered(response.status_code, payload)
+
+    limited_session = requests.Session()
+    for _ in range(10):
+        chat("hello", limited_session)
+
+    scenarios = {
+        "start": lambda i: requests.get(f"{base_url}/start", timeout=60).ok,
+        "intent_hit": lambda i: chat("Hello, how are you?").ok,
+        "llm_fallback": lambda i: llm_answered(chat(f"Explain topic number {next(counter)}")),
+        "anonymous_limit": lambda i: chat("hello", limited_session).status_code == 429,
+        "email_login": lambda i: requests.post(f"{base_url}/login", data={
+            "email_or_username": BENCH_USER["email"], "password": BENCH_USER["password"],
+        }, allow_redirects=False, timeout=60).headers.get("Location", "").endswith("/profile"),
+    }
+
+    def memory():
+        return {f"worker_{pid}": rss_mb(pid) for pid in child_pids(process.pid)}
+
+    return scenarios, memory, process
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    if baseline.get("mode") != results["mode"]:
+        print(f"  Note: the baseline was run in {baseline.get('mode')!r} mode, this run in {results['mode']!r} mode.")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+            if current.get(metric) and previous.get(metric):
+                change = (current[metric] - previous[metric]) / previous[metric] * 100
+                print(f"  {name:16} {metric:7} {previous[metric]:>10} -> {current[metric]:>10} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /chat, /start and email login.")
+    parser.add_argument("--mode", choices=("client", "gunicorn"), default="client")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers (gunicorn mode)")
+    parser.add_argument("--port", type=int, default=8099, help="gunicorn port (gunicorn mode)")
+    parser.add_argument("--scenario", action="append", help="run only these scenarios")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--stub-latency", type=float, default=0.2)
+    parser.add_argument("--stub-token-rate", type=float, default=200)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    stub = make_server("127.0.0.1", 0, StubSettings(latency=args.stub_latency, token_rate=args.stub_token_rate))
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    env = prepare_environment(args, f"http://127.0.0.1:{stub.server_port}")
+    os.chdir(ROOT) # The app loads data/intents.json relative to the working directory
+    create_bench_user()
+
+    process = None
+    if args.mode == "client":
+        scenarios, memory = client_scenarios(args)
+    else:
+        scenarios, memory, process = gunicorn_scenarios(args, env)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mode": args.mode,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "workers": args.workers if args.mode == "gunicorn" else None,
+        "scenarios": {},
+    }
+    try:
+        for name, request_fn in scenarios.items():
+            if args.scenario and name not in args.scenario:
+                continue
+            results["scenarios"][name] = summary = run_scenario(request_fn, args.requests, args.concurrency)
+            print(f"{name:16} p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms "
+                  f"p99={summary['p99_ms']}ms rps={summary['rps']} errors={summary['errors']}")
+        results["rss_mb"] = memory()
+        print(f"RSS (MB): {results['rss_mb']}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        stub.shutdown()
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{time.strftime('%Y%m%d-%H%M%S')}-{results['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
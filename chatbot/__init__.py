@@ -0,0 +1,19 @@
+# chatbot/__init__.py
+from .intents import IntentIndex
+from .streaming import SentenceBuffer, split_sentences, sse_event
+from .llm import AsyncGroqRunner, LLMBackend, GroqBackend, CancelToken, StreamCancelled, create_llm_backend
+from .cache import prompt_key, ResponseCache, MemoryCacheBackend, SQLiteCacheBackend, create_response_cache
+from .conversation import ConversationStore
+from .singleflight import SingleFlight, SingleFlightTimeout
+from .metrics import MetricsRegistry
+from .passwords import PasswordHasher, HashingBusy, HashingTimeout
+from .database import engine_options
+from .ratelimit import Limit, RateLimiter, MemoryRateLimitBackend, SQLiteRateLimitBackend, create_rate_limiter
+from .speech import iter_pcm_chunks, AudioTooLong, SpeechRecognizer, SlotStream, create_speech_recognizer
+from .tts import SpeechSynthesizer, AudioClipCache, SynthesisBusy, create_speech_synthesizer
+from .voice import VoiceSession
+from .precache import PrecomputedPayload, ResponsePrecache
+from .writebehind import WriteBehindBuffer
+from .sessions import ServerSideSession, ServerSessionInterface, MemorySessionBackend, SQLiteSessionBackend, create_session_interface
+from .resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded, ResilientBackend, create_resilient_backend
+from .profiles import ResponseProfile, SpeakableFilter, speakable, create_response_profiles
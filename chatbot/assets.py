@@ -0,0 +1,154 @@
+# chatbot/assets.py
+"""
+Static asset pipeline. `python -m chatbot.assets` compiles the purged, minified Tailwind CSS,
+then copies every static file to static/dist/ under a content-hashed name, with pre-compressed
+.gz/.br variants and a manifest.json mapping original names to hashed ones.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+ENCODINGS = (("br", ".br"), ("gzip", ".gz")) # In order of preference
+
+
+class AssetManifest:
+    """
+    Maps static file names to their fingerprinted copies in static/dist/, as written by build_assets().
+    Without a manifest (e.g. in development) every name maps to itself and files are served as they are.
+    """
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.files = {} # Original name -> fingerprinted name, relative to the static folder
+        self.encodings = {} # Fingerprinted name -> available pre-compressed encodings
+        self.load()
+
+    def load(self):
+        manifest_path = os.path.join(self.static_folder, DIST_DIR, MANIFEST_NAME)
+        try:
+            with open(manifest_path, encoding="utf-8") as manifest_file:
+                manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            return False
+        self.files = {name: f"{DIST_DIR}/{entry['path']}" for name, entry in manifest.items()}
+        self.encodings = {f"{DIST_DIR}/{entry['path']}": entry.get("encodings", []) for entry in manifest.values()}
+        return True
+
+    @property
+    def built(self):
+        return bool(self.files)
+
+    def lookup(self, filename):
+        """Returns the fingerprinted name of a static file, or filename itself if it has none."""
+        return self.files.get(filename, filename)
+
+    def exists(self, filename):
+        return filename in self.files or os.path.isfile(os.path.join(self.static_folder, filename))
+
+    def is_fingerprinted(self, filename):
+        return filename in self.encodings
+
+    def best_encoding(self, filename, accept_encodings):
+        """Returns (content_encoding, file_suffix) of the best pre-compressed variant the client accepts, or (None, '')."""
+        available = self.encodings.get(filename, [])
+        for encoding, suffix in ENCODINGS:
+            if encoding in available and accept_encodings[encoding]:
+                return encoding, suffix
+        return None, ""
+
+
+def fingerprint(path, length=10):
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()[:length]
+
+
+def compress_variants(path):
+    """Writes .br (if the brotli package is installed) and .gz copies that are smaller than path; returns their encodings."""
+    with open(path, "rb") as source:
+        data = source.read()
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli # Optional dependency
+        variants["br"] = brotli.compress(data, quality=11)
+    except ImportError:
+        pass
+    written = []
+    for encoding, suffix in ENCODINGS:
+        compressed = variants.get(encoding)
+        if compressed is not None and len(compressed) < len(data):
+            with open(path + suffix, "wb") as target:
+                target.write(compressed)
+            written.append(encoding)
+    return written
+
+
+def build_css(tailwind_command, config="tailwind.config.js", source="static/src/app.css", output="static/css/app.css"):
+    """Runs the Tailwind CLI, which keeps only the classes used by the templates and scripts, minified."""
+    command = shlex.split(tailwind_command) + ["-c", config, "-i", source, "-o", output, "--minify"]
+    print(f"Compiling CSS: {' '.join(command)}")
+    subprocess.run(command, check=True)
+
+
+def build_assets(static_folder):
+    """Rebuilds static/dist/ and its manifest from the files in static_folder; returns the manifest."""
+    dist_folder = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist_folder, ignore_errors=True)
+    manifest = {}
+    for root, directories, files in os.walk(static_folder):
+        relative_root = os.path.relpath(root, static_folder)
+        if relative_root == ".":
+            directories[:] = [name for name in directories if name not in (DIST_DIR, "src")]
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            if os.path.getsize(source) == 0:
+                continue
+            logical_name = os.path.normpath(os.path.join(relative_root, name)).replace(os.sep, "/")
+            stem, extension = os.path.splitext(logical_name)
+            hashed_name = f"{stem}.{fingerprint(source)}{extension}"
+            target = os.path.join(dist_folder, hashed_name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            mimetype = mimetypes.guess_type(name)[0] or ""
+            encodings = compress_variants(target) if mimetype.startswith(COMPRESSIBLE_TYPES) else []
+            manifest[logical_name] = {"path": hashed_name, "encodings": encodings}
+    with open(os.path.join(dist_folder, MANIFEST_NAME), "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the fingerprinted, pre-compressed static assets.")
+    parser.add_argument("--static", default="static", help="Static folder (default: static)")
+    parser.add_argument(
+        "--tailwind", default=os.getenv("TAILWIND_CMD", "npx --yes tailwindcss@3.4.17"),
+        help="Tailwind CLI command (default: $TAILWIND_CMD or npx)",
+    )
+    parser.add_argument("--skip-css", action="store_true", help="Use the already compiled static/css/app.css")
+    args = parser.parse_args(argv)
+    if not args.skip_css:
+        try:
+            build_css(args.tailwind, output=os.path.join(args.static, "css", "app.css"))
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"ERROR: Could not compile the CSS: {e}")
+            return 1
+    manifest = build_assets(args.static)
+    compressed = sum(1 for entry in manifest.values() if entry["encodings"])
+    print(f"Built {len(manifest)} assets ({compressed} pre-compressed) into {os.path.join(args.static, DIST_DIR)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
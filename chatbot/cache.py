@@ -0,0 +1,192 @@
+# chatbot/cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(text):
+    """Normalizes user input so trivially different phrasings share a cache entry."""
+    text = re.sub(r"\s+", " ", text.lower()).strip()
+    return text.rstrip("?!. ")
+
+
+def prompt_key(prompt, model):
+    """Returns a stable key for a user prompt sent to a model."""
+    return hashlib.sha256(f"{model}\x00{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """Process-local LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """
+    LRU cache with a TTL stored in a SQLite file, so every gunicorn worker on the host shares the same hits.
+    Each thread uses its own connection; WAL mode lets readers run while another worker writes.
+    """
+
+    def __init__(self, path, max_entries=10000, ttl=3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_last_used ON response_cache (last_used)")
+        self.close() # Built at import, in the preloaded master: no SQLite handle may cross fork
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Closes this thread's connection; the next call opens a new one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= now:
+            conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, value, now + self.ttl, now),
+        )
+        # Evict expired rows first, then the least recently used ones above the size bound
+        conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM response_cache WHERE key IN ("
+            "SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connect().execute("DELETE FROM response_cache")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Caches LLM responses keyed on the normalized user input and the model name."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock() # Request threads update the counters concurrently
+
+    def get(self, prompt, model):
+        """Returns the cached response, or None on a miss."""
+        value = self.backend.get(prompt_key(prompt, model))
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, prompt, model, response):
+        self.backend.set(prompt_key(prompt, model), response)
+
+    def stats(self):
+        """Returns the hit/miss counters of this process."""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "size": len(self.backend),
+        }
+
+
+def create_response_cache(instance_path):
+    """
+    Builds the response cache configured by environment variables:
+    RESPONSE_CACHE_BACKEND ('memory', 'sqlite' or 'none'), RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL (seconds) and RESPONSE_CACHE_PATH (for the SQLite backend,
+    default response_cache.db in the app's instance_path).
+    """
+    backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+    max_entries = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+    ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+    if backend_name == "none":
+        return None
+    if backend_name == "sqlite":
+        path = os.getenv("RESPONSE_CACHE_PATH") or os.path.join(instance_path, "response_cache.db")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return ResponseCache(SQLiteCacheBackend(path, max_entries=max_entries, ttl=ttl))
+    if backend_name != "memory":
+        raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {backend_name!r}")
+    return ResponseCache(MemoryCacheBackend(max_entries=max_entries, ttl=ttl))
@@ -0,0 +1,111 @@
+# chatbot/conversation.py
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+_FIRST_SENTENCE = re.compile(r"^(.+?[.!?])(?:\s|$)", re.DOTALL)
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+def _gist(text, max_chars=160):
+    """Shortens a turn to its first sentence for the running summary."""
+    text = " ".join(text.split())
+    match = _FIRST_SENTENCE.match(text)
+    if match:
+        text = match.group(1)
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + "..."
+
+
+class _Conversation:
+    __slots__ = ("turns", "tokens", "summary")
+
+    def __init__(self):
+        self.turns = deque() # (role, text, tokens) tuples, oldest first
+        self.tokens = 0
+        self.summary = ""
+
+
+class ConversationStore:
+    """
+    Keeps the recent turns of each chat in memory so follow-up questions reach Groq with context.
+    Each conversation is trimmed to a token budget; turns that fall out of the window are folded
+    into a short running summary. Idle conversations are evicted, and the number of live
+    conversations is capped, so memory stays flat however many chats are open.
+    """
+
+    def __init__(self, token_budget=1500, summary_budget=200, max_conversations=10000, idle_timeout=1800):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.max_conversations = max_conversations
+        self.idle_timeout = idle_timeout
+        self._conversations = OrderedDict() # key -> (last_seen, _Conversation), least recently used first
+        self._lock = threading.Lock()
+
+    def messages(self, key):
+        """Returns the stored history of a conversation as Groq chat messages."""
+        with self._lock:
+            conversation = self._touch(key, create=False)
+            if conversation is None:
+                return []
+            messages = []
+            if conversation.summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation: {conversation.summary}"})
+            messages.extend({"role": role, "content": text} for role, text, _ in conversation.turns)
+            return messages
+
+    def append(self, key, user_text, assistant_text):
+        """Records one exchange and trims the conversation back under its token budget."""
+        with self._lock:
+            conversation = self._touch(key, create=True)
+            for role, text in (("user", user_text), ("assistant", assistant_text)):
+                tokens = estimate_tokens(text)
+                conversation.turns.append((role, text, tokens))
+                conversation.tokens += tokens
+            while conversation.tokens > self.token_budget and len(conversation.turns) > 2:
+                role, text, tokens = conversation.turns.popleft()
+                conversation.tokens -= tokens
+                self._summarize(conversation, role, text)
+
+    def clear(self, key):
+        with self._lock:
+            self._conversations.pop(key, None)
+
+    def __len__(self):
+        return len(self._conversations)
+
+    def _summarize(self, conversation, role, text):
+        speaker = "User asked" if role == "user" else "You answered"
+        summary = f"{conversation.summary} {speaker}: {_gist(text)}".strip()
+        max_chars = self.summary_budget * 4
+        if len(summary) > max_chars: # Forget the oldest part of the summary first
+            summary = "..." + summary[-(max_chars - 3):]
+        conversation.summary = summary
+
+    def _touch(self, key, create):
+        now = time.monotonic()
+        self._evict_idle(now)
+        entry = self._conversations.get(key)
+        if entry is None:
+            if not create:
+                return None
+            conversation = _Conversation()
+        else:
+            conversation = entry[1]
+        self._conversations[key] = (now, conversation)
+        self._conversations.move_to_end(key)
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+        return conversation
+
+    def _evict_idle(self, now):
+        # Entries are ordered by last use, so only the idle ones at the front are visited
+        while self._conversations:
+            key, (last_seen, _) = next(iter(self._conversations.items()))
+            if now - last_seen < self.idle_timeout:
+                break
+            del self._conversations[key]
@@ -0,0 +1,47 @@
+# chatbot/database.py
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+
+
+def engine_options(database_uri, pool_size=None):
+    """
+    SQLAlchemy engine options for the configured database.
+    SQLite gets a connection per request thread (WAL lets readers run alongside the writer);
+    Postgres gets a sized QueuePool with pre-ping and recycling of stale connections.
+    """
+    pool_size = pool_size or int(os.getenv('DB_POOL_SIZE', os.getenv('GUNICORN_THREADS', '32')))
+    url = make_url(database_uri)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return {} # In-memory databases keep SQLAlchemy's single shared connection
+        return {
+            'pool_size': pool_size,
+            'max_overflow': 0,
+            'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            'connect_args': {
+                'check_same_thread': False, # Connections are handed between threads by the pool
+                'timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', '5')), # Wait this long for the writer lock
+            },
+        }
+    return {
+        'pool_size': pool_size,
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')), # Seconds; below typical proxy/server idle cutoffs
+        'pool_pre_ping': True, # Replaces connections dropped by the server instead of failing the request
+    }
+
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Applies WAL journaling and the busy timeout to every new SQLite connection."""
+    if type(dbapi_connection).__module__ != 'sqlite3':
+        return
+    busy_timeout_ms = int(float(os.getenv('SQLITE_BUSY_TIMEOUT', '5')) * 1000)
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL') # Persistent: readers no longer block on the writer
+    cursor.execute('PRAGMA synchronous=NORMAL') # Safe with WAL; fsync only at checkpoints
+    cursor.execute(f'PRAGMA busy_timeout={busy_timeout_ms}')
+    cursor.close()
@@ -0,0 +1,162 @@
+# chatbot/intents.py
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from .semantic import SemanticIntentClassifier
+
+logger = logging.getLogger(__name__)
+
+
+class _IntentSnapshot:
+    """Immutable view of one successfully loaded version of intents.json."""
+
+    def __init__(self, data, digest, matcher, fallback, classifier=None):
+        self.data = data
+        self.digest = digest
+        self.matcher = matcher # Single compiled regex covering every intent, or None
+        self.fallback = fallback # Per-intent compiled regexes, used only if the combined regex failed to build
+        self.classifier = classifier # Similarity classifier for paraphrases the regexes miss, or None
+
+    def match(self, text):
+        """
+        Returns the first intent (in file order) whose patterns match the text,
+        otherwise the most similar intent if it is above the similarity threshold.
+        """
+        intents = self.data["intents"]
+        if self.matcher is not None:
+            found = self.matcher.match(text)
+            if found:
+                return intents[int(found.lastgroup[1:])]
+        else:
+            for index, regex in self.fallback:
+                if regex.search(text):
+                    return intents[index]
+        if self.classifier is not None:
+            index = self.classifier.classify(text)
+            if index is not None:
+                return intents[index]
+        return None
+
+
+def _compile_snapshot(data, digest, semantic_threshold=None):
+    """Precompiles the patterns of every intent into a single alternation."""
+    branches = []
+    fallback = []
+    for index, intent in enumerate(data.get("intents", [])):
+        patterns = []
+        for pattern in intent.get("patterns", []):
+            pattern = pattern.lower()
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                logger.warning(f"Skipping invalid pattern {pattern!r} in intent {intent.get('tag')!r}: {e}")
+                continue
+            patterns.append(f"(?:{pattern})")
+        if not patterns:
+            continue
+        alternation = "|".join(patterns)
+        fallback.append((index, re.compile(alternation)))
+        # Each branch looks ahead through the whole input, so intents keep the same
+        # priority they had when they were scanned one by one in file order.
+        branches.append(rf"(?=[\s\S]*?(?:{alternation}))(?P<i{index}>)")
+
+    matcher = None
+    if branches:
+        try:
+            matcher = re.compile("|".join(branches))
+        except re.error as e:
+            logger.warning(f"Could not build combined intent matcher, using per-intent matching: {e}")
+
+    classifier = None
+    if semantic_threshold is not None:
+        classifier = SemanticIntentClassifier(data.get("intents", []), threshold=semantic_threshold)
+    return _IntentSnapshot(data, digest, matcher, fallback, classifier)
+
+
+class IntentIndex:
+    """
+    Keeps intents.json parsed and compiled in memory.
+    The file is only re-read when its mtime or size changes, and only recompiled when its content hash changes.
+    Pass semantic_threshold to also match paraphrases by n-gram similarity when no pattern matches.
+    """
+
+    def __init__(self, path, check_interval=2.0, semantic_threshold=None):
+        self.path = path
+        self.check_interval = check_interval # Seconds between stat() calls on the file
+        self.semantic_threshold = semantic_threshold
+        self._lock = threading.Lock()
+        self._snapshot = _compile_snapshot({"intents": []}, None)
+        self._signature = None
+        self._next_check = 0.0
+
+    @property
+    def intents(self):
+        """Returns the currently loaded intents.json data."""
+        return self._current().data
+
+    def match(self, user_input):
+        """Returns the matching intent for the user input, or None."""
+        return self._current().match(user_input.lower())
+
+    def reload(self, force=False):
+        """Reloads the file if it changed on disk. Returns True when a new version was swapped in."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now < self._next_check:
+                return False # Another thread just checked
+            self._next_check = now + self.check_interval
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self._signature is not None or force:
+                    print("Error: intents.json file not found. Please ensure it is in the 'data' folder.")
+                self._signature = None
+                return False
+
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature and not force:
+                return False
+
+            try:
+                with open(self.path, 'rb') as file:
+                    raw = file.read()
+            except OSError as e:
+                logger.error(f"Could not read {self.path}: {e}")
+                return False
+            self._signature = signature
+
+            digest = hashlib.sha256(raw).hexdigest()
+            if digest == self._snapshot.digest:
+                return False # Touched but unchanged
+
+            try:
+                text = raw.decode('utf-8')
+                if text.strip().startswith("<!DOCTYPE html>"):
+                    raise ValueError("Error: An HTML page is being loaded instead of intents.json!")
+                data = json.loads(text)
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                print("Error: intents.json is not in a valid JSON format. Check its format.")
+                return False # Keep serving the last good version
+            except ValueError as e:
+                print(e)
+                return False
+
+            if not isinstance(data, dict):
+                print("Error: intents.json must contain a JSON object with an 'intents' list.")
+                return False # Keep serving the last good version
+            if not isinstance(data.get("intents"), list):
+                data = {"intents": []}
+            data["intents"] = [intent for intent in data["intents"] if isinstance(intent, dict)]
+            self._snapshot = _compile_snapshot(data, digest, self.semantic_threshold) # Single reference swap, readers never see a partial index
+            logger.info(f"Loaded {len(data['intents'])} intents from {self.path}")
+            return True
+
+    def _current(self):
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        return self._snapshot
@@ -0,0 +1,249 @@
+# chatbot/llm.py
+import asyncio
+import concurrent.futures
+import os
+import queue
+import threading
+
+_STREAM_END = object() # Marks the end of a bridged stream
+
+
+class StreamCancelled(Exception):
+    """Raised by a stream (or completion) whose CancelToken was cancelled."""
+
+
+class CancelToken:
+    """
+    Lets another thread abort a streaming call, e.g. when the user interrupts the bot (barge-in).
+    The upstream request is cancelled immediately, not when the next chunk arrives.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """Runs callback once the token is cancelled (right away if it already is)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
+class AsyncGroqRunner:
+    """
+    Runs every Groq call on one background event loop, sharing a single pooled httpx connection.
+    Request threads only wait on a future, so many slow completions can be in flight per process
+    without each one holding its own connection. groq and httpx are imported, and the loop and client
+    created, on first use in each process: never in a parent that forks workers.
+    """
+
+    def __init__(self, api_key, base_url=None, max_connections=100, max_keepalive_connections=20, timeout=60.0):
+        self.api_key = api_key
+        self.base_url = base_url # None means the public Groq API
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+        self._pid = None
+
+    def start(self):
+        """Creates the event loop and client in this process now instead of on the first call."""
+        self._ensure_started()
+
+    def complete(self, messages, model, cancel=None, **kwargs):
+        """
+        Returns a full chat completion, blocking only the calling thread.
+        Cancelling `cancel` (a CancelToken) aborts the upstream call and raises StreamCancelled.
+        """
+        return self.run(self.create(messages=messages, model=model, **kwargs), cancel)
+
+    def create(self, **kwargs):
+        """Returns the coroutine of one chat completion, to be awaited on this runner's loop."""
+        _, client = self._ensure_started()
+        return client.chat.completions.create(**kwargs)
+
+    def run(self, coroutine, cancel=None):
+        """
+        Runs a coroutine on the loop and returns its result, blocking only the calling thread.
+        Cancelling `cancel` (a CancelToken) cancels the coroutine and raises StreamCancelled.
+        """
+        loop, _ = self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        if cancel is not None:
+            cancel.on_cancel(future.cancel)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise StreamCancelled("Request was cancelled") from None
+        except BaseException:
+            future.cancel()
+            raise
+
+    def call_later(self, delay, callback, *args):
+        """
+        Calls callback(*args) on the loop thread after delay seconds, unless the returned future
+        is cancelled first: a timer without a thread of its own.
+        """
+        loop, _ = self._ensure_started()
+        timer = asyncio.run_coroutine_threadsafe(asyncio.sleep(delay), loop)
+        timer.add_done_callback(lambda done: done.cancelled() or callback(*args))
+        return timer
+
+    def stream(self, messages, model, cancel=None, **kwargs):
+        """
+        Yields completion chunks as they arrive. Closing the generator cancels the upstream call,
+        and so does cancelling `cancel` (a CancelToken) from any thread, which raises StreamCancelled.
+        """
+        loop, client = self._ensure_started()
+        chunks = queue.Queue()
+
+        async def pump():
+            try:
+                stream = await client.chat.completions.create(messages=messages, model=model, stream=True, **kwargs)
+                async for chunk in stream:
+                    chunks.put(chunk)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                chunks.put(_STREAM_END)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), loop)
+        if cancel is not None:
+            cancel.on_cancel(lambda: chunks.put(StreamCancelled("Stream was cancelled")))
+        try:
+            while True:
+                item = chunks.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel() # No-op if the stream already finished
+
+    def _ensure_started(self):
+        # The loop thread does not survive fork(), so each worker process starts its own
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop, self._client
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                import httpx
+                from groq import AsyncGroq
+                limits = httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                )
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="groq-event-loop", daemon=True)
+                thread.start()
+                self._client = AsyncGroq(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=self.timeout,
+                    http_client=httpx.AsyncClient(limits=limits, timeout=self.timeout),
+                )
+                self._loop = loop
+                self._pid = os.getpid()
+        return self._loop, self._client
+
+
+def generation_options(max_tokens=None, stop=None):
+    """Returns the completion parameters that are set, leaving the others to the API's defaults."""
+    options = {}
+    if max_tokens is not None:
+        options["max_tokens"] = max_tokens
+    if stop:
+        options["stop"] = stop
+    return options
+
+
+class LLMBackend:
+    """Chat completion backend used by handle_user_input."""
+
+    name = "base"
+    runner = None # An AsyncGroqRunner when calls run on its event loop (see complete_async)
+
+    def start(self):
+        """Opens clients and connections in this process; called once per worker, after fork."""
+
+    def complete(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        """
+        Returns the full answer text; raises StreamCancelled once `cancel` is cancelled.
+        max_tokens bounds the answer length and stop lists sequences that end it (None: no limit).
+        """
+        raise NotImplementedError
+
+    async def complete_async(self, messages, model, max_tokens=None, stop=None):
+        """complete() as a coroutine on the runner's loop, for backends that have a runner."""
+        raise NotImplementedError
+
+    def stream(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        """Yields the answer as text deltas; raises StreamCancelled once `cancel` is cancelled."""
+        raise NotImplementedError
+
+
+class GroqBackend(LLMBackend):
+    """Groq (or any Groq/OpenAI-compatible server, through base_url) via the shared async runner."""
+
+    name = "groq"
+
+    def __init__(self, api_key, base_url=None, max_connections=100, timeout=60.0):
+        self.runner = AsyncGroqRunner(api_key, base_url=base_url, max_connections=max_connections, timeout=timeout)
+
+    def start(self):
+        self.runner.start()
+
+    def complete(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        return self.runner.run(self.complete_async(messages, model, max_tokens, stop), cancel)
+
+    async def complete_async(self, messages, model, max_tokens=None, stop=None):
+        response = await self.runner.create(messages=messages, model=model, **generation_options(max_tokens, stop))
+        return response.choices[0].message.content.strip()
+
+    def stream(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        options = generation_options(max_tokens, stop)
+        for chunk in self.runner.stream(messages=messages, model=model, cancel=cancel, **options):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+
+def create_llm_backend():
+    """
+    Builds the backend selected by LLM_BACKEND:
+    'groq' (default) uses GROQ_API_KEY and optionally GROQ_BASE_URL;
+    'stub' talks to the local stub server (python -m chatbot.stub_server) at LLM_STUB_URL,
+    so /chat can be load-tested without API quota or network access.
+    Returns None when the Groq API key is missing.
+    """
+    backend_name = os.getenv("LLM_BACKEND", "groq").lower()
+    max_connections = int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+    timeout = float(os.getenv("GROQ_TIMEOUT", "60"))
+
+    if backend_name == "stub":
+        base_url = os.getenv("LLM_STUB_URL", "http://127.0.0.1:8787")
+        return GroqBackend("stub-key", base_url=base_url, max_connections=max_connections, timeout=timeout)
+    if backend_name != "groq":
+        raise ValueError(f"Unknown LLM_BACKEND: {backend_name!r}")
+
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        print("WARNING: GROQ_API_KEY environment variable is not set. Groq API features might be unavailable.")
+        return None
+    return GroqBackend(api_key, base_url=os.getenv("GROQ_BASE_URL"), max_connections=max_connections, timeout=timeout)
@@ -0,0 +1,316 @@
+# chatbot/metrics.py
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEAD_WORKERS_FILE = "metrics_dead.json" # Counters and histograms of workers that have exited
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {} # label values tuple -> float
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    @staticmethod
+    def merge(snapshots):
+        merged = {}
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                merged[tuple(key)] = merged.get(tuple(key), 0) + value
+        return merged
+
+    @staticmethod
+    def snapshot_from(merged):
+        """Turns merged values back into the snapshot format."""
+        return [[list(key), value] for key, value in merged.items()]
+
+    def render(self, merged):
+        if not merged and not self.labelnames:
+            yield f"{self.name} 0"
+        for key, value in sorted(merged.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down, optionally split by labels. Across workers the values are
+    added up, so a 0/1 gauge reports how many workers are in that condition.
+    """
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+
+class Ratio:
+    """
+    Gauge computed when rendering: the fraction of a counter's total that has the given label
+    values (e.g. the cache lookups that were hits). It is derived from the counter summed over
+    every worker, so unlike a Gauge it stays a fraction under gunicorn.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, counter, **labels):
+        self.name = name
+        self.documentation = documentation
+        self.counter = counter
+        self.labels = labels
+
+    def snapshot(self):
+        return [] # Nothing of its own to flush or retire
+
+    @staticmethod
+    def merge(snapshots):
+        return {}
+
+    def render_ratio(self, counter_merged):
+        positions = [(self.counter.labelnames.index(name), value) for name, value in self.labels.items()]
+        total = sum(counter_merged.values())
+        part = sum(value for key, value in counter_merged.items() if all(key[i] == wanted for i, wanted in positions))
+        yield f"{self.name} {part / total if total else 0.0}"
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, optionally split by labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {} # label values tuple -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), list(counts), total] for key, (counts, total) in self._values.items()]
+
+    @staticmethod
+    def merge(snapshots):
+        merged = {}
+        for snapshot in snapshots:
+            for key, counts, total in snapshot:
+                entry = merged.setdefault(tuple(key), [[0] * len(counts), 0.0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+        return merged
+
+    @staticmethod
+    def snapshot_from(merged):
+        return [[list(key), counts, total] for key, (counts, total) in merged.items()]
+
+    def render(self, merged):
+        for key, (counts, total) in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    Holds the app's metrics and renders them in the Prometheus text format.
+    With a multiprocess_dir, each gunicorn worker periodically writes its values to its own file
+    there and /metrics (served by any worker) adds up the files of every worker.
+    """
+
+    def __init__(self, multiprocess_dir=None, flush_interval=5.0):
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_interval = flush_interval
+        self._metrics = []
+        self._flusher_pid = None
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def ratio(self, name, documentation, counter, **labels):
+        return self._register(Ratio(name, documentation, counter, **labels))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def kinds(self):
+        return {metric.name: metric.kind for metric in self._metrics}
+
+    def render(self):
+        """Returns every metric, summed over all worker processes, as Prometheus text."""
+        snapshots = [self.snapshot()]
+        if self.multiprocess_dir:
+            self._ensure_flusher()
+            own_file = self._path(os.getpid())
+            for path in glob.glob(os.path.join(self.multiprocess_dir, "metrics_*.json")):
+                if path == own_file:
+                    continue # This process is already counted from live values
+                try:
+                    with open(path) as metrics_file:
+                        snapshots.append(json.load(metrics_file)["values"])
+                except (OSError, ValueError, KeyError):
+                    continue # Being replaced or removed by its worker
+
+        merged = {
+            metric.name: metric.merge(snapshot.get(metric.name, []) for snapshot in snapshots)
+            for metric in self._metrics
+        }
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Ratio):
+                lines.extend(metric.render_ratio(merged[metric.counter.name]))
+            else:
+                lines.extend(metric.render(merged[metric.name]))
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        """Writes this process's values to its file in the multiprocess directory."""
+        if not self.multiprocess_dir:
+            return
+        _write_json(self._path(os.getpid()), {"kinds": self.kinds(), "values": self.snapshot()})
+
+    def start(self):
+        """Starts periodic flushing in this process (call after fork)."""
+        if self.multiprocess_dir:
+            self._ensure_flusher()
+
+    def _path(self, pid):
+        return os.path.join(self.multiprocess_dir, f"metrics_{pid}.json")
+
+    def _ensure_flusher(self):
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            os.makedirs(self.multiprocess_dir, exist_ok=True)
+
+            def run():
+                while True:
+                    time.sleep(self.flush_interval)
+                    try:
+                        self.flush()
+                    except OSError:
+                        pass
+
+            threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+            atexit.register(self.flush)
+
+
+def _write_json(path, data):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as metrics_file:
+        json.dump(data, metrics_file)
+    os.replace(temporary, path) # Readers never see a half-written file
+
+
+def retire_worker_metrics(multiprocess_dir, pid):
+    """
+    Removes the metrics file of a worker that has exited (called by the gunicorn master).
+    Its counters and histograms are added to the dead-workers file, so totals never go back;
+    its gauges are dropped, since they described a process that no longer exists.
+    """
+    path = os.path.join(multiprocess_dir, f"metrics_{pid}.json")
+    try:
+        with open(path) as metrics_file:
+            worker = json.load(metrics_file)
+    except FileNotFoundError:
+        return False
+    except ValueError:
+        worker = {}
+    dead_path = os.path.join(multiprocess_dir, DEAD_WORKERS_FILE)
+    try:
+        with open(dead_path) as metrics_file:
+            dead = json.load(metrics_file)
+    except (OSError, ValueError):
+        dead = {"kinds": {}, "values": {}}
+
+    kinds = worker.get("kinds", {})
+    for name, values in worker.get("values", {}).items():
+        kind = kinds.get(name)
+        if kind not in (Counter.kind, Histogram.kind):
+            continue
+        metric_class = Histogram if kind == Histogram.kind else Counter
+        merged = metric_class.merge([dead["values"].get(name, []), values])
+        dead["values"][name] = metric_class.snapshot_from(merged)
+        dead["kinds"][name] = kind
+    _write_json(dead_path, dead)
+    for leftover in (path, f"{path}.tmp"):
+        try:
+            os.remove(leftover)
+        except FileNotFoundError:
+            pass
+    return True
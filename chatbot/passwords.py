@@ -0,0 +1,99 @@
+# chatbot/passwords.py
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when too many password hashes are already queued."""
+
+
+class HashingTimeout(HashingBusy):
+    """Raised when a password hash did not finish within the timeout."""
+
+
+class PasswordHasher:
+    """
+    Runs pbkdf2 password hashing and verification in a small process pool, so login and
+    registration bursts use a bounded number of cores and never hold up chat requests.
+    Requests beyond max_pending are rejected with HashingBusy instead of queueing without limit,
+    and a hash slower than `timeout` raises HashingTimeout. A hash keeps its slot until it has
+    actually finished in the pool, even if its caller stopped waiting.
+    """
+
+    def __init__(self, iterations=1000000, workers=2, max_pending=32, timeout=30.0):
+        self.configure(iterations=iterations, workers=workers, max_pending=max_pending, timeout=timeout)
+
+    def configure(self, iterations=None, workers=None, max_pending=None, timeout=None):
+        if iterations is not None:
+            self.iterations = iterations # pbkdf2 cost; changing it rehashes passwords at next login
+        if workers is not None:
+            self.workers = workers # 0 hashes in the request thread (handy for development)
+        if max_pending is not None:
+            self.max_pending = max_pending
+            self._slots = threading.BoundedSemaphore(max_pending)
+        if timeout is not None:
+            self.timeout = timeout
+        if getattr(self, '_pool', None) is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False) # Restarted with the new settings on next use
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Reads PASSWORD_HASH_ITERATIONS, PASSWORD_HASH_WORKERS and PASSWORD_HASH_MAX_PENDING from app.config."""
+        self.configure(
+            iterations=app.config.get('PASSWORD_HASH_ITERATIONS', self.iterations),
+            workers=app.config.get('PASSWORD_HASH_WORKERS', self.workers),
+            max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING', self.max_pending),
+        )
+
+    @property
+    def method(self):
+        return f"pbkdf2:sha256:{self.iterations}"
+
+    def hash(self, password):
+        """Returns the hash of a password using the current cost parameters."""
+        return self._run(generate_password_hash, password, method=self.method)
+
+    def verify(self, password_hash, password):
+        """Checks a password against a stored hash, whatever parameters it was made with."""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when a stored hash was made with different parameters than the current ones."""
+        return password_hash.split('$', 1)[0] != self.method
+
+    def _run(self, function, *args, **kwargs):
+        if not self.workers:
+            return function(*args, **kwargs)
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise HashingBusy("Too many password hashing requests in progress")
+        try:
+            future = self._executor().submit(function, *args, **kwargs)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            raise HashingTimeout(f"Password hashing did not finish within {self.timeout} seconds") from None
+
+    def _executor(self):
+        # Pools do not survive fork(), so every worker process starts its own
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    # spawn: forking a process that already runs threads is not safe
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                    self._pool_pid = os.getpid()
+        return self._pool
@@ -0,0 +1,49 @@
+# chatbot/precache.py
+import hashlib
+import json
+import threading
+
+
+class PrecomputedPayload:
+    """A JSON response body serialized once, with its strong ETag."""
+
+    def __init__(self, data):
+        self.data = data
+        self.body = json.dumps(data).encode("utf-8")
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+
+
+class ResponsePrecache:
+    """
+    Serialized payloads of the answers that never change: the /start welcome turn and every
+    fixed intents.json response. Responses with a [name] placeholder differ per user and are
+    left out. The intent payloads are rebuilt whenever the intent index loads a new file.
+    """
+
+    def __init__(self, welcome_message, intent_index):
+        self.welcome = PrecomputedPayload({"response": welcome_message})
+        self.intent_index = intent_index
+        self._lock = threading.Lock()
+        self._intents = None # The intents data the payloads were built from
+        self._responses = {}
+        self._refresh()
+
+    def chat_payload(self, response_text):
+        """Returns the precomputed {"response": ...} payload for a fixed intent answer, or None."""
+        self._refresh()
+        return self._responses.get(response_text)
+
+    def _refresh(self):
+        intents = self.intent_index.intents
+        if intents is self._intents:
+            return
+        with self._lock:
+            if intents is self._intents:
+                return
+            responses = {}
+            for intent in intents.get("intents", []):
+                for response_text in intent.get("responses", []):
+                    if "[name]" not in response_text:
+                        responses[response_text] = PrecomputedPayload({"response": response_text})
+            self._responses = responses
+            self._intents = intents
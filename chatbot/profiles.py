@@ -0,0 +1,173 @@
+# chatbot/profiles.py
+import os
+import re
+
+DEFAULT_PROFILE = "text"
+
+DEFAULT_VOICE_PROMPT = (
+    "You are a voice assistant and everything you write is read aloud. "
+    "Answer in at most three short, complete sentences of plain conversational text. "
+    "Never use markdown, lists, tables, code, links or emoji. "
+    "If the question needs a long answer, give the gist and offer to go into detail."
+)
+
+_CODE_FENCE = "```"
+_INLINE_CODE = re.compile(r"`([^`]*)`")
+_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+_URL = re.compile(r"<?https?://[^\s>]+>?")
+_RULE = re.compile(r"^\s*(?:(?:[-*_]\s*){3,}|\|?[\s:|-]*-{3,}[\s:|-]*)$") # Horizontal rules and table separator rows
+_LINE_MARKUP = re.compile(r"^\s*(?:#{1,6}\s+|>\s*|[-*+•]\s+|\d+[.)]\s+)+") # Headings, quotes, list bullets
+_EMPHASIS = re.compile(r"(?<!\w)(\*\*|__|~~|\*|_)(?=\S)(.+?)(?<=\S)\1(?!\w)")
+_TIMES = re.compile(r"(?<=[\w)])\s+\*\s+(?=[\w(])|(?<=\d)\*(?=\d)") # "5 * 3", "5*3"
+_STRAY_STAR = re.compile(r"(?<!\w)\*|\*(?!\w)") # Unpaired markup, not e.g. "a*b"
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*(?=\s|$)")
+_ABBREVIATIONS = {"e.g", "i.e", "etc", "vs", "cf", "approx", "mr", "mrs", "ms", "dr", "st"} # A period after them ends no sentence
+
+DEFAULT_VOICE_FALLBACK = "That answer is mostly code, which I can't read aloud. Ask me in the chat box to see it."
+
+
+def _speakable_line(line):
+    if _RULE.match(line):
+        return ""
+    line = _LINE_MARKUP.sub("", line)
+    if line.count("|") >= 2: # Table row: read the cells as a list
+        line = ", ".join(cell.strip() for cell in line.strip().strip("|").split("|") if cell.strip())
+    line = _IMAGE.sub(r"\1", line)
+    line = _LINK.sub(r"\1", line)
+    line = _URL.sub("the link", line)
+    line = _INLINE_CODE.sub(r"\1", line)
+    for _ in range(2): # Nested emphasis, e.g. ***bold italic***
+        line = _EMPHASIS.sub(r"\2", line)
+    line = _STRAY_STAR.sub("", _TIMES.sub(" times ", line))
+    return re.sub(r"\s+", " ", line).strip()
+
+
+class SpeakableFilter:
+    """
+    Turns markdown into plain text that reads well aloud: code blocks are dropped, links and
+    emphasis keep only their text, and headings, list items and table rows become short sentences.
+    Text can be fed piece by piece (e.g. streamed sentences); a code block may span several pieces.
+    """
+
+    def __init__(self):
+        self.in_code = False
+        self.said_something = False
+
+    def feed(self, text):
+        kept = []
+        for i, part in enumerate(text.split(_CODE_FENCE)):
+            if i:
+                self.in_code = not self.in_code
+            if not self.in_code:
+                kept.append(part)
+        lines = [_speakable_line(line) for line in "\n".join(kept).splitlines()]
+        lines = [line for line in lines if line]
+        # A line break without punctuation (heading, list item) still ends a spoken phrase
+        spoken = " ".join(
+            line if i == len(lines) - 1 or line[-1] in ".!?,;:" else f"{line}."
+            for i, line in enumerate(lines)
+        )
+        self.said_something = self.said_something or bool(spoken)
+        return spoken
+
+    def finish(self, text):
+        """Feeds the last piece of an answer, dropping it if it is an unfinished sentence after earlier ones."""
+        return trim_to_sentence(self.feed(text), keep_first=not self.said_something)
+
+
+def speakable(text):
+    """Returns a complete markdown answer as plain speakable text."""
+    return SpeakableFilter().feed(text)
+
+
+def trim_to_sentence(text, keep_first=True):
+    """
+    Drops a trailing unfinished sentence (e.g. cut off by max_tokens). Text without any finished
+    sentence is kept whole if keep_first is true, otherwise dropped.
+    """
+    text = text.strip()
+    if not text or text[-1] in ".!?\"')]":
+        return text
+    ends = [end for end in _SENTENCE_END.finditer(text) if not _after_abbreviation(text, end.start())]
+    if ends:
+        return text[:ends[-1].end()]
+    return text if keep_first else ""
+
+
+def _after_abbreviation(text, position):
+    """True if the period at position ends an abbreviation such as "e.g." rather than a sentence."""
+    if text[position] != ".":
+        return False
+    word = text[:position].rsplit(None, 1)[-1] if text[:position].strip() else ""
+    return word.lstrip("\"'([").lower() in _ABBREVIATIONS
+
+
+class ResponseProfile:
+    """
+    How LLM answers are generated for one kind of client: the system prompt, the max_tokens
+    budget, stop sequences, and whether the answer is turned into speakable text. A spoken
+    profile also drops a final sentence cut off by the token budget, so speech never stops mid-phrase,
+    and says `fallback` when nothing of the answer can be spoken (e.g. it was all code).
+    """
+
+    def __init__(self, name, system_prompt=None, max_tokens=None, stop=None, spoken=False, fallback=None):
+        self.name = name
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.stop = stop or None
+        self.spoken = spoken
+        self.fallback = fallback
+
+    def messages(self, history, user_input):
+        """Returns the messages sent to the LLM for user_input after the earlier turns in history."""
+        system = [{"role": "system", "content": self.system_prompt}] if self.system_prompt else []
+        return system + history + [{"role": "user", "content": user_input}]
+
+    def options(self):
+        """Generation parameters for LLMBackend.complete() and stream()."""
+        return {"max_tokens": self.max_tokens, "stop": self.stop}
+
+    def cache_model(self, model):
+        """Model name used in cache and in-flight keys, so answers of different profiles never mix."""
+        return model if self.name == DEFAULT_PROFILE else f"{model}:{self.name}"
+
+    def finish(self, text):
+        """Returns a complete answer as it is sent to the client."""
+        if not self.spoken:
+            return text
+        return trim_to_sentence(speakable(text)) or self.fallback or ""
+
+    def sentence_filter(self):
+        """Returns a SpeakableFilter for the streamed sentences of one answer, or None."""
+        return SpeakableFilter() if self.spoken else None
+
+
+def _max_tokens(name, default):
+    value = os.getenv(name, default).lower()
+    return None if value in ("", "0", "off", "none") else int(value)
+
+
+def create_response_profiles():
+    """
+    Builds the response profiles clients choose from with a request's "mode":
+    'text' (the default) for answers read on screen, bounded by TEXT_MAX_TOKENS (default 1024);
+    'voice' for answers read aloud, with VOICE_SYSTEM_PROMPT, VOICE_MAX_TOKENS (default 150)
+    and VOICE_STOP (stop sequences separated by '|', default: the start of a code block).
+    A max_tokens of 'off' leaves the answer length unbounded.
+    """
+    return {
+        "text": ResponseProfile(
+            "text",
+            system_prompt=os.getenv("TEXT_SYSTEM_PROMPT") or None,
+            max_tokens=_max_tokens("TEXT_MAX_TOKENS", "1024"),
+        ),
+        "voice": ResponseProfile(
+            "voice",
+            system_prompt=os.getenv("VOICE_SYSTEM_PROMPT", DEFAULT_VOICE_PROMPT),
+            max_tokens=_max_tokens("VOICE_MAX_TOKENS", "150"),
+            stop=[s for s in os.getenv("VOICE_STOP", _CODE_FENCE).split("|") if s][:4], # Groq accepts up to 4
+            spoken=True,
+            fallback=DEFAULT_VOICE_FALLBACK,
+        ),
+    }
@@ -0,0 +1,219 @@
+# chatbot/ratelimit.py
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Limit:
+    """A token bucket: up to `capacity` requests at once, refilled at capacity/period per second."""
+
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.period = float(period)
+        self.rate = self.capacity / self.period
+
+    @classmethod
+    def parse(cls, spec):
+        """Parses '10/day', '120/hour' etc.; 'off' (or an empty value) means no limit and returns None."""
+        spec = (spec or "").strip().lower()
+        if spec in ("", "off", "none"):
+            return None
+        count, _, unit = spec.partition("/")
+        unit = unit.rstrip("s")
+        if unit not in PERIODS:
+            raise ValueError(f"Invalid rate limit {spec!r}; expected e.g. '10/minute'")
+        return cls(int(count), PERIODS[unit])
+
+    def __repr__(self):
+        return f"Limit({self.capacity:g}/{self.period:g}s)"
+
+
+def take(tokens, updated, limit, now, cost):
+    """
+    Refills a bucket and tries to take `cost` tokens from it.
+    Returns (allowed, tokens_left, retry_after_seconds).
+    """
+    tokens = limit.capacity if tokens is None else min(limit.capacity, tokens + (now - updated) * limit.rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / limit.rate
+
+
+def settle(results, allowed, cost):
+    """
+    Yields (key, tokens) to store for the buckets of one request. A rejected request is charged
+    to none of them: buckets that had enough tokens get their `cost` back.
+    """
+    for key, (bucket_allowed, tokens_left, _) in results:
+        yield key, tokens_left if allowed or not bucket_allowed else tokens_left + cost
+
+
+class MemoryRateLimitBackend:
+    """Buckets held in this process; the least recently used ones are dropped above max_keys."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict() # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def acquire(self, buckets, cost=1):
+        """
+        Takes `cost` tokens from every (key, limit) bucket, or from none of them.
+        Returns (allowed, retry_after_seconds).
+        """
+        now = time.time()
+        with self._lock:
+            results = []
+            for key, limit in buckets:
+                tokens, updated = self._buckets.get(key, (None, now))
+                results.append((key, take(tokens, updated, limit, now, cost)))
+            allowed = all(result[0] for _, result in results)
+            for key, tokens_left in settle(results, allowed, cost):
+                self._buckets[key] = (tokens_left, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, max((result[2] for _, result in results), default=0.0)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteRateLimitBackend:
+    """
+    Buckets stored in a SQLite file, so every gunicorn worker on the host enforces the same limits.
+    Each check is one short IMMEDIATE transaction; rows idle for longer than idle_ttl are purged.
+    """
+
+    def __init__(self, path, idle_ttl=86400 * 2):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        self._last_purge = 0.0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_updated ON rate_limit_buckets (updated)")
+        self.close() # No connection may be inherited by forked workers
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Closes this thread's connection; the next call opens a new one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+    def acquire(self, buckets, cost=1):
+        """Same contract as MemoryRateLimitBackend.acquire, atomic across processes."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE") # Take the write lock up front: read-modify-write must not interleave
+        try:
+            results = []
+            for key, limit in buckets:
+                row = conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row else (None, now)
+                results.append((key, take(tokens, updated, limit, now, cost)))
+            allowed = all(result[0] for _, result in results)
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                [(key, tokens_left, now) for key, tokens_left in settle(results, allowed, cost)],
+            )
+            if now - self._last_purge > 60:
+                self._last_purge = now
+                conn.execute("DELETE FROM rate_limit_buckets WHERE updated < ?", (now - self.idle_ttl,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, max((result[2] for _, result in results), default=0.0)
+
+    def clear(self):
+        self._connect().execute("DELETE FROM rate_limit_buckets")
+
+
+class RateLimiter:
+    """
+    Per-tier token buckets. A tier maps a scope (e.g. 'session', 'ip', 'user') to a Limit;
+    a request passes only if every bucket of its tier has a token left.
+    """
+
+    def __init__(self, backend, tiers):
+        self.backend = backend
+        self.tiers = {tier: {scope: limit for scope, limit in scopes.items() if limit} for tier, scopes in tiers.items()}
+
+    def hit(self, tier, identities, cost=1):
+        """
+        Counts one request of `tier` for the given {scope: identity} values.
+        Returns (allowed, retry_after_seconds rounded up). Backend failures let the request through.
+        """
+        buckets = [
+            (f"{tier}:{scope}:{identities[scope]}", limit)
+            for scope, limit in self.tiers.get(tier, {}).items()
+            if identities.get(scope) is not None
+        ]
+        if not buckets:
+            return True, 0
+        try:
+            allowed, retry_after = self.backend.acquire(buckets, cost)
+        except sqlite3.Error as e:
+            print(f"WARNING: Rate limiter unavailable, allowing request: {e}")
+            return True, 0
+        return allowed, int(math.ceil(retry_after))
+
+
+def create_rate_limiter(instance_path):
+    """
+    Builds the rate limiter configured by environment variables:
+    RATE_LIMIT_BACKEND ('memory', 'sqlite' or 'none'),
+    RATE_LIMIT_PATH (for the SQLite backend, default rate_limits.db in the app's instance_path),
+    RATE_LIMIT_ANONYMOUS (per session), RATE_LIMIT_ANONYMOUS_IP (per client IP) and
+    RATE_LIMIT_REGISTERED (per user id), each like '10/day' or 'off'. Synthesized speech clips
+    (one per sentence) have their own buckets for the same identities: RATE_LIMIT_TTS_ANONYMOUS,
+    RATE_LIMIT_TTS_ANONYMOUS_IP and RATE_LIMIT_TTS_REGISTERED.
+    """
+    backend_name = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend_name == "none":
+        return None
+    if backend_name == "sqlite":
+        path = os.getenv("RATE_LIMIT_PATH") or os.path.join(instance_path, "rate_limits.db")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        backend = SQLiteRateLimitBackend(path)
+    elif backend_name == "memory":
+        backend = MemoryRateLimitBackend(max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend_name!r}")
+    return RateLimiter(backend, {
+        "anonymous": {
+            "session": Limit.parse(os.getenv("RATE_LIMIT_ANONYMOUS", "10/day")),
+            "ip": Limit.parse(os.getenv("RATE_LIMIT_ANONYMOUS_IP", "50/day")),
+        },
+        "registered": {
+            "user": Limit.parse(os.getenv("RATE_LIMIT_REGISTERED", "120/hour")),
+        },
+        "anonymous_tts": {
+            "session": Limit.parse(os.getenv("RATE_LIMIT_TTS_ANONYMOUS", "300/day")),
+            "ip": Limit.parse(os.getenv("RATE_LIMIT_TTS_ANONYMOUS_IP", "1500/day")),
+        },
+        "registered_tts": {
+            "user": Limit.parse(os.getenv("RATE_LIMIT_TTS_REGISTERED", "1200/hour")),
+        },
+    })
@@ -0,0 +1,326 @@
+# chatbot/resilience.py
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from .llm import CancelToken, LLMBackend, StreamCancelled
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the LLM while its circuit breaker is open."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when an LLM call does not finish (or start streaming) within its deadline."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream. After failure_threshold consecutive failures the circuit
+    opens and calls fail fast for reset_timeout seconds. Then a single trial call is let through
+    (half-open): its success closes the circuit, its failure opens it again.
+    on_change(old_state, new_state) is called on every transition.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, on_change=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_change = on_change
+        self.state = self.CLOSED
+        self.failures = 0 # Consecutive failures
+        self.trips = 0 # Times the circuit opened
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Returns True if a call may go upstream now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                self._set_state(self.OPEN)
+
+    def release(self):
+        """Ends a call that neither succeeded nor failed (e.g. the user cancelled it)."""
+        with self._lock:
+            self._trial_running = False
+
+    def _set_state(self, state):
+        old_state, self.state = self.state, state
+        if self.on_change is not None:
+            self.on_change(old_state, state)
+
+
+class LatencyTracker:
+    """Durations of the most recent successful calls, for choosing when to hedge."""
+
+    def __init__(self, size=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q):
+        """Returns the q-quantile of the recent durations, or None until there are enough of them."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class ResilientBackend(LLMBackend):
+    """
+    Wraps an LLM backend so upstream trouble cannot hold requests hostage:
+    - every completion must finish within `deadline` seconds, and every stream must produce
+      its first token within first_token_deadline and finish within stream_deadline;
+      late calls are cancelled and raise DeadlineExceeded;
+    - a CircuitBreaker counts failures (errors and missed deadlines) and, while open, makes
+      calls raise CircuitOpen at once so callers can answer from intents or a canned message;
+    - with hedge_quantile set, a completion still running after that quantile of recent
+      durations (at least hedge_min_delay) gets a second, identical attempt; the first answer
+      wins and the other attempt is cancelled. on_hedge('fired' or 'won') reports hedges.
+    With a backend that has a runner (GroqBackend), attempts are tasks and deadlines are timers on
+    the runner's event loop; other backends get a thread per attempt and per timer.
+    """
+
+    def __init__(self, backend, breaker, deadline=20.0, first_token_deadline=8.0, stream_deadline=60.0,
+                 hedge_quantile=None, hedge_min_delay=0.5, on_hedge=None):
+        self.backend = backend
+        self.name = backend.name
+        self.breaker = breaker
+        self.deadline = deadline
+        self.first_token_deadline = first_token_deadline
+        self.stream_deadline = stream_deadline
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.on_hedge = on_hedge
+        self.latency = LatencyTracker()
+
+    def start(self):
+        self.backend.start()
+
+    def hedge_delay(self):
+        """Seconds after which a completion gets a second attempt, or None for no hedging."""
+        if self.hedge_quantile is None:
+            return None
+        quantile = self.latency.quantile(self.hedge_quantile)
+        return None if quantile is None else max(self.hedge_min_delay, quantile)
+
+    def complete(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        if not self.breaker.allow():
+            raise CircuitOpen("The LLM circuit breaker is open")
+        if self.backend.runner is None:
+            return self._complete_in_threads(messages, model, cancel, max_tokens, stop)
+        try:
+            return self.backend.runner.run(self._complete_on_loop(messages, model, max_tokens, stop), cancel)
+        except StreamCancelled:
+            self.breaker.release()
+            raise
+
+    async def _complete_on_loop(self, messages, model, max_tokens, stop):
+        start = time.monotonic()
+        attempts = []
+
+        def launch():
+            attempts.append(asyncio.ensure_future(
+                self.backend.complete_async(messages, model, max_tokens=max_tokens, stop=stop)
+            ))
+            return attempts[-1]
+
+        pending = {launch()}
+        deadline_at = start + self.deadline
+        hedge_delay = self.hedge_delay()
+        hedge_at = start + hedge_delay if hedge_delay is not None and hedge_delay < self.deadline else None
+        try:
+            while True:
+                wake_at = min(hedge_at or deadline_at, deadline_at)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, wake_at - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is not attempts[0] and self.on_hedge is not None:
+                            self.on_hedge("won")
+                        self.latency.observe(time.monotonic() - start)
+                        self.breaker.record_success()
+                        return attempt.result()
+                if done:
+                    if not pending: # Errors are not hedged: only slowness is
+                        self.breaker.record_failure()
+                        raise done.pop().exception()
+                    continue
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    pending.add(launch())
+                    if self.on_hedge is not None:
+                        self.on_hedge("fired")
+                elif time.monotonic() >= deadline_at:
+                    self.breaker.record_failure()
+                    raise DeadlineExceeded(f"No LLM answer within {self.deadline:g}s")
+        finally:
+            for attempt in attempts:
+                attempt.cancel() # Stops the attempts still running; no-op for finished ones
+
+    def _complete_in_threads(self, messages, model, cancel, max_tokens, stop):
+        start = time.monotonic()
+        results = queue.Queue() # (attempt token, answer, error); a None token means the caller cancelled
+        attempts = []
+
+        def launch():
+            token = CancelToken()
+            attempts.append(token)
+
+            def run():
+                try:
+                    results.put((token, self.backend.complete(messages, model, cancel=token, max_tokens=max_tokens, stop=stop), None))
+                except Exception as e:
+                    results.put((token, None, e))
+
+            threading.Thread(target=run, name="llm-attempt", daemon=True).start()
+
+        launch()
+        if cancel is not None:
+            cancel.on_cancel(lambda: results.put((None, None, StreamCancelled("Request was cancelled"))))
+        deadline_at = start + self.deadline
+        hedge_delay = self.hedge_delay()
+        hedge_at = start + hedge_delay if hedge_delay is not None and hedge_delay < self.deadline else None
+        running = 1
+        try:
+            while True:
+                wake_at = min(hedge_at or deadline_at, deadline_at)
+                try:
+                    token, answer, error = results.get(timeout=max(0.0, wake_at - time.monotonic()))
+                except queue.Empty:
+                    if hedge_at is not None and time.monotonic() >= hedge_at:
+                        hedge_at = None
+                        launch()
+                        running += 1
+                        if self.on_hedge is not None:
+                            self.on_hedge("fired")
+                        continue
+                    if time.monotonic() >= deadline_at:
+                        self.breaker.record_failure()
+                        raise DeadlineExceeded(f"No LLM answer within {self.deadline:g}s")
+                    continue
+                if token is None:
+                    self.breaker.release()
+                    raise error
+                running -= 1
+                if error is None:
+                    if token is not attempts[0] and self.on_hedge is not None:
+                        self.on_hedge("won")
+                    self.latency.observe(time.monotonic() - start)
+                    self.breaker.record_success()
+                    return answer
+                if running == 0: # Errors are not hedged: only slowness is
+                    self.breaker.record_failure()
+                    raise error
+        finally:
+            for token in attempts:
+                token.cancel() # Stops the attempts still running; no-op for finished ones
+
+    def _timer(self, delay, callback, *args):
+        """Starts a cancellable timer: on the backend's event loop if it has one, else in a thread."""
+        if self.backend.runner is not None:
+            return self.backend.runner.call_later(delay, callback, *args)
+        timer = threading.Timer(delay, callback, args)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def stream(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        if not self.breaker.allow():
+            raise CircuitOpen("The LLM circuit breaker is open")
+        token = CancelToken()
+        if cancel is not None:
+            cancel.on_cancel(token.cancel)
+        missed = [] # Which deadline cancelled the stream, if one did
+
+        def expire(what):
+            missed.append(what)
+            token.cancel()
+
+        first_token_timer = self._timer(self.first_token_deadline, expire, f"first token within {self.first_token_deadline:g}s")
+        stream_timer = self._timer(self.stream_deadline, expire, f"complete answer within {self.stream_deadline:g}s")
+        try:
+            for delta in self.backend.stream(messages, model, cancel=token, max_tokens=max_tokens, stop=stop):
+                first_token_timer.cancel()
+                yield delta
+        except StreamCancelled:
+            if missed:
+                self.breaker.record_failure()
+                raise DeadlineExceeded(f"No LLM {missed[0]}") from None
+            self.breaker.release()
+            raise
+        except GeneratorExit: # The consumer stopped reading
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            first_token_timer.cancel()
+            stream_timer.cancel()
+
+
+def create_resilient_backend(backend, on_state_change=None, on_hedge=None):
+    """
+    Wraps backend in a ResilientBackend configured by environment variables:
+    LLM_DEADLINE (seconds per completion, default 20), LLM_FIRST_TOKEN_DEADLINE (default 8),
+    LLM_STREAM_DEADLINE (default 60), LLM_BREAKER_FAILURES (consecutive failures that open the
+    circuit, default 5), LLM_BREAKER_RESET (seconds before a trial call, default 30), and
+    LLM_HEDGE ('on' to hedge completions, default 'off') with LLM_HEDGE_QUANTILE (default 0.95)
+    and LLM_HEDGE_MIN_DELAY (default 0.5 seconds).
+    """
+    breaker = CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+        on_change=on_state_change,
+    )
+    hedging = os.getenv("LLM_HEDGE", "off").lower() == "on"
+    return ResilientBackend(
+        backend,
+        breaker,
+        deadline=float(os.getenv("LLM_DEADLINE", "20")),
+        first_token_deadline=float(os.getenv("LLM_FIRST_TOKEN_DEADLINE", "8")),
+        stream_deadline=float(os.getenv("LLM_STREAM_DEADLINE", "60")),
+        hedge_quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")) if hedging else None,
+        hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5")),
+        on_hedge=on_hedge,
+    )
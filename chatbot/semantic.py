@@ -0,0 +1,111 @@
+# chatbot/semantic.py
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+_PLACEHOLDER = re.compile(r"\[\w+\]") # e.g. [name] in "My name is [name]"
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+# Function words are dropped so "what is rust" does not look like "what is AI".
+# A text made only of them ("how are you") keeps all of its words.
+_STOP_WORDS = frozenset("""
+a an the is are am was be do does did can could should would will i me my you your it its
+what whats what's how hows which who whom to of in on for about with and or tell give please
+so this that these those some any just really very
+""".split())
+
+
+def _char_ngrams(text, ngram_range):
+    """Returns character n-grams taken inside word boundaries (each word padded with spaces)."""
+    words = _NON_WORD.sub(" ", _PLACEHOLDER.sub(" ", text.lower())).split()
+    words = [word for word in words if word not in _STOP_WORDS] or words
+    low, high = ngram_range
+    grams = []
+    for word in words:
+        padded = f" {word} "
+        for n in range(low, high + 1):
+            if len(padded) < n:
+                break
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+class SemanticIntentClassifier:
+    """
+    Classifies paraphrases of the intents.json patterns using TF-IDF weighted character n-grams.
+    Every pattern is a row of one L2-normalized matrix, so scoring a query is a single
+    matrix-vector product followed by an argmax.
+    """
+
+    def __init__(self, intents, threshold=0.63, ngram_range=(2, 4)):
+        self.threshold = threshold
+        self.ngram_range = ngram_range
+
+        rows = [] # n-gram counts per pattern
+        self._row_intent = [] # Index of the intent each row belongs to
+        for intent_index, intent in enumerate(intents):
+            for pattern in intent.get("patterns", []):
+                counts = Counter(_char_ngrams(pattern, ngram_range))
+                if counts:
+                    rows.append(counts)
+                    self._row_intent.append(intent_index)
+
+        self.vocabulary = {}
+        document_frequency = Counter()
+        for counts in rows:
+            document_frequency.update(counts.keys())
+        for gram in document_frequency:
+            self.vocabulary[gram] = len(self.vocabulary)
+
+        total = len(rows)
+        self.idf = np.ones(len(self.vocabulary), dtype=np.float32)
+        for gram, column in self.vocabulary.items():
+            self.idf[column] = math.log((1 + total) / (1 + document_frequency[gram])) + 1.0
+        self.unseen_idf = math.log(1 + total) + 1.0 # Weight of an n-gram no pattern contains
+
+        self.matrix = np.zeros((total, len(self.vocabulary)), dtype=np.float32)
+        for row, counts in enumerate(rows):
+            for gram, count in counts.items():
+                self.matrix[row, self.vocabulary[gram]] = count
+        self.matrix *= self.idf
+        norms = np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix /= norms
+
+    def _vectorize(self, text):
+        """
+        Returns the query's normalized TF-IDF vector over the vocabulary, or None if it shares no n-gram
+        with any pattern. N-grams outside the vocabulary still count towards the norm, so the words of
+        a question that no pattern mentions lower its similarity instead of being ignored.
+        """
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        unseen = Counter()
+        for gram in _char_ngrams(text, self.ngram_range):
+            column = self.vocabulary.get(gram)
+            if column is not None:
+                vector[column] += 1.0
+            else:
+                unseen[gram] += 1
+        vector *= self.idf
+        if not vector.any():
+            return None
+        unseen_mass = sum(count * count for count in unseen.values()) * self.unseen_idf ** 2
+        return vector / math.sqrt(float(vector @ vector) + unseen_mass)
+
+    def score(self, text):
+        """Returns (intent index, cosine similarity) of the closest pattern, or (None, 0.0)."""
+        if not self._row_intent:
+            return None, 0.0
+        vector = self._vectorize(text)
+        if vector is None:
+            return None, 0.0
+        similarities = self.matrix @ vector
+        best = int(np.argmax(similarities))
+        return self._row_intent[best], float(similarities[best])
+
+    def classify(self, text):
+        """Returns the index of the matching intent, or None if the best match is below the threshold."""
+        intent_index, similarity = self.score(text)
+        return intent_index if similarity >= self.threshold else None
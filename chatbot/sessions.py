@@ -0,0 +1,243 @@
+# chatbot/sessions.py
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session data kept on the server; the cookie only carries its random id."""
+
+    def __init__(self, initial=None, sid=None, stored=None, expires=None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid # None until the session is first saved
+        self.stored = stored # Serialized data as loaded, to skip writing it back unchanged
+        self.expires = expires
+        self.modified = False
+        self.accessed = False
+        self.rotate = False
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+    def regenerate(self):
+        """Moves the data to a new id (e.g. at login), so an id known before it is useless afterwards."""
+        self.rotate = True
+        self.modified = True
+
+
+class MemorySessionBackend:
+    """Sessions held in this process; the least recently used ones are dropped above max_entries."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._sessions = OrderedDict() # sid -> (data, expires)
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        """Returns (data, expires) of a live session, or None."""
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._sessions[sid]
+                return None
+            self._sessions.move_to_end(sid)
+            return entry
+
+    def set(self, sid, data, expires):
+        with self._lock:
+            self._sessions[sid] = (data, expires)
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+
+    def touch(self, sid, expires):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is not None:
+                self._sessions[sid] = (entry[0], expires)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+
+class SQLiteSessionBackend:
+    """
+    Sessions stored in a SQLite file, so every gunicorn worker on the host sees the same ones.
+    Expired rows are purged at most once a minute, on a write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._last_purge = 0.0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires)")
+        self.close() # Created in the preloaded gunicorn master; each worker opens its own connection
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Closes this thread's connection; the next call opens a new one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+    def get(self, sid):
+        row = self._connect().execute(
+            "SELECT data, expires FROM sessions WHERE id = ? AND expires > ?", (sid, time.time())
+        ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def set(self, sid, data, expires):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO sessions (id, data, expires) VALUES (?, ?, ?)", (sid, data, expires))
+        now = time.time()
+        if now - self._last_purge > 60:
+            self._last_purge = now
+            conn.execute("DELETE FROM sessions WHERE expires <= ?", (now,))
+
+    def touch(self, sid, expires):
+        self._connect().execute("UPDATE sessions SET expires = ? WHERE id = ?", (expires, sid))
+
+    def delete(self, sid):
+        self._connect().execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+
+class ServerSessionInterface(SessionInterface):
+    """
+    Flask session interface over a session backend. The cookie holds only an opaque random id and
+    is sent when that id is issued (or, for permanent sessions, renewed), not on every response.
+    A session is serialized only when it was modified, and written only when its data changed.
+    Idle sessions expire after PERMANENT_SESSION_LIFETIME; their expiry is pushed back at most
+    once per refresh_interval seconds, so reading a session costs no write.
+    """
+
+    serializer = session_json_serializer # Same format as Flask's cookie sessions (tuples, bytes, datetimes...)
+
+    def __init__(self, backend, refresh_interval=3600):
+        self.backend = backend
+        self.refresh_interval = refresh_interval
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            try:
+                entry = self.backend.get(sid)
+            except sqlite3.Error as e:
+                print(f"WARNING: Session store unavailable, starting an empty session: {e}")
+                entry = None
+            if entry is not None:
+                data, expires = entry
+                try:
+                    return ServerSideSession(self.serializer.loads(data.decode("utf-8")), sid=sid, stored=data, expires=expires)
+                except ValueError:
+                    pass # Unreadable data: start over
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        try:
+            if not session:
+                # Emptied (e.g. logout): forget it on both sides
+                if session.sid is not None and session.modified:
+                    self.backend.delete(session.sid)
+                    response.delete_cookie(name, domain=domain, path=path, secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+                return
+
+            now = time.time()
+            expires = now + app.permanent_session_lifetime.total_seconds()
+            send_cookie = False
+            if session.sid is None or session.rotate:
+                if session.sid is not None:
+                    self.backend.delete(session.sid)
+                session.sid = secrets.token_urlsafe(32)
+                session.stored = None
+                send_cookie = True
+            if session.modified or session.stored is None:
+                data = self.serializer.dumps(dict(session)).encode("utf-8")
+                if data != session.stored:
+                    self.backend.set(session.sid, data, expires)
+                    send_cookie = send_cookie or session.permanent
+                    session.expires = expires
+            if session.expires is not None and expires - session.expires > self.refresh_interval:
+                self.backend.touch(session.sid, expires)
+                send_cookie = send_cookie or session.permanent
+        except sqlite3.Error as e:
+            print(f"WARNING: Could not save the session: {e}")
+            return
+
+        if send_cookie:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+                partitioned=self.get_cookie_partitioned(app),
+            )
+
+
+def create_session_interface(instance_path):
+    """
+    Builds the server-side session interface configured by environment variables:
+    SESSION_BACKEND ('sqlite', the default, shared by all workers on the host; 'memory', per process;
+    or 'cookie' for Flask's signed cookie sessions, in which case None is returned),
+    SESSION_PATH (for the SQLite backend, default sessions.db in the app's instance_path),
+    SESSION_MAX_ENTRIES (for the memory backend) and
+    SESSION_REFRESH_INTERVAL (seconds between expiry extensions of an idle session).
+    """
+    backend_name = os.getenv("SESSION_BACKEND", "sqlite").lower()
+    if backend_name == "cookie":
+        return None
+    if backend_name == "sqlite":
+        path = os.getenv("SESSION_PATH") or os.path.join(instance_path, "sessions.db")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        backend = SQLiteSessionBackend(path)
+    elif backend_name == "memory":
+        backend = MemorySessionBackend(max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "10000")))
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend_name!r}")
+    return ServerSessionInterface(backend, refresh_interval=float(os.getenv("SESSION_REFRESH_INTERVAL", "3600")))
@@ -0,0 +1,85 @@
+# chatbot/singleflight.py
+import threading
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised to a waiter when the shared call did not finish in time."""
+
+
+class _Call:
+    """One in-flight upstream call that any number of requests can wait on."""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+    def resolve(self, value):
+        self.value = value
+        self._done.set()
+
+    def reject(self, error):
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Returns the shared result, or re-raises the leader's error in this thread."""
+        if not self._done.wait(timeout):
+            raise SingleFlightTimeout(f"Shared call did not finish within {timeout} seconds")
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key (the leader) runs the call,
+    every other caller that arrives while it is in flight waits for the same result or error.
+    """
+
+    def __init__(self, timeout=60.0):
+        self.timeout = timeout # How long a waiter waits on the leader
+        self.coalesced = 0 # Calls answered by another request's upstream call
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key):
+        """
+        Returns (call, is_leader). The leader must finish the call with finish();
+        other callers get the result with call.wait().
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def finish(self, key, call, value=None, error=None):
+        """Publishes the leader's result (or error) to every waiter and forgets the key."""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        if error is not None:
+            call.reject(error)
+        else:
+            call.resolve(value)
+
+    def do(self, key, fn):
+        """Runs fn() once for all concurrent callers with the same key and returns its result."""
+        call, is_leader = self.begin(key)
+        if not is_leader:
+            return call.wait(self.timeout)
+        try:
+            value = fn()
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        except BaseException:
+            self.finish(key, call, error=RuntimeError("Shared call was cancelled"))
+            raise
+        self.finish(key, call, value=value)
+        return value
@@ -0,0 +1,156 @@
+# chatbot/speech.py
+import json
+import os
+import threading
+
+PCM_SAMPLE_WIDTH = 2 # 16-bit little-endian mono samples
+
+
+class AudioTooLong(Exception):
+    """Raised when an upload exceeds the configured maximum utterance length."""
+
+
+def iter_pcm_chunks(stream, chunk_bytes=8000, max_bytes=None):
+    """
+    Reads raw PCM16 audio from a file-like stream into one reused buffer and yields
+    memoryviews over it, each holding whole samples. The caller must consume a chunk
+    before asking for the next one; memory stays at chunk_bytes however long the upload is.
+    """
+    buffer = bytearray(chunk_bytes)
+    view = memoryview(buffer)
+    readinto = getattr(stream, "readinto", None)
+    carry = 0 # Odd trailing byte of the previous read, moved to the front of the buffer
+    total = 0
+    while True:
+        if readinto is not None:
+            count = readinto(view[carry:]) or 0
+        else:
+            data = stream.read(chunk_bytes - carry) # e.g. gunicorn's request body has no readinto
+            count = len(data)
+            view[carry:carry + count] = data
+        if count == 0:
+            return
+        total += count
+        if max_bytes is not None and total > max_bytes:
+            raise AudioTooLong(f"Audio upload exceeds {max_bytes} bytes")
+        available = carry + count
+        usable = available - available % PCM_SAMPLE_WIDTH
+        if usable:
+            yield view[:usable]
+        carry = available - usable
+        if carry:
+            buffer[0] = buffer[usable]
+
+
+class SpeechRecognizer:
+    """
+    Offline speech-to-text engine; stream() starts the recognition of one utterance and returns
+    an object with accept(chunk, partial=True) and finish(), as VoskStream.
+    """
+
+    def stream(self, sample_rate):
+        raise NotImplementedError
+
+
+class VoskSpeechRecognizer(SpeechRecognizer):
+    """
+    Incremental CPU speech recognition with a local Vosk (Kaldi) model.
+    The model is loaded once per worker process, on first use.
+    """
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self._model = None
+        self._model_pid = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None or self._model_pid != os.getpid():
+                import vosk
+                vosk.SetLogLevel(-1)
+                self._model = vosk.Model(self.model_path)
+                self._model_pid = os.getpid()
+            return self._model
+
+    def stream(self, sample_rate):
+        import vosk
+        return VoskStream(vosk.KaldiRecognizer(self._get_model(), sample_rate))
+
+
+class VoskStream:
+    """Feeds audio chunks to one KaldiRecognizer and reports changed partial transcripts."""
+
+    def __init__(self, recognizer):
+        self._recognizer = recognizer
+        self._segments = [] # Text of segments Vosk has already finalized (at pauses)
+        self._last_partial = ""
+
+    def accept(self, chunk, partial=True):
+        """
+        Consumes a PCM16 chunk; returns the updated partial transcript, or None if unchanged.
+        With partial=False (nobody is shown partials) it returns None without decoding one.
+        """
+        # Vosk's cffi binding needs bytes: one copy of a chunk-sized buffer, never of the utterance
+        if self._recognizer.AcceptWaveform(bytes(chunk)):
+            text = json.loads(self._recognizer.Result()).get("text", "")
+            if text:
+                self._segments.append(text)
+            current = " ".join(self._segments)
+        elif not partial:
+            return None
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+            current = " ".join(self._segments + ([partial] if partial else []))
+        if current == self._last_partial:
+            return None
+        self._last_partial = current
+        return current
+
+    def finish(self):
+        """Returns the final transcript of the utterance."""
+        text = json.loads(self._recognizer.FinalResult()).get("text", "")
+        return " ".join(self._segments + ([text] if text else [])).strip()
+
+
+class SlotStream:
+    """Recognition stream holding one of a worker's recognition slots (a semaphore) until it finishes."""
+
+    def __init__(self, stream, slots):
+        self._stream = stream
+        self._slots = slots
+        self._held = True
+
+    def accept(self, chunk, partial=True):
+        return self._stream.accept(chunk, partial)
+
+    def finish(self):
+        try:
+            return self._stream.finish()
+        finally:
+            if self._held:
+                self._held = False
+                self._slots.release()
+
+
+def create_speech_recognizer():
+    """
+    Builds the server speech recognizer configured by environment variables:
+    STT_BACKEND ('vosk' or 'none', the default) and STT_MODEL_PATH (an unpacked Vosk model directory).
+    Returns None when it is disabled or cannot be used, so the browser's recognizer stays the only one.
+    """
+    backend_name = os.getenv("STT_BACKEND", "none").lower()
+    if backend_name == "none":
+        return None
+    if backend_name != "vosk":
+        raise ValueError(f"Unknown STT_BACKEND: {backend_name!r}")
+    model_path = os.getenv("STT_MODEL_PATH", "models/vosk-model-small-en-us-0.15")
+    try:
+        import vosk # Optional dependency
+    except ImportError:
+        print("WARNING: STT_BACKEND=vosk but the 'vosk' package is not installed. Server speech recognition is disabled.")
+        return None
+    if not os.path.isdir(model_path):
+        print(f"WARNING: Vosk model not found at {model_path}. Server speech recognition is disabled.")
+        return None
+    return VoskSpeechRecognizer(model_path)
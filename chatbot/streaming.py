@@ -0,0 +1,49 @@
+# chatbot/streaming.py
+import json
+import re
+
+# A sentence ends at ., ! or ? followed by whitespace, or at a line break
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+class SentenceBuffer:
+    """
+    Collects streamed text deltas and hands them back as complete sentences,
+    so the client can start speaking before the whole answer has been generated.
+    """
+
+    def __init__(self, min_length=12):
+        self.min_length = min_length # Very short fragments ("Hi.") are merged with the next sentence
+        self._buffer = ""
+
+    def feed(self, delta):
+        """Adds a delta and returns the list of sentences completed by it."""
+        self._buffer += delta
+        sentences = []
+        start = 0
+        for boundary in _SENTENCE_BOUNDARY.finditer(self._buffer):
+            candidate = self._buffer[start:boundary.start()].strip()
+            if len(candidate) >= self.min_length:
+                sentences.append(candidate)
+                start = boundary.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Returns whatever text is left once the stream has ended."""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return remainder
+
+
+def split_sentences(text, min_length=12):
+    """Splits an already complete text the same way a stream of it would be split."""
+    buffer = SentenceBuffer(min_length)
+    sentences = buffer.feed(text)
+    remainder = buffer.flush()
+    return sentences + [remainder] if remainder else sentences
+
+
+def sse_event(payload):
+    """Formats a payload as a single Server-Sent Events message."""
+    return f"data: {json.dumps(payload)}\n\n"
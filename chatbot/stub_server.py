@@ -0,0 +1,155 @@
+# chatbot/stub_server.py
+"""
+Local stand-in for the Groq chat completions API, for load testing without quota or network.
+
+    python -m chatbot.stub_server --port 8787 --latency 0.4 --token-rate 80 --error-rate 0.01
+    LLM_BACKEND=stub LLM_STUB_URL=http://127.0.0.1:8787 gunicorn --config gunicorn.conf.py app:app
+"""
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORDS = (
+    "Python is a versatile language that is widely used for web development, data analysis, "
+    "automation and machine learning. It favors readable code. Start with small projects, "
+    "read other people's code and write tests early. Practice every day and keep learning."
+).split()
+
+
+class StubSettings:
+    def __init__(self, latency=0.3, token_rate=50.0, tokens=60, error_rate=0.0, jitter=0.2):
+        self.latency = latency # Seconds before the first token
+        self.token_rate = token_rate # Tokens per second after the first one (0 = all at once)
+        self.tokens = tokens # Words in each answer
+        self.error_rate = error_rate # Fraction of requests answered with HTTP 500/429
+        self.jitter = jitter # Relative random variation applied to the latency
+
+
+def _answer_words(settings, messages):
+    prompt = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    words = [f"You asked: {prompt[:80]}."] if prompt else []
+    while len(words) < settings.tokens:
+        words.extend(_WORDS)
+    return words[:settings.tokens]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    settings = StubSettings()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass # Keep load tests quiet
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}})
+            return
+
+        settings = self.settings
+        time.sleep(max(0.0, settings.latency * (1 + random.uniform(-settings.jitter, settings.jitter))))
+        if random.random() < settings.error_rate:
+            status = random.choice((429, 500))
+            self._send_json(status, {"error": {"message": "Stub server injected error", "type": "server_error"}})
+            return
+
+        words = _answer_words(settings, body.get("messages", []))
+        finish_reason = "stop"
+        if body.get("max_tokens") and len(words) > body["max_tokens"]:
+            words = words[:body["max_tokens"]] # One word stands for one token
+            finish_reason = "length"
+        model = body.get("model", "stub-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        if body.get("stream"):
+            self._stream(completion_id, model, words, finish_reason)
+        else:
+            time.sleep(len(words) / settings.token_rate if settings.token_rate else 0)
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)},
+            })
+
+    def _stream(self, completion_id, model, words, finish_reason="stop"):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        delay = 1 / self.settings.token_rate if self.settings.token_rate else 0
+        for i, word in enumerate(words):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else f" {word}"},
+                    "finish_reason": finish_reason if i == len(words) - 1 else None,
+                }],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if delay and i < len(words) - 1:
+                time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(host, port, settings):
+    """Returns a threaded stub server bound to host:port (port 0 picks a free port)."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"settings": settings})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Groq/OpenAI-compatible stub server for load testing.")
+    parser.add_argument("--host", default=os.getenv("STUB_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("STUB_PORT", "8787")))
+    parser.add_argument("--latency", type=float, default=float(os.getenv("STUB_LATENCY", "0.3")), help="seconds to first token")
+    parser.add_argument("--token-rate", type=float, default=float(os.getenv("STUB_TOKEN_RATE", "50")), help="tokens per second")
+    parser.add_argument("--tokens", type=int, default=int(os.getenv("STUB_TOKENS", "60")), help="tokens per answer")
+    parser.add_argument("--error-rate", type=float, default=float(os.getenv("STUB_ERROR_RATE", "0")), help="fraction of failed requests")
+    args = parser.parse_args()
+
+    settings = StubSettings(latency=args.latency, token_rate=args.token_rate, tokens=args.tokens, error_rate=args.error_rate)
+    server = make_server(args.host, args.port, settings)
+    print(f"Stub LLM server listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+# chatbot/tts.py
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import time
+import wave
+
+try:
+    import fcntl
+except ImportError: # Windows: every process warms the cache
+    fcntl = None
+
+from .singleflight import SingleFlight
+
+
+class SynthesisBusy(Exception):
+    """Raised when too many clips are already waiting to be synthesized."""
+
+
+class SpeechSynthesizer:
+    """Offline text-to-speech engine. voice_id must change whenever the produced audio would."""
+
+    voice_id = ""
+
+    def synthesize(self, text):
+        """Returns the spoken text as WAV bytes."""
+        raise NotImplementedError
+
+
+class PiperSynthesizer(SpeechSynthesizer):
+    """
+    CPU speech synthesis with a local Piper (ONNX) voice.
+    The voice is loaded once per worker process, on first use; synthesis is serialized per process.
+    """
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.voice_id = f"piper:{os.path.basename(model_path)}:{int(os.path.getmtime(model_path))}"
+        self._voice = None
+        self._voice_pid = None
+        self._lock = threading.Lock()
+
+    def synthesize(self, text):
+        with self._lock:
+            if self._voice is None or self._voice_pid != os.getpid():
+                from piper.voice import PiperVoice
+                self._voice = PiperVoice.load(self.model_path)
+                self._voice_pid = os.getpid()
+            output = io.BytesIO()
+            with wave.open(output, "wb") as wav_file:
+                # piper-tts >= 1.3 renamed synthesize(text, wav_file) to synthesize_wav
+                synthesize_wav = getattr(self._voice, "synthesize_wav", None) or self._voice.synthesize
+                synthesize_wav(text, wav_file)
+            return output.getvalue()
+
+
+class AudioClipCache:
+    """
+    Content-addressed on-disk cache of synthesized clips: a clip's file name is the hash of the
+    voice and the text, so identical sentences are synthesized once and served as static files.
+    Clips are shared by all workers; the least recently served ones are pruned above max_files.
+    """
+
+    def __init__(self, directory, synthesizer, max_files=5000, max_pending=4):
+        self.directory = directory
+        self.synthesizer = synthesizer
+        self.max_files = max_files
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._inflight = SingleFlight(timeout=120)
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, text):
+        text = re.sub(r"\s+", " ", text).strip()
+        return hashlib.sha256(f"{self.synthesizer.voice_id}\x00{text}".encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.wav")
+
+    def get(self, text):
+        """
+        Returns (key, path) of the clip for text, synthesizing it on a miss.
+        Raises SynthesisBusy when max_pending clips are already being synthesized.
+        """
+        key = self.key(text)
+        path = self.path(key)
+        if os.path.exists(path):
+            os.utime(path) # Marks the clip as recently used for pruning
+            return key, path
+        # Concurrent requests for the same clip wait for one synthesis; only that one takes a slot
+        call, is_leader = self._inflight.begin(key)
+        if not is_leader:
+            call.wait(self._inflight.timeout)
+            return key, path
+        if not self._slots.acquire(blocking=False):
+            error = SynthesisBusy("Too many clips are being synthesized")
+            self._inflight.finish(key, call, error=error)
+            raise error
+        try:
+            self._create(text, path)
+        except Exception as e:
+            self._inflight.finish(key, call, error=e)
+            raise
+        finally:
+            self._slots.release()
+        self._inflight.finish(key, call, value=path)
+        return key, path
+
+    def _create(self, text, path):
+        if os.path.exists(path): # Written by another worker in the meantime
+            return path
+        audio = self.synthesizer.synthesize(re.sub(r"\s+", " ", text).strip())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so no worker ever serves a partially written clip
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as clip_file:
+            clip_file.write(audio)
+        os.replace(temporary_path, path)
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune()
+        return path
+
+    def prune(self):
+        """Deletes the least recently used clips above max_files."""
+        clips = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".wav"):
+                    clip_path = os.path.join(root, name)
+                    try:
+                        clips.append((os.path.getmtime(clip_path), clip_path))
+                    except OSError:
+                        continue
+        clips.sort(reverse=True)
+        for _, clip_path in clips[self.max_files:]:
+            try:
+                os.remove(clip_path)
+            except OSError:
+                pass
+
+    def prewarm(self, texts):
+        """
+        Synthesizes the given texts in a background thread, so they are cached before first use.
+        Only one process warms a cache directory at a time, and each clip takes one of the
+        max_pending slots, so requests keep their share of synthesis.
+        """
+        def run():
+            lock_file = open(os.path.join(self.directory, ".prewarm.lock"), "w")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return # Another worker is warming the same clips
+            start = time.perf_counter()
+            created = 0
+            try:
+                for text in dict.fromkeys(texts): # Unique, in order
+                    path = self.path(self.key(text))
+                    if os.path.exists(path):
+                        continue
+                    try:
+                        with self._slots: # Waits for a free slot instead of failing like get()
+                            self._create(text, path)
+                        created += 1
+                    except Exception as e:
+                        print(f"WARNING: Could not pre-synthesize {text[:40]!r}: {e}")
+            finally:
+                lock_file.close() # Releases the lock
+            print(f"Speech clip cache warmed: {created} new clips in {time.perf_counter() - start:.1f}s")
+
+        thread = threading.Thread(target=run, name="tts-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+
+def create_speech_synthesizer():
+    """
+    Builds the server speech synthesizer configured by environment variables:
+    TTS_BACKEND ('piper' or 'none', the default) and TTS_MODEL_PATH (a Piper .onnx voice).
+    Returns None when it is disabled or cannot be used, so the browser's voices stay the only ones.
+    """
+    backend_name = os.getenv("TTS_BACKEND", "none").lower()
+    if backend_name == "none":
+        return None
+    if backend_name != "piper":
+        raise ValueError(f"Unknown TTS_BACKEND: {backend_name!r}")
+    model_path = os.getenv("TTS_MODEL_PATH", "models/en_US-lessac-medium.onnx")
+    try:
+        import piper.voice # Optional dependency
+    except ImportError:
+        print("WARNING: TTS_BACKEND=piper but the 'piper-tts' package is not installed. Server speech synthesis is disabled.")
+        return None
+    if not os.path.isfile(model_path):
+        print(f"WARNING: Piper voice not found at {model_path}. Server speech synthesis is disabled.")
+        return None
+    return PiperSynthesizer(model_path)
@@ -0,0 +1,201 @@
+# chatbot/voice.py
+import json
+import threading
+
+from .llm import CancelToken, StreamCancelled
+from .speech import PCM_SAMPLE_WIDTH
+
+
+class VoiceSession:
+    """
+    One duplex voice connection (the /voice WebSocket). Messages come in as JSON text frames;
+    each answer goes out as 'sentence' events (each optionally followed by its audio clip as a
+    binary frame) and a final 'done' event, all carrying the message's id. Answers run in their
+    own thread, so a 'cancel' or a new message can interrupt the current one (barge-in) and abort
+    its LLM call.
+
+    Speech can be streamed in instead of a transcript: an 'audio_start' event (with the turn's id,
+    mode and sample "rate"), PCM16 audio as binary frames, then 'audio_end'. The user starting to
+    talk interrupts the answer in progress; 'partial' transcripts go out while they speak, and the
+    final 'transcript' event is followed by the answer as for a message.
+
+    answer(text, cancel, mode) yields sentences (mode is the message's optional "mode" field), admit() returns None or an error event for a
+    rejected message, and clip(sentence) returns audio bytes or None. listen(sample_rate) returns a
+    recognition stream (see chatbot.speech), or None when none is free; without it, speech is refused.
+    With `modes` given, a message asking for any other mode gets an 'error' event, as an HTTP request would get a 400.
+    """
+
+    def __init__(self, send, answer, admit=None, clip=None, modes=None, listen=None, max_audio_seconds=None):
+        self._send = send
+        self._send_lock = threading.Lock()
+        self.answer = answer
+        self.admit = admit
+        self.clip = clip
+        self.modes = modes
+        self.listen = listen
+        self.max_audio_seconds = max_audio_seconds
+        self.closed = False
+        self._turn = None # (thread, CancelToken) of the answer in progress
+        self._utterance = None # [recognition, id, mode, bytes left] of the speech being streamed in
+
+    def send(self, data):
+        """Sends one frame; a failed send (client gone) closes the session instead of raising."""
+        if self.closed:
+            return False
+        try:
+            with self._send_lock:
+                self._send(data)
+            return True
+        except Exception:
+            self.closed = True
+            self.cancel_turn()
+            return False
+
+    def send_event(self, payload):
+        return self.send(json.dumps(payload))
+
+    def handle(self, frame):
+        """Dispatches one frame received from the client."""
+        if isinstance(frame, (bytes, bytearray)):
+            self.hear(frame)
+            return
+        try:
+            event = json.loads(frame)
+        except (TypeError, ValueError):
+            self.send_event({"type": "error", "response": "Expected a JSON text frame."})
+            return
+        if not isinstance(event, dict):
+            self.send_event({"type": "error", "response": "Expected a JSON object."})
+            return
+        if event.get("type") == "cancel":
+            self.cancel_turn()
+        elif event.get("type") in ("message", "audio_start"):
+            mode = event.get("mode")
+            if mode and self.modes is not None and not (isinstance(mode, str) and mode in self.modes):
+                choices = " or ".join(f"'{name}'" for name in self.modes)
+                self.send_event({"type": "error", "id": event.get("id"), "response": f"Unknown 'mode': use {choices}."})
+            elif event["type"] == "audio_start":
+                self.start_utterance(event.get("id"), mode, event.get("rate", 16000))
+            else:
+                text = str(event.get("text", "")).strip()
+                if text:
+                    self.start_turn(text, event.get("id"), mode)
+        elif event.get("type") == "audio_end":
+            self.end_utterance()
+        else:
+            self.send_event({"type": "error", "response": f"Unknown event type: {event.get('type')!r}"})
+
+    def start_utterance(self, turn_id=None, mode=None, sample_rate=16000):
+        """Starts recognizing streamed speech, interrupting the answer in progress (barge-in)."""
+        self.cancel_turn()
+        self.drop_utterance()
+        if self.listen is None:
+            self.send_event({"type": "error", "id": turn_id, "response": "Server speech recognition is not available."})
+            return
+        if not isinstance(sample_rate, int) or not 8000 <= sample_rate <= 48000:
+            self.send_event({"type": "error", "id": turn_id, "response": "Invalid sample rate."})
+            return
+        if self._rejected(turn_id): # Counted like a message: recognition is the expensive part
+            return
+        recognition = self.listen(sample_rate)
+        if recognition is None:
+            self.send_event({"type": "error", "id": turn_id, "response": "Speech recognition is busy. Please try again in a moment."})
+            return
+        max_bytes = None
+        if self.max_audio_seconds is not None:
+            max_bytes = int(self.max_audio_seconds * sample_rate * PCM_SAMPLE_WIDTH)
+        self._utterance = [recognition, turn_id, mode, max_bytes]
+
+    def hear(self, chunk):
+        """Feeds one binary frame of PCM16 audio to the utterance being recognized."""
+        if self._utterance is None:
+            self.send_event({"type": "error", "response": "Send an 'audio_start' event before audio."})
+            return
+        recognition, turn_id, _, bytes_left = self._utterance
+        chunk = chunk[:len(chunk) - len(chunk) % PCM_SAMPLE_WIDTH]
+        if bytes_left is not None:
+            chunk = chunk[:bytes_left] # Audio past the maximum length is ignored, as by /stt/stream
+            self._utterance[3] -= len(chunk)
+        if chunk:
+            partial = recognition.accept(chunk)
+            if partial is not None:
+                self.send_event({"type": "partial", "id": turn_id, "text": partial})
+
+    def end_utterance(self):
+        """Finishes the utterance: sends its transcript, then answers it."""
+        if self._utterance is None:
+            return # Its 'audio_start' was refused, and already got an 'error' event
+        (recognition, turn_id, mode, _), self._utterance = self._utterance, None
+        transcript = recognition.finish()
+        self.send_event({"type": "transcript", "id": turn_id, "text": transcript})
+        if transcript:
+            self._start_thread(transcript, turn_id, mode)
+        else:
+            self.send_event({"type": "done", "id": turn_id, "response": "", "cancelled": False})
+
+    def drop_utterance(self):
+        """Discards the utterance being recognized, if any (releasing its recognizer)."""
+        utterance, self._utterance = self._utterance, None
+        if utterance is not None:
+            try:
+                utterance[0].finish()
+            except Exception:
+                pass
+
+    def start_turn(self, text, turn_id=None, mode=None):
+        """Answers text, interrupting the answer in progress if there is one."""
+        self.cancel_turn()
+        if not self._rejected(turn_id):
+            self._start_thread(text, turn_id, mode)
+
+    def _rejected(self, turn_id):
+        """Asks admit() for this turn; sends its error event and returns True if it was refused."""
+        if self.admit is None:
+            return False
+        rejection = self.admit()
+        if rejection is None:
+            return False
+        self.send_event({**rejection, "id": turn_id})
+        return True
+
+    def _start_thread(self, text, turn_id, mode):
+        token = CancelToken()
+        thread = threading.Thread(target=self._run_turn, args=(text, turn_id, token, mode), name="voice-turn", daemon=True)
+        self._turn = (thread, token)
+        thread.start()
+
+    def cancel_turn(self, timeout=5.0):
+        """Aborts the answer in progress and waits until it has sent its final 'done' event."""
+        turn, self._turn = self._turn, None
+        if turn is None:
+            return
+        thread, token = turn
+        token.cancel()
+        if thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def close(self):
+        self.closed = True
+        self.cancel_turn()
+        self.drop_utterance()
+
+    def _run_turn(self, text, turn_id, token, mode=None):
+        sentences = []
+        stream = self.answer(text, token, mode)
+        try:
+            for sentence in stream:
+                if token.cancelled:
+                    break
+                sentences.append(sentence)
+                audio = self.clip(sentence) if self.clip is not None else None
+                if not self.send_event({"type": "sentence", "id": turn_id, "text": sentence, "audio": audio is not None}):
+                    break
+                if audio is not None:
+                    self.send(audio)
+        except StreamCancelled:
+            pass
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close() # Ends the answer generator, cancelling its LLM call if it is still running
+        self.send_event({"type": "done", "id": turn_id, "response": " ".join(sentences), "cancelled": token.cancelled})
@@ -0,0 +1,127 @@
+# chatbot/writebehind.py
+import atexit
+import os
+import threading
+
+
+class WriteBehindBuffer:
+    """
+    Queues rows in memory and writes them in batches from a background thread, so requests never
+    wait for the database. A batch goes out as soon as max_batch rows are waiting, otherwise every
+    `interval` seconds, and whatever is left is written when the process exits.
+
+    write(rows) must store the whole batch or raise. A batch that fails with an error for which
+    is_transient(error) is true (e.g. the database is down) is queued again. Any other error means
+    some row can never be stored, so the batch is retried row by row and the failing rows are
+    dropped. If more than max_pending rows pile up, the oldest are dropped. Dropped rows are
+    reported to on_drop(count).
+    """
+
+    def __init__(self, write, max_batch=200, interval=2.0, max_pending=10000, on_drop=None, is_transient=None):
+        self.write = write
+        self.max_batch = max_batch
+        self.interval = interval
+        self.max_pending = max_pending
+        self.on_drop = on_drop
+        self.is_transient = is_transient or (lambda error: True)
+        self._pending = []
+        self._lock = threading.Lock() # Guards _pending
+        self._write_lock = threading.Lock() # Held while a batch is being written
+        self._wakeup = threading.Event()
+        self._thread_pid = None
+
+    def add(self, *rows):
+        """Queues rows; never blocks on the database."""
+        self.start()
+        with self._lock:
+            self._pending.extend(rows)
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+            full = len(self._pending) >= self.max_batch
+        if overflow > 0 and self.on_drop is not None:
+            self.on_drop(overflow)
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Writes everything queued so far, batch by batch; returns the number of rows written."""
+        written = 0
+        with self._write_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.max_batch]
+                    del self._pending[:self.max_batch]
+                if not batch:
+                    return written
+                try:
+                    self.write(batch)
+                except Exception as e:
+                    if self.is_transient(e):
+                        print(f"WARNING: Could not write {len(batch)} buffered rows, will retry: {e}")
+                        self._requeue(batch)
+                        return written
+                    print(f"WARNING: Could not write {len(batch)} buffered rows, writing them one by one: {e}")
+                    stored, retry = self._write_rows(batch)
+                    written += stored
+                    if retry:
+                        self._requeue(retry)
+                        return written
+                    continue
+                written += len(batch)
+
+    def _write_rows(self, batch):
+        """
+        Writes a failed batch one row at a time, dropping the rows that fail for good.
+        Returns (rows written, rows to queue again after a transient error).
+        """
+        written = dropped = 0
+        for i, row in enumerate(batch):
+            try:
+                self.write([row])
+            except Exception as e:
+                if self.is_transient(e):
+                    self._report_drop(dropped)
+                    return written, batch[i:]
+                print(f"WARNING: Dropping a buffered row that cannot be written: {e}")
+                dropped += 1
+                continue
+            written += 1
+        self._report_drop(dropped)
+        return written, []
+
+    def _requeue(self, rows):
+        with self._lock:
+            self._pending[:0] = rows
+
+    def _report_drop(self, count):
+        if count and self.on_drop is not None:
+            self.on_drop(count)
+
+    def discard(self, predicate):
+        """
+        Drops the queued rows for which predicate(row) is true; returns how many were dropped.
+        Waits for a batch being written to finish first, so none of those rows is written afterwards.
+        """
+        with self._write_lock, self._lock:
+            kept = [row for row in self._pending if not predicate(row)]
+            dropped = len(self._pending) - len(kept)
+            self._pending = kept
+        return dropped
+
+    def start(self):
+        """Starts the flushing thread in this process (again in a forked child)."""
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._run, name="write-behind", daemon=True).start()
+            atexit.register(self.flush) # Graceful worker shutdown writes the last rows
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
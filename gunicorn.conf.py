@@ -0,0 +1,56 @@
+# gunicorn.conf.py
+# Gunicorn settings, overridable with environment variables.
+import gc
+import glob
+import os
+import tempfile
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+
+# Threaded workers: a request waiting on Groq only parks its own thread, so /start,
+# static files and logins keep being served while completions are in flight.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+
+# Import the app once in the master and fork it into the workers: modules, intents and templates are
+# shared copy-on-write and the schema check runs once. Clients and threads start in each worker (post_worker_init).
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+# Long enough for a slow completion to finish streaming
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Each worker writes its metrics here so /metrics can report totals for all workers
+if not os.getenv("METRICS_MULTIPROC_DIR"):
+    os.environ["METRICS_MULTIPROC_DIR"] = os.path.join(tempfile.gettempdir(), f"chatbot-metrics-{os.getpid()}")
+
+
+def on_starting(server):
+    """Clears metric files left over from an earlier run."""
+    metrics_dir = os.environ["METRICS_MULTIPROC_DIR"]
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, "metrics_*.json")):
+        os.remove(path)
+
+
+def when_ready(server):
+    """
+    With preload, imports the LLM client libraries once here (each worker still creates its own client),
+    then moves every loaded object out of the garbage collector's reach so workers do not copy their pages.
+    """
+    if server.cfg.preload_app:
+        import groq, httpx # noqa: F401
+        gc.freeze()
+
+
+def child_exit(server, worker):
+    """Folds the metrics of an exited worker into the dead-workers totals and removes its file."""
+    from chatbot.metrics import retire_worker_metrics
+    retire_worker_metrics(os.environ["METRICS_MULTIPROC_DIR"], worker.pid)
+
+
+def post_worker_init(worker):
+    """Starts the worker's LLM client and background threads before it accepts requests."""
+    from app import init_worker
+    init_worker()
@@ -0,0 +1,47 @@
+"""Index the user columns the auth lookups filter on
+
+Revision ID: b3c91e4a2f60
+Revises: 7d5ffa915c5d
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3c91e4a2f60'
+down_revision = '7d5ffa915c5d'
+branch_labels = None
+depends_on = None
+
+# login filters on email OR username, the OAuth callbacks on provider id OR email,
+# and the username allocator range-scans username. Tables created by db.create_all()
+# already have these through their unique constraints; older tables may not.
+LOOKUP_COLUMNS = ['email', 'username', 'facebook_id', 'google_id']
+
+
+def _indexed_columns():
+    inspector = sa.inspect(op.get_bind())
+    covered = set()
+    for index in inspector.get_indexes('user'):
+        covered.add(index['column_names'][0])
+    for constraint in inspector.get_unique_constraints('user'):
+        covered.add(constraint['column_names'][0])
+    return covered
+
+
+def upgrade():
+    covered = _indexed_columns()
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        for column in LOOKUP_COLUMNS:
+            if column not in covered:
+                batch_op.create_index(f'ix_user_{column}', [column], unique=True)
+
+
+def downgrade():
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('user')}
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        for column in LOOKUP_COLUMNS:
+            if f'ix_user_{column}' in existing:
+                batch_op.drop_index(f'ix_user_{column}')
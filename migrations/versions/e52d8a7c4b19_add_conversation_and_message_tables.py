@@ -0,0 +1,67 @@
+"""Add conversation and message tables for chat transcripts
+
+Revision ID: e52d8a7c4b19
+Revises: b3c91e4a2f60
+Create Date: 2026-10-18 12:20:07.541882
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e52d8a7c4b19'
+down_revision = 'b3c91e4a2f60'
+branch_labels = None
+depends_on = None
+
+# Loading the app for `flask db` runs db.create_all(), which may already have created these tables.
+
+
+def _existing_tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    existing = _existing_tables()
+    if 'conversation' not in existing:
+        _create_conversation_table()
+    if 'message' not in existing:
+        _create_message_table()
+
+
+def _create_conversation_table():
+    op.create_table('conversation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_conversation_user_id'), ['user_id'], unique=False)
+
+
+def _create_message_table():
+    op.create_table('message',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('conversation_id', sa.Integer(), nullable=False),
+    sa.Column('role', sa.String(length=16), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('source', sa.String(length=16), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversation.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_message_conversation_id'), ['conversation_id'], unique=False)
+
+
+def downgrade():
+    existing = _existing_tables()
+    if 'message' in existing:
+        op.drop_table('message') # Drops its indexes too
+    if 'conversation' in existing:
+        op.drop_table('conversation')
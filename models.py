@@ -1,9 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from flask_login import UserMixin
-# Importing password hashing functions from Werkzeug.security
-from werkzeug.security import generate_password_hash, check_password_hash
+# Password hashing runs in a process pool (see chatbot/passwords.py), configured by app.py
+from chatbot.passwords import PasswordHasher
 
 db = SQLAlchemy()
+password_hasher = PasswordHasher()
 
 class User(db.Model, UserMixin):
     """
@@ -24,11 +28,127 @@ class User(db.Model, UserMixin):
     # Method to set (hash) the password
     # Explicitly using 'pbkdf2:sha256' as the hashing method to avoid 'scrypt' issues
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        self.password_hash = password_hasher.hash(password)
 
     # Method to check the password
     def check_password(self, password):
         # Ensure password_hash is not None before attempting to check
         if self.password_hash is None:
             return False
-        return check_password_hash(self.password_hash, password)
\ No newline at end of file
+        return password_hasher.verify(self.password_hash, password)
+
+    # True if the password was hashed with older cost parameters and should be hashed again
+    def password_needs_rehash(self):
+        return self.password_hash is not None and password_hasher.needs_rehash(self.password_hash)
+
+class Conversation(db.Model):
+    """
+    One chat thread, keyed like the in-memory history in app.py: 'user:<id>' for logged-in users,
+    'session:<random id>' for anonymous ones. Rows are written in batches (see save_messages).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True) # None for anonymous chats
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    messages = db.relationship('Message', backref='conversation', lazy='dynamic')
+
+    def __repr__(self):
+        return f'<Conversation {self.key}>'
+
+
+class Message(db.Model):
+    """A single chat turn: the user's question or the bot's answer."""
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False, index=True)
+    role = db.Column(db.String(16), nullable=False) # 'user' or 'assistant'
+    content = db.Column(db.Text, nullable=False)
+    source = db.Column(db.String(16), nullable=True) # Where an answer came from: intent, cache, llm, shared
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f'<Message {self.id} {self.role}>'
+
+
+INSERT_CHUNK_ROWS = 100 # Rows per multi-row INSERT, well below SQLite's bound-parameter limit
+
+
+def _insert_ignoring_duplicates(model):
+    """INSERT that skips rows violating a unique constraint (another worker may have added them)."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return sqlite_insert(model).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        return postgresql_insert(model).on_conflict_do_nothing()
+    return None
+
+
+def _begin_write():
+    """
+    Starts the transaction as a writer before it reads what its writes depend on. SQLite's driver
+    would only begin it at the first INSERT or DELETE, so another worker could commit in between;
+    BEGIN IMMEDIATE takes the database's write lock now (waiting up to the busy timeout).
+    On PostgreSQL the callers lock the rows they depend on instead.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def save_messages(rows):
+    """
+    Stores a batch of buffered messages (dicts with key, user_id, role, content, source, created_at)
+    in one transaction: missing conversations, then all messages, with multi-row INSERTs.
+    Messages of users deleted in the meantime are skipped. Returns the number of messages stored.
+    """
+    user_ids = {row['user_id'] for row in rows if row['user_id'] is not None}
+    if user_ids:
+        # The users found must still exist at commit: a deletion (delete_user_transcripts) either
+        # ran before this check or waits for this transaction, and then removes its rows too
+        _begin_write()
+        existing = set(db.session.scalars(
+            select(User.id).where(User.id.in_(user_ids)).with_for_update(key_share=True)
+        ))
+        rows = [row for row in rows if row['user_id'] is None or row['user_id'] in existing]
+    if not rows:
+        return 0
+
+    conversations = {}
+    for row in rows:
+        conversations.setdefault(row['key'], {'key': row['key'], 'user_id': row['user_id'], 'created_at': row['created_at']})
+    known = dict(db.session.execute(select(Conversation.key, Conversation.id).where(Conversation.key.in_(conversations))).all())
+    missing = [conversation for key, conversation in conversations.items() if key not in known]
+    if missing:
+        statement = _insert_ignoring_duplicates(Conversation)
+        if statement is None: # Other databases: plain INSERT of the rows not found above
+            statement = insert(Conversation)
+        db.session.execute(statement.values(missing))
+        known.update(db.session.execute(
+            select(Conversation.key, Conversation.id).where(Conversation.key.in_([c['key'] for c in missing]))
+        ).all())
+
+    messages = [
+        {
+            'conversation_id': known[row['key']],
+            'role': row['role'],
+            'content': row['content'],
+            'source': row['source'],
+            'created_at': row['created_at'],
+        }
+        for row in rows
+    ]
+    for start in range(0, len(messages), INSERT_CHUNK_ROWS):
+        db.session.execute(insert(Message).values(messages[start:start + INSERT_CHUNK_ROWS]))
+    db.session.commit()
+    return len(messages)
+
+
+def delete_user_transcripts(user_id):
+    """
+    Deletes a user's conversations and messages; the caller commits (e.g. with the user's own deletion).
+    Locks the user first, so a transcript batch being saved for them finishes before the rows are deleted.
+    """
+    _begin_write()
+    db.session.execute(select(User.id).where(User.id == user_id).with_for_update())
+    conversation_ids = select(Conversation.id).where(Conversation.user_id == user_id)
+    db.session.execute(delete(Message).where(Message.conversation_id.in_(conversation_ids)))
+    db.session.execute(delete(Conversation).where(Conversation.user_id == user_id))
@@ -15,9 +15,99 @@ const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecogni
 let recognition;
 let isListening = false; // Flag to track if microphone is actively listening
 
-// Web Speech API for Speech Synthesis (Text-to-Speech)
-const synth = window.speechSynthesis;
+// Server speech recognition (/stt/stream), set by the page when STT_BACKEND is configured
+const serverSpeechAvailable = window.SERVER_STT_AVAILABLE === true;
+
+// Server speech synthesis (/tts), set by the page when TTS_BACKEND is configured.
+// Plays one cached WAV clip per sentence and offers the subset of speechSynthesis used below.
+class ServerSpeechSynthesis {
+    constructor() {
+        this.queue = []; // { utterance, audio } waiting to be played
+        this.current = null;
+        this.paused = false;
+        this.onvoiceschanged = null;
+    }
+
+    get speaking() {
+        return this.current !== null;
+    }
+
+    get pending() {
+        return this.queue.length > 0;
+    }
+
+    getVoices() {
+        return [];
+    }
+
+    speak(utterance) {
+        // Start downloading right away, so the clip is ready when the previous sentence ends.
+        // Clips received over the voice socket come as blob: URLs instead.
+        const audio = new Audio(utterance.audioUrl || `${window.location.origin}/tts?text=${encodeURIComponent(utterance.text)}`);
+        audio.preload = 'auto';
+        this.queue.push({ utterance, audio });
+        if (this.current === null) {
+            this.playNext();
+        }
+    }
+
+    playNext() {
+        const item = this.queue.shift();
+        this.current = item || null;
+        if (!item) {
+            return;
+        }
+        const finish = (handler, event) => {
+            if (item.utterance.audioUrl) {
+                URL.revokeObjectURL(item.utterance.audioUrl);
+            }
+            if (this.current !== item) {
+                return; // Cancelled
+            }
+            this.current = null;
+            if (handler) {
+                handler(event);
+            }
+            if (this.current === null) {
+                this.playNext();
+            }
+        };
+        item.audio.onended = () => finish(item.utterance.onend);
+        item.audio.onerror = (event) => finish(item.utterance.onerror, event);
+        // play() is rejected e.g. by autoplay policies before the user has interacted with the page
+        item.audio.play().catch((error) => finish(item.utterance.onerror, error));
+    }
+
+    cancel() {
+        const items = this.current ? [this.current, ...this.queue] : this.queue;
+        this.queue = [];
+        this.current = null;
+        this.paused = false;
+        items.forEach(({ audio }) => {
+            audio.pause();
+            audio.removeAttribute('src');
+        });
+    }
+
+    pause() {
+        if (this.current) {
+            this.current.audio.pause();
+            this.paused = true;
+        }
+    }
+
+    resume() {
+        if (this.current && this.paused) {
+            this.current.audio.play();
+            this.paused = false;
+        }
+    }
+}
+
+// Web Speech API for Speech Synthesis (Text-to-Speech), or the server's voice when available
+const synth = window.SERVER_TTS_AVAILABLE === true ? new ServerSpeechSynthesis() : window.speechSynthesis;
 let currentUtterance = null; // To keep track of the current speech utterance
+let streamingResponse = false; // True while a streamed bot response is still arriving
 let availableVoices = []; // Array to store available voices
 
 // Populate available voices once they are loaded
@@ -33,6 +123,12 @@ synth.onvoiceschanged = () => {
 
 // Function to initialize the chat interface (bot's welcome message)
 async function startChat() {
+    // The server inlines the welcome turn into the page; /start is only needed without it
+    if (window.WELCOME_TURN) {
+        addMessage(window.WELCOME_TURN.response, 'bot');
+        speakMessage(window.WELCOME_TURN.response);
+        return;
+    }
     try {
         // URL is made absolute using window.location.origin
         const response = await fetch(`${window.location.origin}/start`, {
@@ -97,14 +193,45 @@ function addMessage(text, sender) {
 
     // Auto-scroll to the bottom
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return messageDiv;
+}
+
+// Called once the bot has finished speaking its whole response
+function onBotSpeechFinished() {
+    console.log('Bot finished speaking. Re-enabling microphone if not listening.');
+    // After bot finishes speaking, automatically start listening again if not already listening
+    if (recognition && !isListening) {
+        if (micButton) { 
+            micButton.classList.remove('bg-gray-400', 'cursor-not-allowed');
+        }
+        try {
+            recognition.start(); // Restart listening
+        } catch (e) {
+            console.error("Error restarting microphone after speech:", e);
+            if (micStatus) {
+                micStatus.textContent = "Error restarting microphone.";
+            }
+        }
+    } else if (!recognition) {
+        if (micStatus) {
+            micStatus.textContent = "Your browser does not support speech recognition.";
+        }
+    } else {
+        if (micStatus) {
+            micStatus.textContent = "Press the microphone button to start speaking.";
+        }
+    }
 }
 
 // Function to make the bot speak the message using Web Speech API (SpeechSynthesis)
-function speakMessage(text) {
-    if (synth.speaking) { // If bot is already speaking, stop it
+// Pass queue = true to speak after the current utterance instead of interrupting it (used for streamed sentences)
+// audioUrl is a clip of the text already received from the server voice
+function speakMessage(text, queue = false, audioUrl = null) {
+    if (synth.speaking && !queue) { // If bot is already speaking, stop it
         synth.cancel();
     }
-    currentUtterance = new SpeechSynthesisUtterance(text);
+    // The server voice only needs the text and the onend/onerror handlers
+    currentUtterance = synth instanceof ServerSpeechSynthesis ? { text: text, audioUrl: audioUrl } : new SpeechSynthesisUtterance(text);
     currentUtterance.lang = 'en-US'; // Set speech language to English. (Change to 'tr-TR' for Turkish if needed.)
 
     // --- Voice Customization (Web Speech API) ---
@@ -130,29 +257,11 @@ function speakMessage(text) {
 
     // Event listener for when the bot finishes speaking
     currentUtterance.onend = () => {
-        console.log('Bot finished speaking. Re-enabling microphone if not listening.');
-        // After bot finishes speaking, automatically start listening again if not already listening
-        if (recognition && !isListening) {
-             if (micButton) { 
-                micButton.classList.remove('bg-gray-400', 'cursor-not-allowed');
-             }
-             try {
-                recognition.start(); // Restart listening
-             } catch (e) {
-                 console.error("Error restarting microphone after speech:", e);
-                 if (micStatus) {
-                    micStatus.textContent = "Error restarting microphone.";
-                 }
-             }
-        } else if (!recognition) {
-            if (micStatus) {
-                micStatus.textContent = "Your browser does not support speech recognition.";
-            }
-        } else {
-            if (micStatus) {
-                micStatus.textContent = "Press the microphone button to start speaking.";
-            }
+        // More sentences are still queued or arriving, keep the microphone off until the last one
+        if (streamingResponse || synth.pending) {
+            return;
         }
+        onBotSpeechFinished();
     };
 
     currentUtterance.onerror = (event) => {
@@ -209,6 +318,307 @@ function resumeVoice() {
 }
 
 
+// Shows the sentences of a streamed response in one bot message bubble and speaks each one as it arrives
+function createResponseRenderer(thinkingMessageWrapper) {
+    let messageDiv = null;
+    let spokenSentences = 0;
+    const renderer = {
+        get started() {
+            return messageDiv !== null;
+        },
+        // speak = false when the sentence's audio arrives separately (see speakSentence)
+        addSentence(text, speak = true) {
+            if (messageDiv === null) {
+                // First sentence: replace the thinking message with the bot's message bubble
+                if (thinkingMessageWrapper.parentNode) {
+                    chatMessages.removeChild(thinkingMessageWrapper);
+                }
+                messageDiv = addMessage(text, 'bot');
+            } else {
+                messageDiv.textContent += ' ' + text;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            }
+            if (speak) {
+                renderer.speakSentence(text);
+            }
+        },
+        speakSentence(text, audioUrl = null) {
+            // Later sentences are queued after the one currently being spoken
+            speakMessage(text, spokenSentences > 0, audioUrl);
+            spokenSentences++;
+        },
+    };
+    return renderer;
+}
+
+// Reads a Server-Sent Events response from /chat/stream and speaks each sentence as soon as it arrives
+// Other events (e.g. speech transcripts) are passed to onEvent
+async function readStreamedResponse(response, thinkingMessageWrapper, onEvent = null) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    const renderer = createResponseRenderer(thinkingMessageWrapper);
+
+    streamingResponse = true;
+    try {
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffered += decoder.decode(value, { stream: true });
+
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffered.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffered.slice(0, boundary);
+                buffered = buffered.slice(boundary + 2);
+                if (!rawEvent.startsWith('data: ')) {
+                    continue;
+                }
+                const event = JSON.parse(rawEvent.slice(6));
+                if (event.type !== 'sentence') {
+                    if (onEvent) {
+                        onEvent(event);
+                    }
+                    continue;
+                }
+
+                renderer.addSentence(event.text);
+            }
+        }
+    } finally {
+        streamingResponse = false;
+    }
+
+    if (!renderer.started) {
+        throw new Error('Stream ended without a response.');
+    }
+    // The last sentence may have finished speaking before the stream closed
+    if (!synth.speaking && !synth.pending) {
+        onBotSpeechFinished();
+    }
+}
+
+// ---- Voice Session (WebSocket) ----
+// When the server offers /voice, a socket carries spoken messages in and the streamed sentences
+// (and, with the server voice, their audio clips) out, instead of one HTTP request per turn.
+// Each open socket holds a server thread, so it is opened when the user starts speaking and
+// closed after VOICE_SOCKET_IDLE_MS without a turn.
+const VOICE_SOCKET_IDLE_MS = 30000;
+let voiceSocket = null; // Open socket, or null to use /chat/stream
+let voiceSocketConnecting = null; // Socket waiting for its 'ready' event
+let voiceSocketListens = false; // The open socket accepts streamed speech (server speech recognition)
+let voiceSocketRetryMs = 1000;
+let voiceSocketRetryAt = 0; // No new socket before this time after one failed to open
+let voiceSocketIdleTimer = null;
+let voiceTurnCounter = 0;
+let currentTurn = null; // { id, renderer, resolve, reject, onSpeech } of the socket answer in progress
+let pendingAudio = null; // { id, text } of the sentence whose audio clip is the next binary frame
+let currentRequest = null; // AbortController of the /chat/stream request in progress
+
+function connectVoiceSocket() {
+    if (window.VOICE_SOCKET_AVAILABLE !== true || voiceSocket || voiceSocketConnecting || Date.now() < voiceSocketRetryAt) {
+        return;
+    }
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const audio = synth instanceof ServerSpeechSynthesis ? '?audio=1' : '';
+    const socket = new WebSocket(`${protocol}//${window.location.host}/voice${audio}`);
+    voiceSocketConnecting = socket;
+    socket.onmessage = (message) => handleVoiceSocketMessage(socket, message);
+    socket.onclose = () => {
+        if (voiceSocket === socket) {
+            voiceSocket = null; // Closed when idle or by the server; the next spoken turn opens a new one
+        } else if (voiceSocketConnecting === socket) {
+            // Refused (e.g. no conversation yet: the first message goes over /chat/stream) or unreachable
+            voiceSocketConnecting = null;
+            voiceSocketRetryAt = Date.now() + voiceSocketRetryMs;
+            voiceSocketRetryMs = Math.min(voiceSocketRetryMs * 2, 30000);
+        }
+        if (currentTurn) {
+            currentTurn.reject(new Error('Voice session closed.'));
+            currentTurn = null;
+        }
+    };
+}
+
+// (Re)starts the countdown after which an idle voice socket is closed
+function scheduleVoiceSocketClose() {
+    clearTimeout(voiceSocketIdleTimer);
+    voiceSocketIdleTimer = setTimeout(() => {
+        if (currentTurn) {
+            scheduleVoiceSocketClose();
+        } else if (voiceSocket) {
+            voiceSocket.close();
+        }
+    }, VOICE_SOCKET_IDLE_MS);
+}
+
+function handleVoiceSocketMessage(socket, message) {
+    if (typeof message.data !== 'string') {
+        // Audio clip of the sentence announced just before
+        if (pendingAudio && currentTurn && pendingAudio.id === currentTurn.id) {
+            currentTurn.renderer.speakSentence(pendingAudio.text, URL.createObjectURL(message.data));
+        }
+        pendingAudio = null;
+        return;
+    }
+    const event = JSON.parse(message.data);
+    if (event.type === 'ready') {
+        voiceSocket = socket;
+        voiceSocketConnecting = null;
+        voiceSocketListens = event.listen === true;
+        voiceSocketRetryMs = 1000;
+        scheduleVoiceSocketClose();
+        return;
+    }
+    if (!currentTurn || event.id !== currentTurn.id) {
+        if (event.type === 'sentence' && event.audio) {
+            pendingAudio = { id: event.id, text: event.text }; // Its clip must be skipped too
+        }
+        return; // Late events of an interrupted answer
+    }
+    if (event.type === 'partial' || event.type === 'transcript') {
+        if (currentTurn.onSpeech) {
+            currentTurn.onSpeech(event);
+        }
+    } else if (event.type === 'sentence') {
+        currentTurn.renderer.addSentence(event.text, !event.audio);
+        if (event.audio) {
+            pendingAudio = { id: event.id, text: event.text };
+        }
+    } else if (event.type === 'done' || event.type === 'error') {
+        const turn = currentTurn;
+        currentTurn = null;
+        scheduleVoiceSocketClose();
+        turn.resolve(event);
+    }
+}
+
+// Sends a message over the voice socket; resolves with the final 'done' (or 'error') event
+function askVoiceSocket(message, mode, thinkingMessageWrapper) {
+    return new Promise((resolve, reject) => {
+        const id = ++voiceTurnCounter;
+        const renderer = createResponseRenderer(thinkingMessageWrapper);
+        currentTurn = { id, renderer, resolve: (event) => resolve({ event, renderer }), reject };
+        scheduleVoiceSocketClose();
+        voiceSocket.send(JSON.stringify({ type: 'message', id: id, text: message, mode: mode }));
+    });
+}
+
+// Starts streaming the user's speech over the voice socket, interrupting the bot (barge-in).
+// Partial transcripts fill the input box while the user speaks; the transcript then becomes the
+// user's message and is answered as by askVoiceSocket. Returns the turn for readVoiceSocketSpeech.
+function listenOverVoiceSocket(mode) {
+    interruptBot();
+    const id = ++voiceTurnCounter;
+    const thinkingMessageWrapper = createThinkingMessage();
+    const renderer = createResponseRenderer(thinkingMessageWrapper);
+    const turn = { id, renderer, thinkingMessageWrapper, transcript: null };
+    turn.done = new Promise((resolve, reject) => {
+        currentTurn = {
+            id, renderer, reject,
+            resolve: (event) => resolve({ event, renderer }),
+            onSpeech: (event) => {
+                if (event.type === 'partial') {
+                    if (userInput) {
+                        userInput.value = event.text;
+                    }
+                    return;
+                }
+                turn.transcript = event.text;
+                if (userInput) {
+                    userInput.value = '';
+                }
+                if (event.text) {
+                    addMessage(event.text, 'user');
+                    chatMessages.appendChild(thinkingMessageWrapper);
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                }
+            },
+        };
+    });
+    scheduleVoiceSocketClose();
+    voiceSocket.send(JSON.stringify({ type: 'audio_start', id: id, mode: mode, rate: 16000 }));
+    return turn;
+}
+
+// Shows the answer to speech streamed by listenOverVoiceSocket once the user has stopped
+async function readVoiceSocketSpeech(turn) {
+    try {
+        streamingResponse = true;
+        const { event, renderer } = await turn.done;
+        streamingResponse = false;
+        if (turn.transcript === '') {
+            if (micStatus) {
+                micStatus.textContent = "Empty speech detected. Please try again.";
+            }
+            return;
+        }
+        finishVoiceTurn(event, renderer, turn.thinkingMessageWrapper);
+    } catch (error) {
+        streamingResponse = false;
+        if (turn.thinkingMessageWrapper.parentNode) {
+            chatMessages.removeChild(turn.thinkingMessageWrapper);
+        }
+        console.error('Error in server speech recognition:', error);
+        addMessage('Sorry, I cannot respond at the moment.', 'bot');
+        if (micStatus) {
+            micStatus.textContent = "Error processing request.";
+        }
+    }
+}
+
+// Shows the end of a socket answer: its error (e.g. query limit reached), or nothing more once it was spoken
+function finishVoiceTurn(event, renderer, thinkingMessageWrapper) {
+    if (event.type === 'error') {
+        if (thinkingMessageWrapper.parentNode) {
+            chatMessages.removeChild(thinkingMessageWrapper);
+        }
+        addMessage(event.response, 'bot');
+        speakMessage(event.response);
+    } else if (!renderer.started) {
+        if (thinkingMessageWrapper.parentNode) {
+            chatMessages.removeChild(thinkingMessageWrapper);
+        }
+        if (!event.cancelled) {
+            throw new Error('Voice session ended without a response.');
+        }
+    } else if (!synth.speaking && !synth.pending) {
+        onBotSpeechFinished(); // The last sentence finished speaking before 'done' arrived
+    }
+}
+
+// Barge-in: stops the bot's voice and aborts the answer still being generated, along with its Groq call
+function interruptBot() {
+    if (currentTurn) {
+        const turn = currentTurn;
+        currentTurn = null;
+        if (voiceSocket) {
+            voiceSocket.send(JSON.stringify({ type: 'cancel' }));
+        }
+        turn.resolve({ type: 'done', cancelled: true });
+    }
+    if (currentRequest) {
+        currentRequest.abort(); // Closing the response stream ends the server's Groq call too
+        currentRequest = null;
+    }
+    if (synth.speaking || synth.pending) {
+        synth.cancel();
+    }
+}
+
+// Creates the "bot thinking" placeholder shown until the first sentence of the response arrives
+function createThinkingMessage() {
+    const thinkingMessageWrapper = document.createElement('div');
+    thinkingMessageWrapper.classList.add('flex', 'mb-4', 'items-end', 'justify-start'); 
+    const thinkingMessageDiv = document.createElement('div');
+    thinkingMessageDiv.classList.add('p-3', 'rounded-xl', 'bg-gray-200', 'text-gray-800', 'max-w-[80%]', 'break-words', 'rounded-bl-none', 'shadow-md');
+    thinkingMessageDiv.innerHTML = '<span class="animate-pulse">Bot thinking...</span>';
+    thinkingMessageWrapper.appendChild(thinkingMessageDiv);
+    return thinkingMessageWrapper;
+}
+
 // Function to send message (for both text input and speech recognition text)
 async function sendMessage(messageFromSpeech = null) {
     let message;
@@ -226,38 +636,52 @@ async function sendMessage(messageFromSpeech = null) {
     }
 
     if (message === '') return;
-
-    // Stop current bot speech if any when user is about to send a message
-    if (synth.speaking) { // Use synth.speaking for Web Speech API
-        synth.cancel();
+    // Spoken questions get short answers in plain sentences; typed ones get the full on-screen answer
+    const mode = messageFromSpeech !== null ? 'voice' : 'text';
+    if (mode === 'voice') {
+        connectVoiceSocket(); // For the next turns, if it is not open yet
     }
 
+    // Stop current bot speech and the answer still arriving, if any, when user is about to send a message
+    interruptBot();
+
     addMessage(message, 'user');
     if (userInput) { 
         userInput.value = ''; // Clear the message input box after sending
     }
 
     // Display a "bot thinking" message
-    const thinkingMessageWrapper = document.createElement('div');
-    thinkingMessageWrapper.classList.add('flex', 'mb-4', 'items-end', 'justify-start'); 
-    const thinkingMessageDiv = document.createElement('div');
-    thinkingMessageDiv.classList.add('p-3', 'rounded-xl', 'bg-gray-200', 'text-gray-800', 'max-w-[80%]', 'break-words', 'rounded-bl-none', 'shadow-md');
-    thinkingMessageDiv.innerHTML = '<span class="animate-pulse">Bot thinking...</span>';
+    const thinkingMessageWrapper = createThinkingMessage();
     chatMessages.appendChild(thinkingMessageWrapper);
     chatMessages.scrollTop = chatMessages.scrollHeight; 
 
     try {
+        if (voiceSocket) {
+            streamingResponse = true;
+            const { event, renderer } = await askVoiceSocket(message, mode, thinkingMessageWrapper);
+            streamingResponse = false;
+            finishVoiceTurn(event, renderer, thinkingMessageWrapper);
+            return;
+        }
+
         // URL is made absolute using window.location.origin
-        const response = await fetch(`${window.location.origin}/chat`, {
+        currentRequest = new AbortController();
+        const response = await fetch(`${window.location.origin}/chat/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ message: message }),
+            body: JSON.stringify({ message: message, mode: mode }),
+            signal: currentRequest.signal,
         });
 
-        // Ensure the response is JSON before parsing
         const contentType = response.headers.get("content-type");
+        if (contentType && contentType.includes("text/event-stream")) {
+            await readStreamedResponse(response, thinkingMessageWrapper);
+            return;
+        }
+
+        // Errors (e.g. query limit reached) still come back as plain JSON
         if (!contentType || !contentType.includes("application/json")) {
             const errorText = await response.text();
             console.error("Backend returned non-JSON for /chat:", errorText);
@@ -278,8 +702,14 @@ async function sendMessage(messageFromSpeech = null) {
         speakMessage(data.response); 
         
     } catch (error) {
+        streamingResponse = false;
+        if (thinkingMessageWrapper.parentNode) {
+            chatMessages.removeChild(thinkingMessageWrapper); // Remove thinking message even on error
+        }
+        if (error.name === 'AbortError') {
+            return; // Interrupted by the user (barge-in)
+        }
         console.error('Error sending message:', error);
-        chatMessages.removeChild(thinkingMessageWrapper); // Remove thinking message even on error
         addMessage('Sorry, I cannot respond at the moment.', 'bot');
         if (micStatus) { 
             micStatus.textContent = "Error processing request.";
@@ -298,6 +728,196 @@ async function sendMessage(messageFromSpeech = null) {
     }
 }
 
+// ---- Server Speech Recognition ----
+// Records the microphone as 16 kHz 16-bit PCM and sends it to the server, which transcribes it
+// and answers it: over the voice socket when one is open, with partial transcripts while the
+// user speaks, otherwise to /stt/stream. Used when the browser has no SpeechRecognition or its
+// recognizer fails with a network error; it has the same start/stop/on* interface.
+const SILENCE_LEVEL = 0.01; // RMS below this counts as silence
+const SILENCE_MS = 1200; // Stop after this much silence following speech
+const MAX_UTTERANCE_MS = 30000;
+
+// Streaming uploads (fetch with a ReadableStream body) need HTTP/2, so only over https
+const supportsRequestStreams = window.location.protocol === 'https:' && (() => {
+    let duplexAccessed = false;
+    const hasContentType = new Request('', {
+        body: new ReadableStream(),
+        method: 'POST',
+        get duplex() {
+            duplexAccessed = true;
+            return 'half';
+        },
+    }).headers.has('Content-Type');
+    return duplexAccessed && !hasContentType;
+})();
+
+class ServerSpeechRecognition {
+    constructor() {
+        this.onstart = null;
+        this.onend = null;
+        this.onerror = null;
+        this.onresult = null; // Not used: the server answers the transcript itself
+        this.active = false;
+    }
+
+    async start() {
+        if (this.active) {
+            throw new Error('Server speech recognition has already started.');
+        }
+        this.active = true;
+        try {
+            this.mediaStream = await navigator.mediaDevices.getUserMedia({ audio: true });
+        } catch (e) {
+            this.active = false;
+            this.onerror && this.onerror({ error: 'not-allowed' });
+            this.onend && this.onend();
+            return;
+        }
+        this.audioContext = new AudioContext({ sampleRate: 16000 });
+        const source = this.audioContext.createMediaStreamSource(this.mediaStream);
+        this.processor = this.audioContext.createScriptProcessor(4096, 1, 1);
+        this.chunks = [];
+        this.uploader = null;
+        this.response = null;
+        this.socketTurn = null;
+        if (voiceSocket && voiceSocketListens) {
+            this.socketTurn = listenOverVoiceSocket('voice');
+        } else if (supportsRequestStreams) {
+            // Audio is uploaded while the user speaks, so the server transcribes it as it arrives
+            const body = new ReadableStream({ start: (controller) => { this.uploader = controller; } });
+            this.response = this.post(body, { duplex: 'half' });
+        }
+
+        const startedAt = performance.now();
+        let heardSpeech = false;
+        let lastSpeechAt = startedAt;
+        this.processor.onaudioprocess = (event) => {
+            if (!this.active) {
+                return;
+            }
+            const samples = event.inputBuffer.getChannelData(0);
+            const pcm = new Int16Array(samples.length);
+            let energy = 0;
+            for (let i = 0; i < samples.length; i++) {
+                const sample = Math.max(-1, Math.min(1, samples[i]));
+                pcm[i] = sample < 0 ? sample * 0x8000 : sample * 0x7FFF;
+                energy += sample * sample;
+            }
+            if (this.socketTurn) {
+                if (voiceSocket) {
+                    voiceSocket.send(pcm.buffer);
+                }
+            } else if (this.uploader) {
+                this.uploader.enqueue(new Uint8Array(pcm.buffer));
+            } else {
+                this.chunks.push(pcm);
+            }
+
+            const now = performance.now();
+            if (Math.sqrt(energy / samples.length) > SILENCE_LEVEL) {
+                heardSpeech = true;
+                lastSpeechAt = now;
+            }
+            if ((heardSpeech && now - lastSpeechAt > SILENCE_MS) || now - startedAt > MAX_UTTERANCE_MS) {
+                this.stop();
+            }
+        };
+        source.connect(this.processor);
+        this.processor.connect(this.audioContext.destination);
+        this.onstart && this.onstart();
+    }
+
+    post(body, options = {}) {
+        return fetch(`${window.location.origin}/stt/stream`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'audio/l16; rate=16000' },
+            body: body,
+            ...options,
+        });
+    }
+
+    stop() {
+        if (!this.active) {
+            return;
+        }
+        this.active = false;
+        this.processor.disconnect();
+        this.mediaStream.getTracks().forEach((track) => track.stop());
+        this.audioContext.close();
+        if (this.socketTurn) {
+            if (voiceSocket) {
+                voiceSocket.send(JSON.stringify({ type: 'audio_end' }));
+            }
+            this.onend && this.onend();
+            readVoiceSocketSpeech(this.socketTurn);
+            return;
+        }
+        if (this.uploader) {
+            this.uploader.close();
+        } else {
+            this.response = this.post(new Blob(this.chunks));
+            this.chunks = [];
+        }
+        this.onend && this.onend();
+        readSpeechResponse(this.response);
+        connectVoiceSocket(); // The next utterance streams over it, with partial transcripts
+    }
+}
+
+// Shows the transcript of /stt/stream as the user's message, and reads the answer like a
+// /chat/stream response
+async function readSpeechResponse(responsePromise) {
+    const thinkingMessageWrapper = createThinkingMessage();
+    let transcript = null;
+    try {
+        const response = await responsePromise;
+        const contentType = response.headers.get("content-type");
+        if (!contentType || !contentType.includes("text/event-stream")) {
+            // Errors (e.g. query limit reached, recognizer busy) come back as plain JSON
+            const data = await response.json();
+            addMessage(data.response, 'bot');
+            return;
+        }
+        await readStreamedResponse(response, thinkingMessageWrapper, (event) => {
+            if (event.type === 'transcript') {
+                transcript = event.text;
+                if (transcript) {
+                    addMessage(transcript, 'user');
+                    chatMessages.appendChild(thinkingMessageWrapper);
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                }
+            }
+        });
+    } catch (error) {
+        if (thinkingMessageWrapper.parentNode) {
+            chatMessages.removeChild(thinkingMessageWrapper);
+        }
+        if (transcript === '') {
+            if (micStatus) {
+                micStatus.textContent = "Empty speech detected. Please try again.";
+            }
+            return;
+        }
+        console.error('Error in server speech recognition:', error);
+        addMessage('Sorry, I cannot respond at the moment.', 'bot');
+        if (micStatus) {
+            micStatus.textContent = "Error processing request.";
+        }
+    }
+}
+
+// Replaces the browser's recognizer with the server one, keeping its event handlers
+function useServerRecognition() {
+    const serverRecognition = new ServerSpeechRecognition();
+    if (recognition) {
+        serverRecognition.onstart = recognition.onstart;
+        serverRecognition.onend = recognition.onend;
+        serverRecognition.onerror = recognition.onerror;
+    }
+    recognition = serverRecognition;
+    return serverRecognition;
+}
+
 // ---- Speech Recognition (Web Speech API) Code ----
 // Initial status update for micStatus on load.
 // This ensures micStatus has a default text even before startChat finishes or if recognition is unsupported.
@@ -307,15 +927,20 @@ if (micStatus) {
 
 
 // Check if Web Speech API is supported
-if (SpeechRecognition) {
-    recognition = new SpeechRecognition();
-    recognition.continuous = false; 
-    recognition.lang = 'en-US'; // Set language to English. (Change to 'tr-TR' for Turkish if needed)
-    recognition.interimResults = false; 
+if (SpeechRecognition || serverSpeechAvailable) {
+    if (SpeechRecognition) {
+        recognition = new SpeechRecognition();
+        recognition.continuous = false; 
+        recognition.lang = 'en-US'; // Set language to English. (Change to 'tr-TR' for Turkish if needed)
+        recognition.interimResults = false; 
+    } else {
+        recognition = new ServerSpeechRecognition(); // e.g. Firefox
+    }
 
     // When speech recognition starts
     recognition.onstart = () => {
         isListening = true;
+        connectVoiceSocket(); // Opens while the user speaks, ready for their message
         if (micButton) { 
             micButton.classList.add('bg-red-700', 'animate-pulse'); 
         }
@@ -369,6 +994,12 @@ if (SpeechRecognition) {
             if (micStatus) { 
                 micStatus.textContent = "Microphone permission required.";
             }
+        } else if (event.error === 'network' && serverSpeechAvailable && !(recognition instanceof ServerSpeechRecognition)) {
+            // The browser's recognizer relies on an online service: use the server's from now on
+            useServerRecognition();
+            if (micStatus) { 
+                micStatus.textContent = "Switched to server speech recognition. Press the microphone to speak.";
+            }
         } else if (event.error === 'network') {
             errorMessage = 'Network error. Speech recognition is not working currently.';
             addMessage(errorMessage, 'bot');
@@ -402,10 +1033,8 @@ if (SpeechRecognition) {
             if (isListening) {
                 recognition.stop(); 
             } else {
-                // If bot is speaking, stop it before starting recognition
-                if (synth.speaking) { 
-                    synth.cancel();
-                }
+                // If bot is speaking (or still answering), interrupt it before starting recognition
+                interruptBot();
                 try {
                     recognition.start(); 
                 } catch (e) {
@@ -0,0 +1,9 @@
+// tailwind.config.js
+// Only classes found in the templates and scripts end up in static/css/app.css.
+module.exports = {
+  content: ["./templates/**/*.html", "./static/js/**/*.js"],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
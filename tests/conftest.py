@@ -0,0 +1,39 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Lets the tests import app, models and chatbot however pytest is started
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_DIR = tempfile.mkdtemp(prefix="chatbot-tests-")
+
+
+@pytest.fixture(scope="session")
+def flask_app():
+    """The real app, configured for tests: throwaway SQLite files, no Groq, no background writers."""
+    os.environ.update({
+        "SECRET_KEY": "test-secret",
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(TEST_DIR, 'users.db')}",
+        "SESSION_BACKEND": "memory",
+        "TRANSCRIPTS": "off",
+        "LLM_BACKEND": "stub",
+        "LLM_STUB_URL": "http://127.0.0.1:9", # Nothing listens there: LLM calls fail fast
+        "RESPONSE_CACHE_BACKEND": "memory",
+        "RATE_LIMIT_BACKEND": "memory",
+        "RATE_LIMIT_ANONYMOUS": "10/day",
+        "RATE_LIMIT_ANONYMOUS_IP": "10000/day", # Every test client shares 127.0.0.1
+        "PASSWORD_HASH_ITERATIONS": "1000",
+        "PASSWORD_HASH_WORKERS": "0",
+        "TTS_PREWARM": "0",
+    })
+    from app import app
+    app.config.update(TESTING=True)
+    return app
+
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.test_client()
@@ -0,0 +1,62 @@
+# tests/test_assets.py
+import gzip
+import os
+
+import pytest
+from werkzeug.datastructures import Accept
+
+from chatbot.assets import AssetManifest, build_assets
+
+SCRIPT = "function greet() { return 'hello'; }\n" * 50
+
+
+@pytest.fixture
+def static_folder(tmp_path):
+    folder = tmp_path / "static"
+    (folder / "js").mkdir(parents=True)
+    (folder / "src").mkdir()
+    (folder / "js" / "chat.js").write_text(SCRIPT)
+    (folder / "logo.png").write_bytes(b"\x89PNG" + bytes(100))
+    (folder / "src" / "app.css").write_text("@tailwind base;")
+    (folder / "empty.txt").write_text("")
+    return str(folder)
+
+
+def test_build_fingerprints_and_compresses(static_folder):
+    manifest = build_assets(static_folder)
+    assert sorted(manifest) == ["js/chat.js", "logo.png"] # Sources and empty files are left out
+    script = manifest["js/chat.js"]
+    assert script["path"].startswith("js/chat.") and script["path"].endswith(".js")
+    assert "gzip" in script["encodings"] and manifest["logo.png"]["encodings"] == []
+    hashed = os.path.join(static_folder, "dist", script["path"])
+    with gzip.open(hashed + ".gz", "rt") as compressed:
+        assert compressed.read() == SCRIPT
+    assert build_assets(static_folder)["js/chat.js"]["path"] == script["path"] # Same content, same name
+
+
+def test_manifest_lookup(static_folder):
+    assert AssetManifest(static_folder).lookup("js/chat.js") == "js/chat.js" # Not built yet
+    build_assets(static_folder)
+    assets = AssetManifest(static_folder)
+    hashed = assets.lookup("js/chat.js")
+    assert hashed.startswith("dist/js/chat.") and assets.is_fingerprinted(hashed)
+    assert assets.best_encoding(hashed, Accept([("gzip", 1)])) == ("gzip", ".gz")
+    assert assets.best_encoding(hashed, Accept()) == (None, "")
+
+
+def test_fingerprinted_files_are_immutable_and_precompressed(flask_app, static_folder, monkeypatch):
+    import app as app_module
+    build_assets(static_folder)
+    monkeypatch.setattr(flask_app, "static_folder", static_folder)
+    monkeypatch.setattr(app_module, "asset_manifest", AssetManifest(static_folder))
+    with flask_app.test_request_context():
+        from flask import url_for
+        url = url_for("static", filename="js/chat.js")
+    assert "/dist/js/chat." in url
+    client = flask_app.test_client()
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in response.headers["Cache-Control"] and "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data).decode() == SCRIPT
+    plain = client.get(url)
+    assert "Content-Encoding" not in plain.headers and plain.text == SCRIPT
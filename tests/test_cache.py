@@ -0,0 +1,107 @@
+# tests/test_cache.py
+import pytest
+
+from chatbot import cache
+from chatbot.cache import MemoryCacheBackend, ResponseCache, SQLiteCacheBackend, prompt_key
+from chatbot.llm import LLMBackend
+
+
+class CountingBackend(LLMBackend):
+    name = "counting"
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = 0
+
+    def complete(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        self.calls += 1
+        return self.answer
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache.time, "time", fake.time)
+    return fake
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make(max_entries=3, ttl=60):
+        if request.param == "memory":
+            return MemoryCacheBackend(max_entries=max_entries, ttl=ttl)
+        return SQLiteCacheBackend(str(tmp_path / "cache.db"), max_entries=max_entries, ttl=ttl)
+    return make
+
+
+def test_trivially_different_prompts_share_a_key():
+    assert prompt_key("What is Python?", "m") == prompt_key("  what   is python ", "m")
+    assert prompt_key("What is Python?", "m") != prompt_key("What is Python?", "m:voice")
+    assert prompt_key("What is Python?", "m") != prompt_key("What is Java?", "m")
+
+
+def test_least_recently_used_entry_is_evicted(make_backend, clock):
+    backend = make_backend(max_entries=2)
+    backend.set("a", "1")
+    clock.now += 1
+    backend.set("b", "2")
+    clock.now += 1
+    assert backend.get("a") == "1" # "b" is now the least recently used
+    clock.now += 1
+    backend.set("c", "3")
+    assert backend.get("b") is None
+    assert backend.get("a") == "1" and backend.get("c") == "3"
+    assert len(backend) == 2
+
+
+def test_entries_expire(make_backend, clock):
+    backend = make_backend(ttl=60)
+    backend.set("a", "1")
+    clock.now += 59
+    assert backend.get("a") == "1"
+    clock.now += 2
+    assert backend.get("a") is None
+
+
+def test_response_cache_counts_hits(make_backend, clock):
+    responses = ResponseCache(make_backend())
+    assert responses.get("What is Python?", "m") is None
+    responses.set("What is Python?", "m", "A language.")
+    assert responses.get("what is python", "m") == "A language."
+    assert responses.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "size": 1}
+
+
+def test_repeated_question_is_answered_from_the_cache(flask_app, monkeypatch):
+    import app as app_module
+    backend = CountingBackend("Rust is a systems programming language.")
+    monkeypatch.setattr(app_module, "llm_backend", backend)
+    for _ in range(2):
+        client = flask_app.test_client() # A new conversation: cached answers are context-free
+        response = client.post("/chat", json={"message": "zqx what is rust?"})
+        assert response.json["response"] == "Rust is a systems programming language."
+    assert backend.calls == 1
+
+
+def test_cache_lookups_are_published_as_metrics(flask_app, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "llm_backend", CountingBackend("Go is a compiled language."))
+
+    def lookups():
+        return {key[0]: value for key, value in app_module.RESPONSE_CACHE_LOOKUPS_TOTAL.snapshot()}
+
+    before = lookups()
+    for _ in range(2):
+        flask_app.test_client().post("/chat", json={"message": "zqx what is go?"})
+    after = lookups()
+    assert after["hit"] - before.get("hit", 0) == 1
+    assert after["miss"] - before.get("miss", 0) == 1
+    text = flask_app.test_client().get("/metrics").get_data(as_text=True)
+    assert "# TYPE response_cache_hit_rate gauge" in text
@@ -0,0 +1,66 @@
+# tests/test_conversation.py
+import time
+
+from chatbot.conversation import ConversationStore, estimate_tokens
+from chatbot.llm import LLMBackend
+
+
+class EchoHistoryBackend(LLMBackend):
+    """Answers with the number of messages it was sent, and keeps the last message list."""
+
+    name = "echo-history"
+
+    def complete(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        self.messages = messages
+        return f"You sent {len(messages)} messages."
+
+
+def test_history_is_returned_as_chat_messages():
+    store = ConversationStore()
+    assert store.messages("a") == []
+    store.append("a", "What is Python?", "A language.")
+    assert store.messages("a") == [
+        {"role": "user", "content": "What is Python?"},
+        {"role": "assistant", "content": "A language."},
+    ]
+    assert store.messages("b") == [] and len(store) == 1
+
+
+def test_old_turns_are_folded_into_a_summary():
+    store = ConversationStore(token_budget=30, summary_budget=200)
+    store.append("a", "First question about lists. More detail here.", "Lists hold items.")
+    store.append("a", "x" * 80, "y" * 40)
+    messages = store.messages("a")
+    assert messages[0]["role"] == "system"
+    assert "User asked: First question about lists." in messages[0]["content"]
+    assert "More detail" not in messages[0]["content"] # Only the first sentence is kept
+    assert [m["role"] for m in messages[1:]] == ["user", "assistant"]
+    assert sum(estimate_tokens(m["content"]) for m in messages[1:]) <= 30
+
+
+def test_summary_stays_within_its_budget():
+    store = ConversationStore(token_budget=10, summary_budget=20)
+    for i in range(20):
+        store.append("a", f"Question number {i} is here.", f"Answer number {i}.")
+    summary = store.messages("a")[0]["content"]
+    assert len(summary) <= len("Summary of the earlier conversation: ") + 20 * 4
+    assert "Question number 19" not in summary and "Question number 18" in summary
+
+
+def test_conversations_are_capped_and_expire():
+    store = ConversationStore(max_conversations=2, idle_timeout=0.05)
+    for key in ("a", "b", "c"):
+        store.append(key, "hi", "hello")
+    assert store.messages("a") == [] and len(store) == 2
+    time.sleep(0.06)
+    assert store.messages("b") == [] and len(store) == 0
+
+
+def test_follow_up_question_reaches_the_llm_with_context(client, monkeypatch):
+    import app as app_module
+    backend = EchoHistoryBackend()
+    monkeypatch.setattr(app_module, "llm_backend", backend)
+    client.post("/chat", json={"message": "zqx qwv blorf?"})
+    client.post("/chat", json={"message": "zqx and the flumph?"})
+    contents = [message["content"] for message in backend.messages]
+    assert contents[-3:] == ["zqx qwv blorf?", "You sent 1 messages.", "zqx and the flumph?"]
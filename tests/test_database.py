@@ -0,0 +1,41 @@
+# tests/test_database.py
+from sqlalchemy import create_engine, text
+
+from chatbot.database import engine_options
+
+
+def test_sqlite_file_gets_a_sized_thread_safe_pool(monkeypatch):
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT", "2")
+    options = engine_options("sqlite:///users.db", pool_size=8)
+    assert options["pool_size"] == 8 and options["max_overflow"] == 0
+    assert options["connect_args"] == {"check_same_thread": False, "timeout": 2.0}
+
+
+def test_in_memory_sqlite_keeps_the_default_pool():
+    assert engine_options("sqlite://") == {}
+    assert engine_options("sqlite:///:memory:") == {}
+
+
+def test_postgres_pool_is_pre_pinged_and_recycled(monkeypatch):
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "4")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "600")
+    options = engine_options("postgresql://user:secret@db/chatbot", pool_size=16)
+    assert options["pool_size"] == 16 and options["max_overflow"] == 4
+    assert options["pool_recycle"] == 600 and options["pool_pre_ping"] is True
+
+
+def test_pool_size_defaults_to_the_thread_count(monkeypatch):
+    monkeypatch.delenv("DB_POOL_SIZE", raising=False)
+    monkeypatch.setenv("GUNICORN_THREADS", "12")
+    assert engine_options("postgresql://db/chatbot")["pool_size"] == 12
+
+
+def test_sqlite_connections_use_wal(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT", "3")
+    uri = f"sqlite:///{tmp_path / 'wal.db'}"
+    engine = create_engine(uri, **engine_options(uri, pool_size=2))
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1 # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 3000
+    engine.dispose()
@@ -0,0 +1,49 @@
+# tests/test_intents.py
+import json
+import os
+
+from chatbot.intents import IntentIndex
+
+INTENTS = {"intents": [{"tag": "greeting", "patterns": ["hello"], "responses": ["Hi!"]}]}
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as intents_file:
+        json.dump(data, intents_file)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000)) # Make sure the signature changes
+
+
+def test_matches_patterns(tmp_path):
+    path = tmp_path / "intents.json"
+    write_json(path, INTENTS)
+    index = IntentIndex(str(path))
+    assert index.match("Hello there")["tag"] == "greeting"
+    assert index.match("something else") is None
+
+
+def test_non_object_root_keeps_previous_index(tmp_path):
+    path = tmp_path / "intents.json"
+    write_json(path, INTENTS)
+    index = IntentIndex(str(path))
+    assert index.reload(force=True) is True
+    write_json(path, [{"tag": "greeting"}])
+    assert index.reload(force=True) is False
+    assert index.match("hello")["tag"] == "greeting"
+
+
+def test_invalid_json_keeps_previous_index(tmp_path):
+    path = tmp_path / "intents.json"
+    write_json(path, INTENTS)
+    index = IntentIndex(str(path))
+    index.reload(force=True)
+    path.write_text("{not json")
+    assert index.reload(force=True) is False
+    assert index.match("hello")["tag"] == "greeting"
+
+
+def test_non_object_intents_are_skipped(tmp_path):
+    path = tmp_path / "intents.json"
+    write_json(path, {"intents": ["bogus", *INTENTS["intents"]]})
+    index = IntentIndex(str(path))
+    assert index.match("hello")["tag"] == "greeting"
+    assert len(index.intents["intents"]) == 1
@@ -0,0 +1,132 @@
+# tests/test_llm.py
+import asyncio
+import threading
+import time
+
+import groq
+import pytest
+
+from chatbot.llm import CancelToken, GroqBackend, StreamCancelled, create_llm_backend
+from chatbot.stub_server import StubSettings, make_server
+
+MESSAGES = [{"role": "user", "content": "What is Python?"}]
+
+
+@pytest.fixture(scope="module")
+def stub():
+    settings = StubSettings(latency=0.0, token_rate=0, tokens=12, jitter=0.0)
+    server = make_server("127.0.0.1", 0, settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, settings
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="module")
+def backend(stub):
+    server, _ = stub
+    llm = GroqBackend("stub-key", base_url=f"http://127.0.0.1:{server.server_port}", timeout=10)
+    llm.start()
+    return llm
+
+
+def test_completion_from_stub(backend):
+    answer = backend.complete(MESSAGES, "stub-model")
+    assert answer.startswith("You asked: What is Python?.")
+    assert len(answer.split()) == 5 + 11 # The echoed question is one of the 12 stub "tokens"
+
+
+def test_stream_from_stub(backend):
+    deltas = list(backend.stream(MESSAGES, "stub-model"))
+    assert len(deltas) == 12
+    assert "".join(deltas) == backend.complete(MESSAGES, "stub-model")
+
+
+def test_max_tokens_bounds_the_answer(backend):
+    assert len(list(backend.stream(MESSAGES, "stub-model", max_tokens=3))) == 3
+
+
+def test_cancelled_stream_stops(stub, backend):
+    _, settings = stub
+    settings.latency = 2.0
+    cancel = CancelToken()
+    threading.Timer(0.1, cancel.cancel).start()
+    try:
+        with pytest.raises(StreamCancelled):
+            list(backend.stream(MESSAGES, "stub-model", cancel=cancel))
+    finally:
+        settings.latency = 0.0
+
+
+def test_cancelled_completion_cancels_the_upstream_request(stub, backend):
+    _, settings = stub
+    settings.latency = 2.0
+    cancel = CancelToken()
+    threading.Timer(0.1, cancel.cancel).start()
+    started = time.monotonic()
+    try:
+        with pytest.raises(StreamCancelled):
+            backend.complete(MESSAGES, "stub-model", cancel=cancel)
+    finally:
+        settings.latency = 0.0
+    assert time.monotonic() - started < 1.0
+
+    async def other_tasks():
+        await asyncio.sleep(0.05) # Lets the cancelled task unwind
+        return len(asyncio.all_tasks()) - 1
+
+    # The cancelled request no longer has a task on the shared loop
+    loop = backend.runner._loop
+    assert asyncio.run_coroutine_threadsafe(other_tasks(), loop).result(timeout=5) == 0
+
+
+def test_concurrent_calls_share_one_event_loop(stub, backend):
+    _, settings = stub
+    settings.latency = 0.3
+    loop = backend.runner._loop
+    loop_threads = [t.name for t in threading.enumerate()].count("groq-event-loop")
+    results = []
+
+    def complete():
+        results.append(backend.complete(MESSAGES, "stub-model"))
+
+    def stream():
+        results.append("".join(backend.stream(MESSAGES, "stub-model")))
+
+    threads = [threading.Thread(target=complete if i % 2 else stream) for i in range(8)]
+    started = time.monotonic()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        settings.latency = 0.0
+    elapsed = time.monotonic() - started
+
+    assert len(results) == 8 and all(answer.startswith("You asked:") for answer in results)
+    assert elapsed < 8 * 0.3 / 2 # The requests overlapped on the loop instead of queueing
+    assert backend.runner._loop is loop
+    assert [t.name for t in threading.enumerate()].count("groq-event-loop") == loop_threads
+
+
+def test_injected_errors_are_raised(stub, backend):
+    _, settings = stub
+    settings.error_rate = 1.0
+    try:
+        with pytest.raises(groq.APIStatusError) as error:
+            backend.complete(MESSAGES, "stub-model")
+    finally:
+        settings.error_rate = 0.0
+    assert error.value.status_code in (429, 500)
+
+
+def test_backend_selection(monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "groq")
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    assert create_llm_backend() is None
+    monkeypatch.setenv("LLM_BACKEND", "stub")
+    assert create_llm_backend().name == "groq"
+    monkeypatch.setenv("LLM_BACKEND", "openai")
+    with pytest.raises(ValueError):
+        create_llm_backend()
@@ -0,0 +1,81 @@
+# tests/test_metrics.py
+import json
+import os
+
+from chatbot.metrics import DEAD_WORKERS_FILE, MetricsRegistry, retire_worker_metrics
+
+
+def make_registry(directory=None):
+    registry = MetricsRegistry(multiprocess_dir=directory)
+    requests = registry.counter("requests_total", "Requests.", ["source"])
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    workers_up = registry.gauge("workers_up", "Workers up.")
+    return registry, requests, latency, workers_up
+
+
+def write_worker_file(directory, pid, registry):
+    with open(os.path.join(directory, f"metrics_{pid}.json"), "w") as metrics_file:
+        json.dump({"kinds": registry.kinds(), "values": registry.snapshot()}, metrics_file)
+
+
+def test_render_counters_histograms_and_gauges():
+    registry, requests, latency, workers_up = make_registry()
+    requests.inc(source="intent")
+    requests.inc(2, source="llm")
+    latency.observe(0.5)
+    workers_up.set(1)
+    text = registry.render()
+    assert 'requests_total{source="intent"} 1' in text
+    assert 'requests_total{source="llm"} 2' in text
+    assert 'latency_seconds_bucket{le="0.1"} 0' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert "latency_seconds_count 1" in text
+    assert "# TYPE workers_up gauge" in text and "workers_up 1" in text
+
+
+def test_render_adds_up_other_workers(tmp_path):
+    registry, requests, _, workers_up = make_registry(str(tmp_path))
+    other, other_requests, _, other_up = make_registry()
+    requests.inc(source="llm")
+    workers_up.set(1)
+    other_requests.inc(3, source="llm")
+    other_up.set(1)
+    write_worker_file(str(tmp_path), 99999991, other)
+    text = registry.render()
+    assert 'requests_total{source="llm"} 4' in text
+    assert "workers_up 2" in text
+
+
+def test_ratio_is_computed_from_the_summed_counter(tmp_path):
+    registry, requests, _, _ = make_registry(str(tmp_path))
+    registry.ratio("intent_ratio", "Share of intent answers.", requests, source="intent")
+    assert "intent_ratio 0.0" in registry.render()
+    other, other_requests, _, _ = make_registry()
+    requests.inc(source="intent")
+    other_requests.inc(3, source="llm")
+    write_worker_file(str(tmp_path), 99999991, other)
+    assert "# TYPE intent_ratio gauge" in registry.render()
+    assert "intent_ratio 0.25" in registry.render()
+
+
+def test_retired_worker_keeps_counters_and_drops_gauges(tmp_path):
+    registry, _, _, workers_up = make_registry(str(tmp_path))
+    workers_up.set(1)
+    for pid, count in ((99999991, 3), (99999992, 4)):
+        dead, dead_requests, dead_latency, dead_up = make_registry()
+        dead_requests.inc(count, source="llm")
+        dead_latency.observe(0.05)
+        dead_up.set(1)
+        write_worker_file(str(tmp_path), pid, dead)
+        assert retire_worker_metrics(str(tmp_path), pid) is True
+        assert not os.path.exists(tmp_path / f"metrics_{pid}.json")
+
+    assert os.path.exists(tmp_path / DEAD_WORKERS_FILE)
+    text = registry.render()
+    assert 'requests_total{source="llm"} 7' in text
+    assert "latency_seconds_count 2" in text
+    assert "workers_up 1" in text # Only the live worker
+
+
+def test_retire_unknown_worker_is_a_no_op(tmp_path):
+    assert retire_worker_metrics(str(tmp_path), 99999993) is False
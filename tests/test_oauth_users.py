@@ -0,0 +1,63 @@
+# tests/test_oauth_users.py
+import pytest
+
+from auth import oauth_users
+from auth.oauth_users import UsernameUnavailable, allocate_username, create_oauth_user
+from models import User, db
+
+
+@pytest.fixture
+def app_context(flask_app):
+    with flask_app.app_context():
+        yield
+
+
+def add_users(*usernames):
+    for username in usernames:
+        db.session.add(User(username=username, email=f"{username}@example.com"))
+    db.session.commit()
+
+
+def test_free_base_name_is_used(app_context):
+    assert allocate_username("fresh_name") == "fresh_name"
+
+
+def test_next_numeric_suffix(app_context):
+    add_users("carol", "carol1", "carol7", "caroline")
+    assert allocate_username("carol") == "carol8"
+
+
+def test_wildcard_characters_in_the_base_are_literal(app_context):
+    add_users("x_y", "xzy1", "xzy5")
+    assert allocate_username("x_y") == "x_y1" # "xzy5" must not count as a taken "x_y" name
+    add_users("p%q")
+    assert allocate_username("p%q") == "p%q1"
+
+
+def test_allocation_searches_the_username_index(app_context, monkeypatch):
+    statements = []
+    real_scalars = db.session.scalars
+    monkeypatch.setattr(db.session, "scalars", lambda statement: statements.append(statement) or real_scalars(statement))
+    allocate_username("erin")
+    sql = str(statements[0].compile(db.engine, compile_kwargs={"literal_binds": True}))
+    plan = " ".join(row[-1] for row in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")))
+    assert "SEARCH" in plan and "INDEX" in plan # A range seek, not a full scan
+
+
+def test_other_case_does_not_count(app_context):
+    add_users("Dave", "Dave3")
+    assert allocate_username("dave") == "dave"
+
+
+def test_create_retries_then_reports_exhaustion(app_context, monkeypatch):
+    add_users("erin")
+    monkeypatch.setattr(oauth_users, "allocate_username", lambda base: "erin") # Always collides
+    with pytest.raises(UsernameUnavailable):
+        create_oauth_user("erin", email="erin-oauth@example.com", google_id="g-erin")
+    assert db.session.scalar(db.select(User.id).where(User.email == "erin-oauth@example.com")) is None
+
+
+def test_create_oauth_user(app_context):
+    add_users("frank")
+    user = create_oauth_user("frank", email="frank-oauth@example.com", google_id="g-frank")
+    assert user.username == "frank1" and user.password_hash is None
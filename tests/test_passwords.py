@@ -0,0 +1,40 @@
+# tests/test_passwords.py
+import time
+
+import pytest
+
+from chatbot.passwords import HashingBusy, HashingTimeout, PasswordHasher
+
+
+def test_hash_and_verify_in_request_thread():
+    hasher = PasswordHasher(iterations=1000, workers=0)
+    password_hash = hasher.hash("secret")
+    assert hasher.verify(password_hash, "secret")
+    assert not hasher.verify(password_hash, "wrong")
+    assert not hasher.needs_rehash(password_hash)
+    hasher.configure(iterations=2000)
+    assert hasher.needs_rehash(password_hash)
+
+
+def test_hash_in_pool():
+    hasher = PasswordHasher(iterations=1000, workers=1)
+    assert hasher.verify(hasher.hash("secret"), "secret")
+
+
+def test_timeout_is_reported_and_keeps_the_slot_until_done():
+    hasher = PasswordHasher(iterations=1000, workers=1, max_pending=1, timeout=10)
+    hasher.hash("warm up") # Starts the pool process
+    hasher.configure(iterations=3000000, timeout=0.01)
+    with pytest.raises(HashingTimeout):
+        hasher.hash("slow")
+    with pytest.raises(HashingBusy): # The slow hash is still running in the pool
+        hasher.verify("pbkdf2:sha256:1000$salt$hash", "x")
+    hasher.configure(timeout=30)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            hasher.verify("pbkdf2:sha256:1000$salt$hash", "x")
+            break
+        except HashingBusy:
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
@@ -0,0 +1,43 @@
+# tests/test_precache.py
+import json
+
+from chatbot.precache import PrecomputedPayload, ResponsePrecache
+
+
+class FakeIntentIndex:
+    def __init__(self, intents):
+        self.intents = intents
+
+
+def intents(*responses):
+    return {"intents": [{"tag": "greeting", "patterns": ["hi"], "responses": list(responses)}]}
+
+
+def test_payload_is_serialized_once_with_a_stable_etag():
+    payload = PrecomputedPayload({"response": "Hi!"})
+    assert json.loads(payload.body) == {"response": "Hi!"}
+    assert payload.etag == PrecomputedPayload({"response": "Hi!"}).etag
+    assert payload.etag != PrecomputedPayload({"response": "Hello!"}).etag
+
+
+def test_personalized_answers_are_not_precomputed():
+    precache = ResponsePrecache("Welcome!", FakeIntentIndex(intents("Hi!", "Hi [name]!")))
+    assert precache.chat_payload("Hi!").data == {"response": "Hi!"}
+    assert precache.chat_payload("Hi [name]!") is None
+    assert precache.chat_payload("Something the LLM said") is None
+
+
+def test_payloads_follow_reloaded_intents():
+    index = FakeIntentIndex(intents("Hi!"))
+    precache = ResponsePrecache("Welcome!", index)
+    index.intents = intents("Hello!") # What IntentIndex.reload() does
+    assert precache.chat_payload("Hi!") is None
+    assert precache.chat_payload("Hello!") is not None
+
+
+def test_start_revalidates_with_etag(client):
+    response = client.get("/start")
+    assert response.status_code == 200 and response.get_etag()[0]
+    assert "max-age" in response.headers["Cache-Control"]
+    again = client.get("/start", headers={"If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
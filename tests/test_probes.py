@@ -0,0 +1,59 @@
+# tests/test_probes.py
+import os
+from types import SimpleNamespace
+
+from sqlalchemy.exc import OperationalError
+
+
+def test_healthz(client):
+    response = client.get("/healthz")
+    assert response.status_code == 200 and response.json == {"status": "ok"}
+
+
+def test_readyz_when_ready(client):
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json["checks"]["database"] == "ok" and response.json["checks"]["intents"] == "ok"
+    assert "no-store" in response.headers["Cache-Control"]
+
+
+def test_readyz_without_intents(client, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "intent_index", SimpleNamespace(intents={})) # e.g. intents.json failed to load
+    response = client.get("/readyz")
+    assert response.status_code == 503 and response.json["checks"]["intents"] == "missing"
+
+
+def test_readyz_without_database(client, monkeypatch):
+    import app as app_module
+
+    def unavailable(*args, **kwargs):
+        raise OperationalError("SELECT 1", {}, Exception("unable to open database file"))
+    monkeypatch.setattr(app_module.db.session, "execute", unavailable)
+    response = client.get("/readyz")
+    assert response.status_code == 503 and response.json["checks"]["database"] == "unavailable"
+
+
+def test_worker_starts_once_per_process(flask_app, monkeypatch):
+    import app as app_module
+    started = []
+    monkeypatch.setattr(app_module.metrics, "start", lambda: started.append(os.getpid()))
+    monkeypatch.setattr(app_module, "_worker_pid", None) # As in a freshly forked worker
+    app_module.init_worker()
+    app_module.init_worker()
+    assert started == [os.getpid()]
+
+
+def test_sqlite_backends_keep_no_connection_from_startup(tmp_path):
+    from chatbot.cache import SQLiteCacheBackend
+    from chatbot.ratelimit import SQLiteRateLimitBackend
+    from chatbot.sessions import SQLiteSessionBackend
+    backends = [
+        SQLiteSessionBackend(str(tmp_path / "sessions.db")),
+        SQLiteRateLimitBackend(str(tmp_path / "rate_limits.db")),
+        SQLiteCacheBackend(str(tmp_path / "cache.db")),
+    ]
+    for backend in backends:
+        assert backend._local.conn is None # Nothing for a forked worker to inherit
+    backends[2].set("key", "value")
+    assert backends[2].get("key") == "value" # Reconnects on first use
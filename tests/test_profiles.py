@@ -0,0 +1,94 @@
+# tests/test_profiles.py
+import json
+
+import pytest
+
+from chatbot.llm import LLMBackend
+from chatbot.profiles import DEFAULT_VOICE_FALLBACK, SpeakableFilter, create_response_profiles, speakable, trim_to_sentence
+from chatbot.voice import VoiceSession
+
+
+@pytest.mark.parametrize("markdown, spoken", [
+    ("Plain text.", "Plain text."),
+    ("**Bold** and *italic* and ***both***.", "Bold and italic and both."),
+    ("5*3 is 15, and 2 * 4 is 8.", "5 times 3 is 15, and 2 times 4 is 8."),
+    ("Use a*b for the product.", "Use a*b for the product."),
+    ("A *stray star", "A stray star"),
+    ("# Title\nSome text", "Title. Some text"),
+    ("- one\n- two", "one. two"),
+    ("1. first\n2) second", "first. second"),
+    ("See [the docs](https://example.com) or https://example.com/x now.", "See the docs or the link now."),
+    ("Run `pip install` first.", "Run pip install first."),
+    ("Before.\n```python\nprint(1)\n```\nAfter.", "Before. After."),
+    ("| a | b |\n|---|---|\n| 1 | 2 |", "a, b. 1, 2"),
+    ("snake_case stays", "snake_case stays"),
+    ("```\nonly code\n```", ""),
+])
+def test_speakable(markdown, spoken):
+    assert speakable(markdown) == spoken
+
+
+def test_code_block_spanning_pieces():
+    speech = SpeakableFilter()
+    assert speech.feed("Here:\n```") == "Here:"
+    assert speech.feed("x = 1") == ""
+    assert speech.feed("```\nDone.") == "Done."
+
+
+@pytest.mark.parametrize("text, keep_first, trimmed", [
+    ("One. Two.", True, "One. Two."),
+    ("One. Two and thr", True, "One."),
+    ("Is it? Yes! And then", True, "Is it? Yes!"),
+    ('He said "stop." Then he', True, 'He said "stop."'),
+    ("No sentence end", True, "No sentence end"),
+    ("No sentence end", False, ""),
+    ("Use a list, e.g. this one. And a cut", True, "Use a list, e.g. this one."),
+    ("Fruit, i.e. apples and pears", True, "Fruit, i.e. apples and pears"),
+    ("Fruit, i.e. apples and pears", False, ""),
+    ("Ask Dr. Smith. Or Mr. Jones and", True, "Ask Dr. Smith."),
+    ("Version 2.5 is out", True, "Version 2.5 is out"),
+    ("  ", True, ""),
+])
+def test_trim_to_sentence(text, keep_first, trimmed):
+    assert trim_to_sentence(text, keep_first=keep_first) == trimmed
+
+
+def test_voice_profile_falls_back_when_nothing_is_speakable():
+    profiles = create_response_profiles()
+    assert profiles["voice"].finish("```python\nprint(1)\n```") == DEFAULT_VOICE_FALLBACK
+    assert profiles["voice"].finish("**Yes.** It works.") == "Yes. It works."
+    assert profiles["text"].finish("```python\nprint(1)\n```") == "```python\nprint(1)\n```"
+
+
+class CodeOnlyBackend(LLMBackend):
+    name = "code-only"
+
+    def stream(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        yield from ["```python\n", "print('hi')\n", "```"]
+
+
+def test_streamed_voice_answer_of_only_code_says_the_fallback(flask_app, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "llm_backend", CodeOnlyBackend())
+    sentences = list(app_module.stream_user_input(
+        "zqx print a qwv in python", "session:profiles", profile=app_module.response_profiles["voice"]
+    ))
+    assert sentences == [DEFAULT_VOICE_FALLBACK]
+    assert app_module.conversations.messages("session:profiles")[-1]["content"] == DEFAULT_VOICE_FALLBACK
+
+
+@pytest.mark.parametrize("mode", ["shout", ["voice"], {"a": 1}, 3])
+def test_unknown_mode_is_refused(client, mode):
+    response = client.post("/chat", json={"message": "hello", "mode": mode})
+    assert response.status_code == 400
+    assert client.post("/chat/stream", json={"message": "hello", "mode": mode}).status_code == 400
+
+
+@pytest.mark.parametrize("mode", ["shout", ["voice"]])
+def test_voice_session_refuses_unknown_mode(mode):
+    sent = []
+    session = VoiceSession(sent.append, lambda text, cancel, mode: iter(["Hi."]), modes=["text", "voice"])
+    session.handle(json.dumps({"type": "message", "id": 7, "text": "hello", "mode": mode}))
+    assert [json.loads(frame) for frame in sent] == [
+        {"type": "error", "id": 7, "response": "Unknown 'mode': use 'text' or 'voice'."}
+    ]
@@ -0,0 +1,103 @@
+# tests/test_ratelimit.py
+import os
+import sqlite3
+
+import pytest
+
+from chatbot import ratelimit
+from chatbot.ratelimit import Limit, MemoryRateLimitBackend, RateLimiter, SQLiteRateLimitBackend, create_rate_limiter
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "time", fake.time)
+    return fake
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryRateLimitBackend()
+    return SQLiteRateLimitBackend(str(tmp_path / "rate_limits.db"))
+
+
+def test_parse():
+    limit = Limit.parse("10/day")
+    assert (limit.capacity, limit.period) == (10, 86400)
+    assert Limit.parse("30/minutes").period == 60
+    assert Limit.parse("off") is None and Limit.parse("") is None
+    with pytest.raises(ValueError):
+        Limit.parse("5/fortnight")
+
+
+def test_bucket_empties_and_refills(backend, clock):
+    limiter = RateLimiter(backend, {"anonymous": {"session": Limit(3, 60)}})
+    for _ in range(3):
+        assert limiter.hit("anonymous", {"session": "s1"}) == (True, 0)
+    assert limiter.hit("anonymous", {"session": "s1"}) == (False, 20) # One token every 20 seconds
+    assert limiter.hit("anonymous", {"session": "s2"})[0] # Other sessions have their own bucket
+    clock.now += 20
+    assert limiter.hit("anonymous", {"session": "s1"})[0]
+    assert not limiter.hit("anonymous", {"session": "s1"})[0]
+
+
+def test_all_buckets_or_none(backend, clock):
+    limiter = RateLimiter(backend, {"anonymous": {"session": Limit(2, 60), "ip": Limit(2, 60)}})
+    assert limiter.hit("anonymous", {"session": "a", "ip": "1.1.1.1"})[0]
+    assert limiter.hit("anonymous", {"session": "b", "ip": "1.1.1.1"})[0]
+    assert not limiter.hit("anonymous", {"session": "c", "ip": "1.1.1.1"})[0] # The shared IP bucket is empty
+    # The rejected request took no token from session "c": both are still there
+    assert limiter.hit("anonymous", {"session": "c", "ip": "2.2.2.2"})[0]
+    assert limiter.hit("anonymous", {"session": "c", "ip": "3.3.3.3"})[0]
+    assert not limiter.hit("anonymous", {"session": "c", "ip": "4.4.4.4"})[0]
+
+
+def test_unlimited_tiers_and_missing_identities_pass(backend):
+    limiter = RateLimiter(backend, {"registered": {"user": None}, "anonymous": {"session": Limit(1, 60)}})
+    for _ in range(5):
+        assert limiter.hit("registered", {"user": 1}) == (True, 0)
+        assert limiter.hit("anonymous", {"session": None}) == (True, 0)
+
+
+def test_backend_failure_lets_requests_through():
+    class BrokenBackend:
+        def acquire(self, buckets, cost=1):
+            raise sqlite3.OperationalError("database is locked")
+
+    limiter = RateLimiter(BrokenBackend(), {"anonymous": {"session": Limit(1, 60)}})
+    assert limiter.hit("anonymous", {"session": "s"}) == (True, 0)
+
+
+def test_sqlite_buckets_are_shared_between_connections(tmp_path, clock):
+    path = str(tmp_path / "rate_limits.db")
+    first = RateLimiter(SQLiteRateLimitBackend(path), {"registered": {"user": Limit(2, 60)}})
+    second = RateLimiter(SQLiteRateLimitBackend(path), {"registered": {"user": Limit(2, 60)}})
+    assert first.hit("registered", {"user": 7})[0]
+    assert second.hit("registered", {"user": 7})[0]
+    assert not first.hit("registered", {"user": 7})[0]
+
+
+def test_sqlite_buckets_default_to_the_instance_folder(tmp_path, monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_BACKEND", "sqlite")
+    monkeypatch.delenv("RATE_LIMIT_PATH", raising=False)
+    limiter = create_rate_limiter(str(tmp_path / "instance"))
+    assert limiter.backend.path == os.path.join(str(tmp_path / "instance"), "rate_limits.db")
+    assert os.path.isfile(limiter.backend.path)
+
+
+def test_chat_rejects_anonymous_session_after_its_limit(client):
+    for _ in range(10):
+        assert client.post("/chat", json={"message": "hello"}).status_code == 200
+    response = client.post("/chat", json={"message": "hello"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert response.get_json()["limit_reached"] is True
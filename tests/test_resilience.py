@@ -0,0 +1,240 @@
+# tests/test_resilience.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from chatbot.llm import AsyncGroqRunner, CancelToken, LLMBackend, StreamCancelled
+from chatbot.resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded, ResilientBackend
+
+
+class FakeBackend(LLMBackend):
+    """
+    Answers each call after the delay scripted for it (the last delay repeats), or raises `error`.
+    Honours cancellation like the real backends and records which calls were cancelled.
+    """
+
+    name = "fake"
+
+    def __init__(self, delays=(0.0,), error=None, deltas=("Hello", " world.")):
+        self.delays = list(delays)
+        self.error = error
+        self.deltas = deltas
+        self.calls = 0
+        self.cancelled = []
+
+    def _wait(self, cancel):
+        call = self.calls
+        self.calls += 1
+        delay = self.delays[min(call, len(self.delays) - 1)]
+        if cancel is not None and cancel._event.wait(delay):
+            self.cancelled.append(call)
+            raise StreamCancelled("cancelled")
+        if cancel is None:
+            time.sleep(delay)
+        if self.error is not None:
+            raise self.error
+        return call
+
+    def complete(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        return f"answer {self._wait(cancel)}"
+
+    def stream(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        self._wait(cancel)
+        yield from self.deltas
+
+
+class FakeLoopBackend(FakeBackend):
+    """FakeBackend whose completions are tasks on an event loop, as GroqBackend's are."""
+
+    def __init__(self, runner, **options):
+        super().__init__(**options)
+        self.runner = runner
+
+    async def complete_async(self, messages, model, max_tokens=None, stop=None):
+        call = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delays[min(call, len(self.delays) - 1)])
+        except asyncio.CancelledError:
+            self.cancelled.append(call)
+            raise
+        if self.error is not None:
+            raise self.error
+        return f"answer {call}"
+
+
+@pytest.fixture(scope="module")
+def runner():
+    runner = AsyncGroqRunner("test-key") # Only its loop is used: nothing is sent upstream
+    runner.start()
+    return runner
+
+
+@pytest.fixture(params=["threads", "loop"])
+def make_backend(request, runner):
+    """Builds fake backends run by the ResilientBackend in threads, or on the runner's loop."""
+    if request.param == "threads":
+        return FakeBackend
+    return lambda **options: FakeLoopBackend(runner, **options)
+
+
+def resilient(backend, failure_threshold=2, reset_timeout=60.0, **options):
+    transitions = []
+    breaker = CircuitBreaker(failure_threshold, reset_timeout, on_change=lambda old, new: transitions.append(new))
+    return ResilientBackend(backend, breaker, **options), transitions
+
+
+def test_breaker_opens_then_lets_one_trial_through():
+    changes = []
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05, on_change=lambda old, new: changes.append(new))
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() # The trial call
+    assert breaker.state == CircuitBreaker.HALF_OPEN and not breaker.allow()
+    breaker.record_failure() # Trial failed: open again
+    assert breaker.state == CircuitBreaker.OPEN and breaker.trips == 2
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    assert changes == ["open", "half_open", "open", "half_open", "closed"]
+
+
+def test_cancelled_trial_frees_the_half_open_slot():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.allow() and not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_open_circuit_fails_fast_without_calling_upstream(make_backend):
+    backend = make_backend(error=RuntimeError("upstream down"))
+    llm, transitions = resilient(backend)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            llm.complete([], "model")
+    with pytest.raises(CircuitOpen):
+        llm.complete([], "model")
+    with pytest.raises(CircuitOpen):
+        list(llm.stream([], "model"))
+    assert backend.calls == 2 and transitions == ["open"]
+
+
+def test_completion_deadline_cancels_the_call(make_backend):
+    backend = make_backend(delays=[5.0])
+    llm, _ = resilient(backend, deadline=0.1)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        llm.complete([], "model")
+    assert time.monotonic() - start < 1
+    deadline = time.monotonic() + 2
+    while not backend.cancelled and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert backend.cancelled == [0] and llm.breaker.failures == 1
+
+
+def test_hedge_wins_and_cancels_the_slow_attempt(make_backend):
+    backend = make_backend(delays=[5.0, 0.0])
+    hedges = []
+    llm, _ = resilient(backend, deadline=2.0, hedge_quantile=0.5, hedge_min_delay=0.05, on_hedge=hedges.append)
+    for _ in range(llm.latency.min_samples):
+        llm.latency.observe(0.01)
+    assert llm.complete([], "model") == "answer 1"
+    assert hedges == ["fired", "won"]
+    deadline = time.monotonic() + 2
+    while not backend.cancelled and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert backend.cancelled == [0]
+    assert llm.breaker.failures == 0
+
+
+def test_no_hedge_until_enough_latency_samples(make_backend):
+    backend = make_backend(delays=[0.2])
+    hedges = []
+    llm, _ = resilient(backend, hedge_quantile=0.5, hedge_min_delay=0.01, on_hedge=hedges.append)
+    assert llm.complete([], "model") == "answer 0"
+    assert hedges == [] and backend.calls == 1
+
+
+def test_cancelled_completion_is_not_a_failure(make_backend):
+    backend = make_backend(delays=[5.0])
+    llm, _ = resilient(backend)
+    cancel = CancelToken()
+    threading.Timer(0.05, cancel.cancel).start()
+    with pytest.raises(StreamCancelled):
+        llm.complete([], "model", cancel=cancel)
+    deadline = time.monotonic() + 2
+    while not backend.cancelled and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert backend.cancelled == [0] and llm.breaker.failures == 0
+
+
+def test_loop_backends_are_hedged_without_threads(runner):
+    backend = FakeLoopBackend(runner, delays=[5.0, 0.0])
+    hedges = []
+    llm, _ = resilient(backend, deadline=2.0, hedge_quantile=0.5, hedge_min_delay=0.05,
+                       on_hedge=lambda outcome: hedges.append((outcome, threading.current_thread().name)))
+    for _ in range(llm.latency.min_samples):
+        llm.latency.observe(0.01)
+    threads = threading.active_count()
+    assert llm.complete([], "model") == "answer 1"
+    assert hedges == [("fired", "groq-event-loop"), ("won", "groq-event-loop")]
+    assert threading.active_count() == threads
+
+
+def test_stream_first_token_deadline(make_backend):
+    backend = make_backend(delays=[5.0])
+    llm, _ = resilient(backend, first_token_deadline=0.1)
+    with pytest.raises(DeadlineExceeded):
+        list(llm.stream([], "model"))
+    assert backend.cancelled == [0] and llm.breaker.failures == 1
+
+
+def test_cancelled_stream_is_not_a_failure(make_backend):
+    backend = make_backend(delays=[5.0])
+    llm, _ = resilient(backend)
+    cancel = CancelToken()
+    threading.Timer(0.05, cancel.cancel).start()
+    with pytest.raises(StreamCancelled):
+        list(llm.stream([], "model", cancel=cancel))
+    assert llm.breaker.failures == 0
+
+
+def test_streamed_answer_records_success(make_backend):
+    llm, _ = resilient(make_backend())
+    llm.breaker.record_failure()
+    assert "".join(llm.stream([], "model")) == "Hello world."
+    assert llm.breaker.failures == 0
+
+
+def test_shared_stream_degrades_when_the_circuit_is_open(flask_app, monkeypatch):
+    import app as app_module
+    from chatbot import prompt_key
+    llm, _ = resilient(FakeBackend(error=RuntimeError("upstream down")), failure_threshold=1)
+    llm.breaker.record_failure()
+    monkeypatch.setattr(app_module, "llm_backend", llm)
+    question = "zqx resilience question for the open circuit"
+
+    # Leader: the breaker is open, so it answers with the degraded message
+    assert list(app_module.stream_user_input(question, "session:leader")) == [app_module.DEGRADED_MESSAGE]
+
+    # Follower of a leader whose call failed fast
+    profile = app_module.response_profile(None)
+    flight_key = prompt_key(question, profile.cache_model(app_module.GROQ_MODEL))
+    flight, is_leader = app_module.inflight_requests.begin(flight_key)
+    assert is_leader
+    answers = []
+    follower = threading.Thread(target=lambda: answers.extend(app_module.stream_user_input(question, "session:follower")))
+    follower.start()
+    deadline = time.monotonic() + 2
+    while flight.waiters == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    app_module.inflight_requests.finish(flight_key, flight, error=CircuitOpen("open"))
+    follower.join(2)
+    assert answers == [app_module.DEGRADED_MESSAGE]
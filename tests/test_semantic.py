@@ -0,0 +1,55 @@
+# tests/test_semantic.py
+import json
+import os
+
+import pytest
+
+from chatbot.semantic import SemanticIntentClassifier
+
+with open(os.path.join(os.path.dirname(__file__), "..", "data", "intents.json"), encoding="utf-8") as intents_file:
+    INTENTS = json.load(intents_file)["intents"]
+TAGS = [intent["tag"] for intent in INTENTS]
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return SemanticIntentClassifier(INTENTS)
+
+
+@pytest.mark.parametrize("text, tag", [
+    ("any tips for coding", "coding_tips"),
+    ("best practices for coding", "coding_tips"),
+    ("advice for a junior developer", "junior_developer"),
+    ("what is artificial intelligence", "ai"),
+    ("explain web development", "development"),
+    ("most popular programming languages", "programming_languages"),
+    ("who made this bot", "creator"),
+    ("what can you do for me", "capabilities"),
+    ("how is it going", "how_are_you"),
+])
+def test_paraphrases_match_their_intent(classifier, text, tag):
+    index = classifier.classify(text)
+    assert index is not None and TAGS[index] == tag
+
+
+@pytest.mark.parametrize("text", [
+    "tips for gardeners",
+    "explain software licensing",
+    "how can you help me fix this segfault in my C code",
+    "thanks but how do i center a div",
+    "explain quantum computing",
+    "how do i sort a list in python",
+    "what is rust",
+])
+def test_off_topic_questions_reach_the_llm(classifier, text):
+    assert classifier.classify(text) is None
+
+
+def test_unknown_words_lower_the_similarity(classifier):
+    _, short = classifier.score("coding tips")
+    _, padded = classifier.score("coding tips for gardeners and beekeepers")
+    assert padded < short
+
+
+def test_no_shared_ngrams_scores_zero(classifier):
+    assert classifier.score("zzzz qqqq") == (None, 0.0)
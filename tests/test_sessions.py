@@ -0,0 +1,136 @@
+# tests/test_sessions.py
+import os
+from datetime import timedelta
+
+import pytest
+from flask import Flask, session
+
+from chatbot import sessions
+from chatbot.sessions import MemorySessionBackend, ServerSessionInterface, create_session_interface
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(sessions.time, "time", fake.time)
+    return fake
+
+
+@pytest.fixture
+def backend():
+    return MemorySessionBackend()
+
+
+@pytest.fixture
+def client(backend):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.permanent_session_lifetime = timedelta(seconds=1000)
+    app.session_interface = ServerSessionInterface(backend, refresh_interval=100)
+
+    @app.route("/set/<value>")
+    def set_value(value):
+        session.permanent = True
+        session["value"] = value
+        return "ok"
+
+    @app.route("/get")
+    def get_value():
+        return session.get("value", "")
+
+    @app.route("/rotate")
+    def rotate():
+        session.regenerate()
+        return "ok"
+
+    @app.route("/clear")
+    def clear():
+        session.clear()
+        return "ok"
+
+    return app.test_client()
+
+
+def session_id(client):
+    cookie = client.get_cookie("session")
+    return cookie.value if cookie else None
+
+
+def test_cookie_is_sent_only_when_the_id_is_issued(client, backend, clock):
+    assert "Set-Cookie" in client.get("/set/a").headers
+    sid = session_id(client)
+    response = client.get("/get")
+    assert response.text == "a" and "Set-Cookie" not in response.headers
+    assert "Cookie" in response.headers["Vary"]
+    assert "Set-Cookie" not in client.get("/set/a").headers # Same data: nothing written
+    assert "Set-Cookie" in client.get("/set/b").headers # Permanent session: new expiry
+    assert session_id(client) == sid and backend.get(sid)[0] == b'{"_permanent":true,"value":"b"}'
+
+
+def test_untouched_session_is_never_stored(client, backend):
+    response = client.get("/get")
+    assert "Set-Cookie" not in response.headers
+    assert session_id(client) is None and not backend._sessions
+
+
+def test_regenerate_moves_data_to_a_new_id(client, backend, clock):
+    client.get("/set/a")
+    old_sid = session_id(client)
+    assert "Set-Cookie" in client.get("/rotate").headers
+    new_sid = session_id(client)
+    assert new_sid != old_sid
+    assert backend.get(old_sid) is None
+    assert client.get("/get").text == "a"
+
+
+def test_expiry_is_refreshed_at_most_once_per_interval(client, backend, clock):
+    client.get("/set/a")
+    sid = session_id(client)
+    expires = backend.get(sid)[1]
+    clock.now += 50
+    assert "Set-Cookie" not in client.get("/get").headers
+    assert backend.get(sid)[1] == expires
+    clock.now += 100
+    assert "Set-Cookie" in client.get("/get").headers
+    assert backend.get(sid)[1] == clock.now + 1000
+    clock.now += 2000 # Idle for longer than the lifetime
+    assert client.get("/get").text == ""
+
+
+def test_cleared_session_is_deleted(client, backend):
+    client.get("/set/a")
+    sid = session_id(client)
+    client.get("/clear")
+    assert backend.get(sid) is None and session_id(client) is None
+
+
+def test_sqlite_sessions_default_to_the_instance_folder(tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_BACKEND", "sqlite")
+    monkeypatch.delenv("SESSION_PATH", raising=False)
+    interface = create_session_interface(str(tmp_path / "instance"))
+    assert interface.backend.path == os.path.join(str(tmp_path / "instance"), "sessions.db")
+    assert os.path.isfile(interface.backend.path)
+
+
+def test_login_rotates_the_session_id(flask_app):
+    from models import User, db
+    with flask_app.app_context():
+        user = User(username="session_user", email="session_user@example.com")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.commit()
+    client = flask_app.test_client()
+    client.post("/chat", json={"message": "hello"}) # An anonymous session with a conversation
+    anonymous_sid = session_id(client)
+    assert anonymous_sid
+    client.post("/login", data={"email_or_username": "session_user", "password": "secret"})
+    assert session_id(client) not in (None, anonymous_sid)
+    assert flask_app.session_interface.backend.get(anonymous_sid) is None
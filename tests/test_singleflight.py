@@ -0,0 +1,76 @@
+# tests/test_singleflight.py
+import threading
+
+import pytest
+
+from chatbot.singleflight import SingleFlight, SingleFlightTimeout
+
+
+def run_concurrently(flight, key, fn, callers):
+    results = []
+    errors = []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight(timeout=5)
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    threads, results, errors = run_concurrently(flight, "key", fn, 5)
+    while flight.coalesced < 4:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == ["answer"] * 5 and not errors
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight(timeout=5)
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    threads, results, errors = run_concurrently(flight, "key", fn, 3)
+    while flight.coalesced < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert not results
+    assert len(errors) == 3 and all(isinstance(e, ValueError) for e in errors)
+
+
+def test_key_is_forgotten_after_the_call():
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == 1
+    assert flight.do("key", lambda: 2) == 2
+    assert flight.coalesced == 0
+
+
+def test_waiter_times_out():
+    flight = SingleFlight(timeout=0.05)
+    call, is_leader = flight.begin("key")
+    assert is_leader
+    with pytest.raises(SingleFlightTimeout):
+        flight.do("key", lambda: "never called")
+    flight.finish("key", call, value="late")
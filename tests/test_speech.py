@@ -0,0 +1,71 @@
+# tests/test_speech.py
+import io
+import threading
+
+import pytest
+
+from chatbot.speech import AudioTooLong, SlotStream, SpeechRecognizer, iter_pcm_chunks
+
+
+class FakeRecognizer(SpeechRecognizer):
+    """Hears the configured transcript in any audio, and records how much audio it got."""
+
+    def __init__(self, transcript):
+        self.transcript = transcript
+        self.received = 0
+        self.partials_asked = False
+
+    def stream(self, sample_rate):
+        return self
+
+    def accept(self, chunk, partial=True):
+        self.received += len(chunk)
+        self.partials_asked = self.partials_asked or partial
+
+    def finish(self):
+        return self.transcript
+
+
+@pytest.fixture
+def recognizer(flask_app, monkeypatch):
+    import app as app_module
+    fake = FakeRecognizer("my name is Alice")
+    monkeypatch.setattr(app_module, "speech_recognizer", fake)
+    return fake
+
+
+def test_chunks_hold_whole_samples():
+    chunks = [bytes(chunk) for chunk in iter_pcm_chunks(io.BytesIO(bytes(range(11))), chunk_bytes=4)]
+    assert all(len(chunk) % 2 == 0 for chunk in chunks)
+    assert b"".join(chunks) == bytes(range(10)) # The odd last byte is no whole sample
+
+
+def test_chunks_stop_at_max_bytes():
+    with pytest.raises(AudioTooLong):
+        list(iter_pcm_chunks(io.BytesIO(bytes(100)), chunk_bytes=10, max_bytes=50))
+
+
+def test_stt_stream_saves_spoken_name(client, recognizer):
+    response = client.post("/stt/stream", data=bytes(3200), content_type="audio/l16; rate=16000")
+    assert response.mimetype == "text/event-stream"
+    body = response.get_data(as_text=True)
+    assert '"transcript"' in body and "Alice" in body
+    assert recognizer.received == 3200
+    assert not recognizer.partials_asked # The upload is half-duplex: nobody would see them
+    with client.session_transaction() as saved:
+        assert saved["user_name"] == "Alice" # Saved with the response, though the answer was streamed
+
+
+def test_stt_stream_rejects_other_audio(client, recognizer):
+    assert client.post("/stt/stream", data=b"RIFF", content_type="audio/wav").status_code == 415
+    response = client.post("/stt/stream?mode=shout", data=bytes(2), content_type="audio/l16")
+    assert response.status_code == 400
+
+
+def test_slot_stream_releases_its_slot_once():
+    slots = threading.BoundedSemaphore(1)
+    assert slots.acquire(blocking=False)
+    stream = SlotStream(FakeRecognizer("hi"), slots)
+    assert stream.finish() == "hi"
+    stream.finish()
+    assert slots.acquire(blocking=False) # Released, and only once (a bounded semaphore would raise)
@@ -0,0 +1,64 @@
+# tests/test_streaming.py
+import json
+
+from chatbot.llm import LLMBackend
+from chatbot.streaming import SentenceBuffer, split_sentences, sse_event
+
+ANSWER = "Python is a programming language. Hi. It is easy to learn!\nTry it today"
+
+
+class ScriptedBackend(LLMBackend):
+    """Streams a fixed answer a few characters at a time."""
+
+    name = "scripted"
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = 0
+
+    def stream(self, messages, model, cancel=None, max_tokens=None, stop=None):
+        self.calls += 1
+        for i in range(0, len(self.answer), 5):
+            yield self.answer[i:i + 5]
+
+
+def events(response):
+    return [json.loads(line[len("data: "):]) for line in response.get_data(as_text=True).splitlines() if line.startswith("data: ")]
+
+
+def test_sentences_are_released_as_they_complete():
+    buffer = SentenceBuffer()
+    assert buffer.feed("Python is a programming") == []
+    assert buffer.feed(" language. Hi") == ["Python is a programming language."]
+    assert buffer.feed(". It is easy to learn! ") == ["Hi. It is easy to learn!"] # "Hi." is too short alone
+    assert buffer.feed("Try") == []
+    assert buffer.flush() == "Try"
+    assert buffer.flush() == ""
+
+
+def test_split_sentences_matches_streaming():
+    buffer = SentenceBuffer()
+    streamed = [sentence for i in range(0, len(ANSWER), 3) for sentence in buffer.feed(ANSWER[i:i + 3])]
+    streamed.append(buffer.flush())
+    assert split_sentences(ANSWER) == streamed == [
+        "Python is a programming language.", "Hi. It is easy to learn!", "Try it today",
+    ]
+
+
+def test_sse_event_is_one_message():
+    assert sse_event({"type": "done", "response": "a\nb"}) == 'data: {"type": "done", "response": "a\\nb"}\n\n'
+
+
+def test_chat_stream_sends_sentences_then_done(client, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "llm_backend", ScriptedBackend(ANSWER))
+    response = client.post("/chat/stream", json={"message": "zqx tell me about the python language"})
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    received = events(response)
+    assert [event["type"] for event in received] == ["sentence", "sentence", "sentence", "done"]
+    assert received[-1]["response"] == " ".join(event["text"] for event in received[:-1])
+
+
+def test_chat_stream_needs_a_message(client):
+    assert client.post("/chat/stream", json={"text": "hello"}).status_code == 400
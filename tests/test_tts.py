@@ -0,0 +1,72 @@
+# tests/test_tts.py
+import fcntl
+import io
+import os
+import wave
+
+import pytest
+
+from chatbot.ratelimit import Limit, MemoryRateLimitBackend, RateLimiter
+from chatbot.tts import AudioClipCache, SpeechSynthesizer
+
+
+class FakeSynthesizer(SpeechSynthesizer):
+    voice_id = "fake"
+
+    def __init__(self):
+        self.spoken = []
+
+    def synthesize(self, text):
+        self.spoken.append(text)
+        output = io.BytesIO()
+        with wave.open(output, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(16000)
+            wav_file.writeframes(bytes(320))
+        return output.getvalue()
+
+
+@pytest.fixture
+def clips(tmp_path):
+    return AudioClipCache(str(tmp_path / "clips"), FakeSynthesizer(), max_pending=1)
+
+
+def test_clips_are_synthesized_once(clips):
+    key, path = clips.get("Hello  there.")
+    assert clips.get("Hello there.") == (key, path) # Same text after whitespace normalization
+    assert clips.synthesizer.spoken == ["Hello there."]
+    assert os.path.isfile(path)
+
+
+def test_prewarm_skips_a_directory_another_worker_warms(clips):
+    with open(os.path.join(clips.directory, ".prewarm.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        clips.prewarm(["Hello."]).join(5)
+    assert clips.synthesizer.spoken == []
+
+
+def test_prewarm_waits_for_a_synthesis_slot(clips):
+    clips._slots.acquire() # A request is synthesizing
+    thread = clips.prewarm(["Hello.", "Bye."])
+    thread.join(0.2)
+    assert thread.is_alive() and clips.synthesizer.spoken == []
+    clips._slots.release()
+    thread.join(5)
+    assert clips.synthesizer.spoken == ["Hello.", "Bye."]
+
+
+def test_tts_is_rate_limited(client, clips, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "tts_cache", clips)
+    monkeypatch.setattr(app_module, "rate_limiter", RateLimiter(MemoryRateLimitBackend(), {
+        "anonymous": {"session": Limit(1, 60)},
+        "anonymous_tts": {"session": Limit(2, 60)},
+    }))
+    for _ in range(2):
+        response = client.get("/tts?text=Hello.")
+        assert response.status_code == 200 and response.mimetype == "audio/wav"
+    response = client.get("/tts?text=Hello.")
+    assert response.status_code == 429 and int(response.headers["Retry-After"]) > 0
+    # Clips do not use up the chat queries of the same session
+    assert client.post("/chat", json={"message": "hello"}).status_code == 200
@@ -0,0 +1,54 @@
+# tests/test_user_cache.py
+import pytest
+
+from models import User, db
+
+
+@pytest.fixture
+def cache(flask_app):
+    from app import user_cache
+    with flask_app.app_context():
+        user_cache.clear()
+        yield user_cache
+
+
+def add_user(username):
+    user = User(username=username, email=f"{username}@example.com")
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def test_identity_is_loaded_once(cache):
+    user_id = add_user("cached_user")
+    hits, misses = cache.hits, cache.misses
+    first = cache.load(user_id)
+    assert cache.load(user_id) is first
+    assert (cache.hits - hits, cache.misses - misses) == (1, 1)
+    assert first.username == "cached_user" and first.is_authenticated
+
+
+def test_update_and_delete_invalidate(cache):
+    user_id = add_user("renamed_user")
+    cache.load(user_id)
+    user = db.session.get(User, user_id)
+    user.username = "renamed_user2"
+    db.session.commit()
+    assert cache.load(user_id).username == "renamed_user2"
+    db.session.delete(db.session.get(User, user_id))
+    db.session.commit()
+    assert cache.load(user_id) is None
+
+
+def test_rolled_back_change_keeps_the_old_identity(cache):
+    user_id = add_user("rollback_user")
+    user = db.session.get(User, user_id)
+    user.username = "rollback_user2"
+    db.session.flush()
+    db.session.rollback()
+    assert cache.load(user_id).username == "rollback_user"
+
+
+def test_missing_user_is_not_cached(cache):
+    assert cache.load(987654) is None
+    assert cache.backend.get(987654) is None
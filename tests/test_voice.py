@@ -0,0 +1,168 @@
+# tests/test_voice.py
+import json
+import threading
+
+from flask import session
+from werkzeug.routing import Rule
+
+from chatbot.voice import VoiceSession
+
+
+class Client:
+    """Collects what a VoiceSession sends: JSON events, and audio frames as bytes."""
+
+    def __init__(self):
+        self.frames = []
+        self.done = threading.Event()
+
+    def send(self, data):
+        self.frames.append(json.loads(data) if isinstance(data, str) else data)
+        if isinstance(data, str) and self.frames[-1]["type"] == "done":
+            self.done.set()
+
+    def events(self, kind):
+        return [frame for frame in self.frames if isinstance(frame, dict) and frame["type"] == kind]
+
+
+def echo(text, cancel, mode=None):
+    yield f"You said {text}."
+    yield f"Mode {mode}."
+
+
+def until_cancelled(text, cancel, mode=None):
+    yield "Thinking."
+    cancelled = threading.Event()
+    cancel.on_cancel(cancelled.set)
+    cancelled.wait(5)
+
+
+class Recognition:
+    """Recognition stream that hears one word per 2-byte sample."""
+
+    def __init__(self):
+        self.words = []
+        self.finished = False
+
+    def accept(self, chunk, partial=True):
+        self.words.extend(["word"] * (len(chunk) // 2))
+        return " ".join(self.words) if partial else None
+
+    def finish(self):
+        self.finished = True
+        return " ".join(self.words)
+
+
+def message(text, turn_id, **fields):
+    return json.dumps({"type": "message", "text": text, "id": turn_id, **fields})
+
+
+def voice_handshake(flask_app, conversation_id=None):
+    """Runs require_voice_session() as for a /voice handshake; returns its response (None lets it through)."""
+    import app as app_module
+    with flask_app.test_request_context("/voice"):
+        from flask import request
+        request.url_rule = Rule("/voice", endpoint="voice_session") # flask-sock may not be installed
+        if conversation_id:
+            session["conversation_id"] = conversation_id
+        response = app_module.require_voice_session()
+        assert session.get("conversation_id") == conversation_id # Never starts a conversation
+        return response
+
+
+def test_voice_handshake_needs_a_conversation(flask_app):
+    _, status = voice_handshake(flask_app)
+    assert status == 403
+    assert voice_handshake(flask_app, "abc123") is None
+
+
+def test_existing_conversation_key_does_not_start_one(flask_app):
+    import app as app_module
+    with flask_app.test_request_context("/"):
+        assert app_module.existing_conversation_key() is None
+        assert "conversation_id" not in session
+        key = app_module.conversation_key()
+        assert key.startswith("session:")
+        assert app_module.existing_conversation_key() == key == app_module.conversation_key()
+
+
+
+def test_message_is_answered_sentence_by_sentence():
+    client = Client()
+    voice = VoiceSession(client.send, echo, clip=lambda sentence: b"RIFF", modes=["voice", "text"])
+    voice.handle(message("hi", 1, mode="text"))
+    assert client.done.wait(5)
+    assert [event["text"] for event in client.events("sentence")] == ["You said hi.", "Mode text."]
+    assert client.frames[1] == b"RIFF" # Each clip follows its sentence event
+    assert client.events("done") == [{"type": "done", "id": 1, "response": "You said hi. Mode text.", "cancelled": False}]
+
+
+def test_cancel_stops_the_answer():
+    client = Client()
+    voice = VoiceSession(client.send, until_cancelled)
+    voice.handle(message("hi", 1))
+    voice.handle(json.dumps({"type": "cancel"}))
+    assert client.done.wait(5)
+    assert client.events("done") == [{"type": "done", "id": 1, "response": "Thinking.", "cancelled": True}]
+
+
+def test_new_message_interrupts_the_answer():
+    client = Client()
+    answers = iter([until_cancelled, echo])
+    voice = VoiceSession(client.send, lambda text, cancel, mode: next(answers)(text, cancel, mode))
+    voice.handle(message("first", 1))
+    voice.handle(message("second", 2)) # Barge-in
+    voice.cancel_turn() # Waits for the second answer
+    done = client.events("done")
+    assert [(event["id"], event["cancelled"]) for event in done] == [(1, True), (2, False)]
+    assert done[1]["response"].startswith("You said second.")
+
+
+def test_malformed_frames_get_errors_and_keep_the_session():
+    client = Client()
+    voice = VoiceSession(client.send, echo, modes=["voice"])
+    for frame in ("not json", "[1, 2]", "5", json.dumps({"type": "dance"}), message("hi", 1, mode="shout")):
+        voice.handle(frame)
+    errors = client.events("error")
+    assert len(errors) == 5 and errors[-1]["id"] == 1
+    voice.handle(message("hi", 2))
+    assert client.done.wait(5)
+    assert not voice.closed
+
+
+def test_streamed_speech_gets_partials_then_an_answer():
+    client = Client()
+    recognitions = []
+
+    def listen(sample_rate):
+        recognitions.append(Recognition())
+        return recognitions[-1]
+
+    voice = VoiceSession(client.send, echo, listen=listen, max_audio_seconds=2 / 16000)
+    voice.handle(json.dumps({"type": "audio_start", "id": 1, "mode": "voice", "rate": 16000}))
+    voice.handle(bytes(2))
+    voice.handle(bytes(5)) # The odd byte is no whole sample; the third sample is past the limit
+    voice.handle(json.dumps({"type": "audio_end"}))
+    assert client.done.wait(5)
+    assert [event["text"] for event in client.events("partial")] == ["word", "word word"]
+    assert client.events("transcript") == [{"type": "transcript", "id": 1, "text": "word word"}]
+    assert client.events("sentence")[0]["text"] == "You said word word."
+    assert recognitions[0].finished
+
+
+def test_speech_interrupts_the_answer_and_is_refused_when_busy():
+    client = Client()
+    voice = VoiceSession(client.send, until_cancelled, listen=lambda sample_rate: None)
+    voice.handle(message("hi", 1))
+    voice.handle(json.dumps({"type": "audio_start", "id": 2})) # Barge-in by speaking
+    assert client.events("done")[0]["cancelled"] is True
+    assert client.events("error")[-1]["id"] == 2 and "busy" in client.events("error")[-1]["response"]
+    voice.handle(bytes(2))
+    assert "audio_start" in client.events("error")[-1]["response"]
+
+
+def test_closing_releases_the_recognition():
+    recognition = Recognition()
+    voice = VoiceSession(Client().send, echo, listen=lambda sample_rate: recognition)
+    voice.handle(json.dumps({"type": "audio_start", "id": 1}))
+    voice.close()
+    assert recognition.finished
@@ -0,0 +1,136 @@
+# tests/test_writebehind.py
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from chatbot.writebehind import WriteBehindBuffer
+
+
+class Unavailable(Exception):
+    """Stands for a transient database error."""
+
+
+class FakeTable:
+    """Stores rows in a list; rows in `bad` are rejected, and nothing is stored while `down`."""
+
+    def __init__(self, bad=()):
+        self.rows = []
+        self.bad = set(bad)
+        self.down = False
+
+    def write(self, rows):
+        if self.down:
+            raise Unavailable("database is down")
+        if self.bad & set(rows):
+            raise ValueError("constraint violated")
+        self.rows.extend(rows)
+
+
+def make_buffer(table, **options):
+    dropped = []
+    buffer = WriteBehindBuffer(
+        table.write, on_drop=dropped.append, is_transient=lambda e: isinstance(e, Unavailable), **options
+    )
+    buffer.start = lambda: None # No background thread: the tests flush themselves
+    return buffer, dropped
+
+
+def test_flush_writes_in_batches():
+    batches = []
+    buffer = WriteBehindBuffer(batches.append, max_batch=2)
+    buffer.start = lambda: None
+    buffer.add(1, 2, 3)
+    assert buffer.flush() == 3
+    assert batches == [[1, 2], [3]]
+    assert buffer.flush() == 0
+
+
+def test_transient_failure_keeps_rows_in_order():
+    table = FakeTable()
+    buffer, dropped = make_buffer(table, max_batch=2)
+    buffer.add(1, 2, 3)
+    table.down = True
+    assert buffer.flush() == 0
+    buffer.add(4)
+    table.down = False
+    assert buffer.flush() == 4
+    assert table.rows == [1, 2, 3, 4] and dropped == []
+
+
+def test_rejected_row_is_dropped_without_blocking_later_rows():
+    table = FakeTable(bad={2})
+    buffer, dropped = make_buffer(table, max_batch=3)
+    buffer.add(1, 2, 3, 4, 5)
+    assert buffer.flush() == 4
+    assert table.rows == [1, 3, 4, 5]
+    assert dropped == [1]
+    assert buffer.flush() == 0 # Nothing left to retry
+
+
+def test_outage_during_row_by_row_retry_requeues_the_rest():
+    table = FakeTable(bad={1})
+    buffer, dropped = make_buffer(table, max_batch=3)
+    buffer.add(1, 2, 3)
+    original_write = table.write
+
+    def write(rows):
+        if rows == [2]:
+            table.down = True
+        original_write(rows)
+    buffer.write = write
+    assert buffer.flush() == 0
+    assert dropped == [1]
+    table.down = False
+    buffer.write = original_write
+    assert buffer.flush() == 2
+    assert table.rows == [2, 3]
+
+
+def test_overflow_drops_oldest_rows():
+    table = FakeTable()
+    buffer, dropped = make_buffer(table, max_batch=100, max_pending=3)
+    buffer.add(1, 2, 3, 4, 5)
+    assert dropped == [2]
+    buffer.flush()
+    assert table.rows == [3, 4, 5]
+
+
+def test_transcripts_retry_only_transient_database_errors(flask_app):
+    from sqlalchemy.exc import IntegrityError, OperationalError
+    from app import transient_database_error
+    assert transient_database_error(OperationalError("INSERT", {}, Exception("database is locked")))
+    assert not transient_database_error(IntegrityError("INSERT", {}, Exception("NOT NULL constraint failed")))
+    assert not transient_database_error(KeyError("conversation_id"))
+
+
+def test_batch_racing_a_user_deletion_leaves_no_orphans(flask_app):
+    from models import Conversation, User, db, save_messages
+    with flask_app.app_context():
+        user = User(username="racer", email="racer@example.com")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        db.session.remove()
+        row = {"key": f"user:{user_id}", "user_id": user_id, "role": "user", "content": "hi",
+               "source": None, "created_at": datetime.now(timezone.utc)}
+
+        # Another worker is deleting the user: it holds the write lock while the batch starts
+        other_worker = sqlite3.connect(db.engine.url.database, isolation_level=None)
+        other_worker.execute("BEGIN IMMEDIATE")
+        stored = []
+
+        def flush():
+            with flask_app.app_context():
+                stored.append(save_messages([row]))
+
+        writer = threading.Thread(target=flush)
+        writer.start()
+        time.sleep(0.2)
+        other_worker.execute('DELETE FROM "user" WHERE id = ?', (user_id,))
+        other_worker.execute("COMMIT")
+        other_worker.close()
+        writer.join(10)
+
+        assert stored == [0]
+        assert db.session.scalar(db.select(Conversation).where(Conversation.key == row["key"])) is None